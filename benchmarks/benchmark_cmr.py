@@ -0,0 +1,135 @@
+"""
+Benchmark CmrProcess against the local CMR stand-in server.
+
+Measures end-to-end latency, pages/sec and peak Python memory of
+CmrProcess.run() and CmrProcess.iterGranules() over a grid of page sizes and
+worker counts. Needs no network access.
+
+Usage:
+    PYTHONPATH=. python benchmarks/benchmark_cmr.py --hits 5000 \
+        --latency 0.05 --page-sizes 150 500 2000 --workers 1 4 8
+"""
+import argparse
+import itertools
+import logging
+import time
+import tracemalloc
+
+from eisdashboard.model.cmr_query import CmrProcess
+from eisdashboard.testing.cmr_server import CmrStandInServer
+
+
+# -----------------------------------------------------------------------------
+# measure
+# -----------------------------------------------------------------------------
+def measure(server: CmrStandInServer, mode: str, pageSize: int,
+            workers: int, repeats: int) -> dict:
+    """Best-of-repeats latency and pages/sec for one setting, plus the peak
+    memory of one extra, traced run (tracing slows the timed runs down)."""
+    latencies = []
+
+    for _ in range(repeats):
+
+        requestsBefore = server.requestCount
+
+        startTime = time.perf_counter()
+        granules = query(server, mode, pageSize, workers)
+        latencies.append(time.perf_counter() - startTime)
+
+        pages = server.requestCount - requestsBefore
+
+    tracemalloc.start()
+    query(server, mode, pageSize, workers)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latency = min(latencies)
+
+    return {'mode': mode,
+            'page_size': pageSize,
+            'workers': workers,
+            'granules': granules,
+            'requests': pages,
+            'latency_s': latency,
+            'pages_per_s': pages / latency,
+            'peak_mb': peak / 1024 / 1024}
+
+
+# -----------------------------------------------------------------------------
+# query
+# -----------------------------------------------------------------------------
+def query(server: CmrStandInServer, mode: str, pageSize: int,
+          workers: int) -> int:
+    """Run one CMR search against the stand-in, return the granule count."""
+    cmrProcess = CmrProcess(mission='SYNTHETIC_3H',
+                            dateTime='2000-01-01T00:00:00Z,'
+                                     '2010-01-01T00:00:00Z',
+                            lonLat='-76.6,38.8,-76.5,38.9',
+                            pageSize=pageSize,
+                            maxPages=server.hits // pageSize + 2,
+                            maxWorkers=workers,
+                            adaptive=(mode == 'adaptive'),
+                            baseUrl=server.baseUrl)
+
+    if mode == 'iter':
+        return sum(1 for _ in cmrProcess.iterGranules())
+
+    urls, _ = cmrProcess.run()
+
+    return len(urls)
+
+
+# -----------------------------------------------------------------------------
+# main
+# -----------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--hits', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='seconds added to every stand-in response')
+    parser.add_argument('--page-sizes', type=int, nargs='+',
+                        default=[150, 500, 2000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--modes', nargs='+',
+                        default=['run', 'iter', 'adaptive'],
+                        choices=['run', 'iter', 'adaptive'])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--recording', default=None,
+                        help='replay a recorded CMR response instead of ' +
+                        'synthetic granules')
+    args = parser.parse_args()
+
+    # CmrProcess logs the empty page that ends a search as an error
+    logging.basicConfig(level=logging.CRITICAL)
+
+    if args.recording:
+        server = CmrStandInServer.fromRecording(args.recording,
+                                                latency=args.latency)
+    else:
+        server = CmrStandInServer(hits=args.hits, latency=args.latency)
+
+    columns = ['mode', 'page_size', 'workers', 'granules', 'requests',
+               'latency_s', 'pages_per_s', 'peak_mb']
+
+    print(f'{server.hits} granules, {args.latency}s latency per request')
+    print(' '.join(f'{column:>11}' for column in columns))
+
+    with server:
+
+        for mode, pageSize, workers in itertools.product(
+                args.modes, args.page_sizes, args.workers):
+
+            # iterGranules follows a cursor, it is sequential by design
+            if mode == 'iter' and workers > 1:
+                continue
+
+            result = measure(server, mode, pageSize, workers, args.repeats)
+
+            print(' '.join(
+                f'{result[column]:>11.3f}' if isinstance(result[column],
+                                                         float)
+                else f'{result[column]:>11}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark Ingest.ingest on synthetic granules in the in-memory store.
+
+Writes GLDAS-like 3-hourly granules to fsspec's memory filesystem, read
+through the 'memory' storage backend, and times ingest() plus a point time
+series read for each combine mode. Needs no network access or credentials.
+
+Usage:
+    PYTHONPATH=. python benchmarks/benchmark_ingest.py --granules 240 \
+        --grid 150 360 --modes by_coords fast_combine lazy_granules
+"""
+import argparse
+import logging
+import time
+
+import fsspec
+import numpy as np
+import omegaconf
+import pandas as pd
+import xarray as xr
+
+from eisdashboard.model.config import Config
+from eisdashboard.model.config import StorageBackendSettings
+from eisdashboard.model.data.ingest import Ingest
+from eisdashboard.model.granule import GranuleRecord
+
+
+COLLECTION_ID = 'SYNTHETIC_3H'
+ROOT = 'benchmark-ingest'
+
+
+# -----------------------------------------------------------------------------
+# write_granules
+# -----------------------------------------------------------------------------
+def write_granules(ingest: Ingest, count: int, lats: int,
+                   lons: int) -> dict:
+    """Write the synthetic granules to the memory store, returning
+    path -> GranuleRecord."""
+    memory = fsspec.filesystem('memory')
+    backend = ingest.storage_backend(COLLECTION_ID)
+    start = pd.Timestamp('2000-01-01')
+    granules = {}
+
+    for index in range(count):
+
+        granule_time = start + pd.Timedelta(hours=3 * index)
+        url = f'https://archive.gov/bucket/granule{index:06d}.nc4'
+
+        granule = xr.Dataset(
+            {'Rainf_tavg': (('time', 'lat', 'lon'),
+                            np.random.rand(1, lats, lons).astype('float32'))},
+            coords={'time': [granule_time],
+                    'lat': np.linspace(-59.875, 89.875, lats),
+                    'lon': np.linspace(-179.875, 179.875, lons)})
+
+        path = backend.granule_path(url)
+        memory.pipe(path, granule.to_netcdf(engine='h5netcdf'))
+
+        granules[path] = GranuleRecord(f'granule{index:06d}.nc4', url,
+                                       'GES_DISC',
+                                       start=granule_time.timestamp())
+
+    return granules
+
+
+# -----------------------------------------------------------------------------
+# measure
+# -----------------------------------------------------------------------------
+def measure(mode: str, granules: dict) -> dict:
+    """Ingest time and the time to then read one point's time series."""
+    config = omegaconf.OmegaConf.structured(Config)
+    config.storage.collections = {
+        COLLECTION_ID: StorageBackendSettings(protocol='memory', root=ROOT)}
+    config.dataset_cache.max_size_mb = 0
+    config.ingest.fast_combine = mode == 'fast_combine'
+    config.ingest.lazy_granules = mode == 'lazy_granules'
+
+    ingest = Ingest(config)
+    s3_list = tuple(sorted(granules))
+
+    start_time = time.perf_counter()
+    dataset = ingest.ingest('GES_DISC', s3_list, granules=granules,
+                            collection_id=COLLECTION_ID)
+    ingest_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    dataset['Rainf_tavg'].sel(lat=38.85, lon=-76.55,
+                              method='nearest').load()
+    read_time = time.perf_counter() - start_time
+
+    return {'mode': mode,
+            'granules': len(s3_list),
+            'ingest_s': ingest_time,
+            'read_s': read_time}
+
+
+# -----------------------------------------------------------------------------
+# main
+# -----------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--granules', type=int, default=240)
+    parser.add_argument('--grid', type=int, nargs=2, default=[150, 360],
+                        metavar=('LATS', 'LONS'))
+    parser.add_argument('--modes', nargs='+',
+                        default=['by_coords', 'fast_combine',
+                                 'lazy_granules'],
+                        choices=['by_coords', 'fast_combine',
+                                 'lazy_granules'])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    config = omegaconf.OmegaConf.structured(Config)
+    config.storage.collections = {
+        COLLECTION_ID: StorageBackendSettings(protocol='memory', root=ROOT)}
+
+    granules = write_granules(Ingest(config), args.granules, *args.grid)
+
+    columns = ['mode', 'granules', 'ingest_s', 'read_s']
+
+    print(f'{args.granules} granules of {args.grid[0]}x{args.grid[1]}')
+    print(' '.join(f'{column:>13}' for column in columns))
+
+    try:
+        for mode in args.modes:
+
+            result = measure(mode, granules)
+
+            print(' '.join(
+                f'{result[column]:>13.3f}' if isinstance(result[column],
+                                                         float)
+                else f'{result[column]:>13}' for column in columns))
+
+    finally:
+        fsspec.filesystem('memory').rm(f'/{ROOT}', recursive=True)
+
+
+if __name__ == '__main__':
+    main()
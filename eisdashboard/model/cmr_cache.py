@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+
+# -----------------------------------------------------------------------------
+# class CmrResponseCache
+#
+# Persistent, on-disk cache of CMR search responses backed by SQLite.
+#
+# Entries are keyed by the normalized request dictionary built by
+# CmrProcess._buildRequest (plus any search-after cursor header), expire after
+# a per-entry time-to-live and are evicted least-recently-used first once the
+# total stored size goes over maxBytes. Hit, miss and eviction counters are
+# kept for the lifetime of the object.
+# -----------------------------------------------------------------------------
+class CmrResponseCache(object):
+
+    DEFAULT_PATH: str = os.path.join(os.path.expanduser('~'), '.cache',
+                                     'eis-dashboard', 'cmr_cache.sqlite')
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, path=None, ttl=3600, maxBytes=256 * 1024 * 1024):
+
+        self._path = path or self.DEFAULT_PATH
+        self._ttl = ttl
+        self._maxBytes = maxBytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+
+        if self._path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)),
+                        exist_ok=True)
+
+        self._connection = sqlite3.connect(self._path,
+                                           check_same_thread=False)
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, '
+                'value TEXT NOT NULL, '
+                'size INTEGER NOT NULL, '
+                'created REAL NOT NULL, '
+                'accessed REAL NOT NULL)')
+
+        logging.debug(f'CMR response cache at {self._path} ' +
+                      f'(ttl={self._ttl}s, max bytes={self._maxBytes})')
+
+    # -------------------------------------------------------------------------
+    # makeKey
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def makeKey(requestUrl: str, requestDictionary: dict,
+                headers: dict = None) -> str:
+        """Hash a request into a stable cache key, independent of the order
+        parameters were added to the request dictionary."""
+        normalizedRequest = json.dumps({'url': requestUrl,
+                                        'request': requestDictionary,
+                                        'headers': headers or {}},
+                                       sort_keys=True,
+                                       default=str)
+
+        return hashlib.sha256(normalizedRequest.encode('utf-8')).hexdigest()
+
+    # -------------------------------------------------------------------------
+    # get
+    # -------------------------------------------------------------------------
+    def get(self, key: str):
+        """Return the cached value for key, or None on a miss or if the
+        entry is older than the time-to-live."""
+        now = time.time()
+
+        with self._lock, self._connection:
+
+            row = self._connection.execute(
+                'SELECT value, created FROM responses WHERE key = ?',
+                (key,)).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created = row
+
+            if now - created > self._ttl:
+                self._connection.execute(
+                    'DELETE FROM responses WHERE key = ?', (key,))
+                self.misses += 1
+                return None
+
+            self._connection.execute(
+                'UPDATE responses SET accessed = ? WHERE key = ?',
+                (now, key))
+
+            self.hits += 1
+
+        return json.loads(value)
+
+    # -------------------------------------------------------------------------
+    # put
+    # -------------------------------------------------------------------------
+    def put(self, key: str, value) -> None:
+        serializedValue = json.dumps(value)
+        size = len(serializedValue)
+        now = time.time()
+
+        if size > self._maxBytes:
+            logging.debug(f'Not caching {key}, {size} bytes is larger ' +
+                          'than the cache')
+            return
+
+        with self._lock, self._connection:
+
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                (key, serializedValue, size, now, now))
+
+            self._evict()
+
+    # -------------------------------------------------------------------------
+    # clear
+    # -------------------------------------------------------------------------
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM responses')
+
+    # -------------------------------------------------------------------------
+    # stats
+    # -------------------------------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            entries, totalBytes = self._connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) ' +
+                'FROM responses').fetchone()
+
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': entries,
+                'bytes': totalBytes}
+
+    # -------------------------------------------------------------------------
+    # _evict
+    #
+    # Drop expired entries, then least-recently-accessed entries until the
+    # cache fits in maxBytes. Caller must hold the lock.
+    # -------------------------------------------------------------------------
+    def _evict(self) -> None:
+
+        expired = self._connection.execute(
+            'DELETE FROM responses WHERE created < ?',
+            (time.time() - self._ttl,)).rowcount
+
+        self.evictions += expired
+
+        totalBytes = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+        if totalBytes <= self._maxBytes:
+            return
+
+        rows = self._connection.execute(
+            'SELECT key, size FROM responses ORDER BY accessed ASC').fetchall()
+
+        for key, size in rows:
+
+            if totalBytes <= self._maxBytes:
+                break
+
+            self._connection.execute(
+                'DELETE FROM responses WHERE key = ?', (key,))
+
+            totalBytes -= size
+            self.evictions += 1
@@ -1,8 +1,14 @@
-import json
+from eisdashboard.model.exceptions import CmrQueryError
+from eisdashboard.model.granule import GranuleRecord
+from eisdashboard.model.http_client import HttpClient
+
+from concurrent.futures import ThreadPoolExecutor
+import itertools
 import logging
+import math
+import threading
 
-import certifi
-import urllib3
+import requests
 from urllib.parse import urlencode
 
 
@@ -24,6 +30,19 @@ class CmrProcess(object):
     LATITUDE_RANGE = (-90, 90)
     LONGITUDE_RANGE = (-180, 180)
 
+    # Header CMR uses to hand back (and accept) the search-after cursor
+    SEARCH_AFTER_HEADER = 'CMR-Search-After'
+
+    # Header holding the total number of granules matching a query
+    HITS_HEADER = 'CMR-Hits'
+
+    # Response headers kept alongside cached page bodies
+    CACHED_HEADERS = (SEARCH_AFTER_HEADER, HITS_HEADER)
+
+    # CMR caps page_size at 2000 and page_num * page_size at one million
+    MAX_PAGE_SIZE = 2000
+    MAX_PAGING_DEPTH = 1000000
+
     # -------------------------------------------------------------------------
     # __init__
     # -------------------------------------------------------------------------
@@ -35,28 +54,78 @@ class CmrProcess(object):
                  dayNightFlag='',
                  spatialParameter='bounding_box',
                  pageSize=150,
-                 maxPages=50):
-
+                 maxPages=50,
+                 maxWorkers=1,
+                 cache=None,
+                 updatedSince=None,
+                 adaptive=False,
+                 baseUrl=None):
+
+        self._baseUrl = baseUrl or self.CMR_BASE_URL
         self._error = error
         self._dateTime = dateTime
         self._mission = mission
         self._pageSize = pageSize
         self._maxPages = maxPages
+        self._maxWorkers = maxWorkers
+        self._cache = cache
+        self._updatedSince = updatedSince
+        self._latestRevisionDate = updatedSince
+        self._revisionLock = threading.Lock()
+        self._adaptive = adaptive
+        self._totalHits = None
         self._onlineOnly = 'true'
         self._spatialParameter = spatialParameter
 
         self._lonLat = lonLat
         self._dayNightFlag = dayNightFlag
 
+        # GranuleRecords from the last run(), keyed by file name
+        self._granules = {}
+
+    # -------------------------------------------------------------------------
+    # latestRevisionDate
+    #
+    # Newest CMR revision-date seen across the granules returned so far (or
+    # updatedSince if none were newer). Pass this back in as updatedSince to
+    # only fetch granules added or revised after this query.
+    # -------------------------------------------------------------------------
+    @property
+    def latestRevisionDate(self):
+        return self._latestRevisionDate
+
+    # -------------------------------------------------------------------------
+    # granules
+    #
+    # Compact records for every granule found by run(), ordered by start
+    # time, for callers that need more than the URLs.
+    # -------------------------------------------------------------------------
+    @property
+    def granules(self):
+        return sorted(self._granules.values(),
+                      key=lambda granule: (granule.start, granule.file_url))
+
     # -------------------------------------------------------------------------
     # run()
     #
     # Given a set of parameters on init (time, location, mission), search for
     # the most relevant file. This uses CMR to search metadata for
     # relevant matches.
+    #
+    # When maxWorkers > 1 pages are requested concurrently, see _runConcurrent.
+    # When adaptive, page size, page count and workers come from planPages().
+    #
+    # Returns (fileUrlsTuple, providerID), also when the search stops early.
     # -------------------------------------------------------------------------
     def run(self):
         logging.debug('Starting query')
+
+        if self._adaptive:
+            self.planPages()
+
+        if self._maxWorkers > 1:
+            return self._runConcurrent()
+
         fileUrlsSet = set()
         providerID = None
         for pageIdx in range(self._maxPages):
@@ -68,13 +137,14 @@ class CmrProcess(object):
             logging.debug(returnDict)
 
             if error and pageIdx > 1:
-                return sorted(list(fileUrlsSet))
+                break
 
             if not error:
                 logging.debug('Results found on page: {}'.format(pageNumber))
+                self._granules.update(returnDict)
                 returnDicts = list(returnDict.values())
-                out = [r['file_url'] for r in returnDicts]
-                providerID = returnDicts[0]['provider_id']
+                out = [r.file_url for r in returnDicts]
+                providerID = returnDicts[0].provider_id
                 fileUrlsSet.update(out)
 
         fileUrlsList = sorted(list(fileUrlsSet))
@@ -84,6 +154,261 @@ class CmrProcess(object):
         fileUrlsTuple = tuple(fileUrlsList)
         return fileUrlsTuple, providerID
 
+    # -------------------------------------------------------------------------
+    # planPages()
+    #
+    # Ask CMR how many granules match (page_size=0 returns only the CMR-Hits
+    # header), then choose the page size, number of pages and workers that
+    # fetch exactly that many granules in the fewest round trips. Pages are
+    # sized evenly so parallel requests take about the same time, with room
+    # for one more granule than the hits so the last page comes back short
+    # and ends the search without an empty round trip. The hit count goes
+    # through the response cache like the pages, so a warm query plans the
+    # same pages it cached and sends no request. A stale count only costs
+    # round trips: the search ends on a short page, not on the count. Keeps
+    # the constructor settings if it cannot be read.
+    # -------------------------------------------------------------------------
+    def planPages(self):
+
+        requestDictionary = self._buildRequest(pageNum=1)
+        requestDictionary['page_size'] = 0
+
+        _, responseHeaders = self._fetchPage(requestDictionary)
+
+        try:
+            totalHits = int(responseHeaders[self.HITS_HEADER])
+
+        except (TypeError, KeyError, ValueError):
+            logging.warning('Could not read CMR hit count, keeping page ' +
+                            f'size {self._pageSize} and max pages ' +
+                            f'{self._maxPages}')
+            return None
+
+        self._totalHits = totalHits
+
+        numberOfPages = math.ceil((totalHits + 1) / self.MAX_PAGE_SIZE)
+        pageSize = math.ceil((totalHits + 1) / numberOfPages)
+
+        if numberOfPages * pageSize > self.MAX_PAGING_DEPTH:
+            logging.warning(f'{totalHits} hits is past the CMR paging ' +
+                            'limit, use iterGranules() to get them all')
+            numberOfPages = self.MAX_PAGING_DEPTH // pageSize
+
+        self._pageSize = pageSize
+        self._maxPages = numberOfPages
+        self._maxWorkers = max(1, min(self._maxWorkers, numberOfPages))
+
+        plan = {'hits': totalHits,
+                'page_size': self._pageSize,
+                'pages': self._maxPages,
+                'workers': self._maxWorkers}
+
+        logging.info(f'CMR query plan for {self._mission}: {totalHits} ' +
+                     f'hits, {self._maxPages} page(s) of {self._pageSize} ' +
+                     f'over {self._maxWorkers} worker(s)')
+
+        return plan
+
+    # -------------------------------------------------------------------------
+    # _runConcurrent()
+    #
+    # Fan pages out over a bounded pool of maxWorkers threads. Pages are
+    # requested in waves of maxWorkers and consumed in page order; the search
+    # stops at the first empty (or errored) page, so no further waves are
+    # submitted past the end of the result set.
+    # -------------------------------------------------------------------------
+    def _runConcurrent(self):
+        fileUrlsSet = set()
+        providerID = None
+        pageNumbers = iter(range(1, self._maxPages + 1))
+
+        logging.debug(f'Querying up to {self._maxPages} pages with ' +
+                      f'{self._maxWorkers} workers')
+
+        with ThreadPoolExecutor(max_workers=self._maxWorkers) as executor:
+
+            while True:
+
+                wave = list(itertools.islice(pageNumbers, self._maxWorkers))
+
+                if not wave:
+                    break
+
+                results = executor.map(
+                    lambda pageNumber: self._cmrQuery(pageNum=pageNumber),
+                    wave)
+
+                endOfResults = False
+
+                for pageNumber, (returnDict, error) in zip(wave, results):
+
+                    if error:
+                        logging.debug('No more results after page: ' +
+                                      '{}'.format(pageNumber - 1))
+                        endOfResults = True
+                        break
+
+                    logging.debug('Results found on page: {}'.format(
+                        pageNumber))
+                    self._granules.update(returnDict)
+                    returnDicts = list(returnDict.values())
+                    fileUrlsSet.update(r.file_url for r in returnDicts)
+                    providerID = returnDicts[0].provider_id
+
+                if endOfResults:
+                    break
+
+        fileUrlsTuple = tuple(sorted(fileUrlsSet))
+        return fileUrlsTuple, providerID
+
+    # -------------------------------------------------------------------------
+    # iterGranules()
+    #
+    # Generator over every granule matching the query. Pages are walked with
+    # CMR's search-after cursor instead of page_num, so there is no maxPages
+    # cap, and each page's granules are yielded as soon as that page arrives.
+    # Only one page is held in memory at a time. When adaptive, the page size
+    # comes from planPages() so the search takes the fewest round trips, and
+    # with maxWorkers > 1 the planned pages are fetched concurrently, see
+    # _iterPagesConcurrent.
+    #
+    # The search ends at a short or empty page, never on a hit count, which
+    # may be older than the pages.
+    #
+    # Raises CmrQueryError if a page fails, rather than ending early, so a
+    # caller never mistakes a truncated search for the full result.
+    #
+    # https://cmr.earthdata.nasa.gov/search/site/docs/search/api.html#search-after
+    # -------------------------------------------------------------------------
+    def iterGranules(self):
+        logging.debug('Starting search-after query')
+
+        if self._adaptive:
+            self.planPages()
+
+        if self._totalHits == 0:
+            return
+
+        if self._maxWorkers > 1 and self._totalHits is not None and \
+                self._maxPages * self._pageSize > self._totalHits:
+            yield from self._iterPagesConcurrent()
+            return
+
+        requestDictionary = self._buildRequest(pageNum=None)
+        headers = {}
+        pageNumber = 0
+
+        while True:
+
+            pageNumber += 1
+
+            granules, numberOfItems, responseHeaders = \
+                self._fetchGranulePage(requestDictionary, pageNumber,
+                                       headers=headers)
+
+            yield from granules
+
+            searchAfter = responseHeaders.get(self.SEARCH_AFTER_HEADER)
+
+            # A short page is the last page, skip the empty round trip
+            if searchAfter is None or numberOfItems < self._pageSize:
+                return
+
+            headers = {self.SEARCH_AFTER_HEADER: searchAfter}
+
+    # -------------------------------------------------------------------------
+    # _iterPagesConcurrent()
+    #
+    # The planned pages, requested by page_num in waves of maxWorkers and
+    # yielded in page order. Ends at the first short or empty page; if every
+    # planned page comes back full (granules were added since the plan),
+    # carries on one page at a time until one is short.
+    # -------------------------------------------------------------------------
+    def _iterPagesConcurrent(self):
+
+        def fetch(pageNumber):
+            return self._fetchGranulePage(
+                self._buildRequest(pageNum=pageNumber), pageNumber)
+
+        plannedPages = iter(range(1, self._maxPages + 1))
+
+        logging.debug(f'Querying {self._maxPages} pages with ' +
+                      f'{self._maxWorkers} workers')
+
+        with ThreadPoolExecutor(max_workers=self._maxWorkers) as executor:
+
+            while True:
+
+                wave = list(itertools.islice(plannedPages, self._maxWorkers))
+
+                if not wave:
+                    break
+
+                for granules, numberOfItems, _ in executor.map(fetch, wave):
+
+                    yield from granules
+
+                    if numberOfItems < self._pageSize:
+                        return
+
+        pageNumber = self._maxPages
+
+        while True:
+
+            pageNumber += 1
+
+            if pageNumber * self._pageSize > self.MAX_PAGING_DEPTH:
+                raise CmrQueryError(f'{self._mission} has more granules ' +
+                                    'than the CMR paging limit')
+
+            granules, numberOfItems, _ = fetch(pageNumber)
+
+            yield from granules
+
+            if numberOfItems < self._pageSize:
+                return
+
+    # -------------------------------------------------------------------------
+    # _fetchGranulePage()
+    #
+    # One page of GranuleRecords, with the number of items CMR returned on it
+    # and the response headers.
+    #
+    # Raises CmrQueryError if the request or its response failed.
+    # -------------------------------------------------------------------------
+    def _fetchGranulePage(self, requestDictionary, pageNumber, headers=None):
+
+        resultDictionary, responseHeaders = self._fetchPage(
+            requestDictionary, headers=headers)
+
+        if resultDictionary is None:
+            self._error = True
+            raise CmrQueryError(f'CMR page {pageNumber} for ' +
+                                f'{self._mission} failed, the search ' +
+                                'is incomplete')
+
+        numberOfItems = len(resultDictionary['items'])
+
+        if numberOfItems == 0:
+            logging.debug('No hits on page number: ' +
+                          '{}, ending search.'.format(pageNumber))
+            return [], 0, responseHeaders
+
+        try:
+            resultDictionaryProcessed = self._processRequest(
+                resultDictionary)
+
+        except KeyError as ke:
+            self._error = True
+            raise CmrQueryError('Error processing returned request ' +
+                                f'dict from CMR page {pageNumber} for ' +
+                                f'{self._mission}. Error: {ke}')
+
+        logging.debug('Results found on page: {}'.format(pageNumber))
+
+        return list(resultDictionaryProcessed.values()), numberOfItems, \
+            responseHeaders
+
     # -------------------------------------------------------------------------
     # cmrQuery()
     #
@@ -120,17 +445,20 @@ class CmrProcess(object):
     #
     # Build a dictionary based off of parameters given on init.
     # This dictionary will be used to encode the http request to search
-    # CMR.
+    # CMR. A pageNum of None leaves out page_num (search-after paging).
     # -------------------------------------------------------------------------
     def _buildRequest(self, pageNum=1):
         requestDict = dict()
-        requestDict['page_num'] = pageNum
+        if pageNum is not None:
+            requestDict['page_num'] = pageNum
         requestDict['page_size'] = self._pageSize
         requestDict['short_name'] = self._mission
         requestDict[self._spatialParameter] = self._lonLat
         requestDict['day_night_flag'] = self._dayNightFlag
         requestDict['temporal'] = self._dateTime
         requestDict['online_only'] = self._onlineOnly
+        if self._updatedSince:
+            requestDict['updated_since'] = self._updatedSince
         logging.debug(requestDict)
         return requestDict
 
@@ -141,41 +469,91 @@ class CmrProcess(object):
     # Decode data and count number of hits from request.
     # -------------------------------------------------------------------------
     def _sendRequest(self, requestDictionary):
-        with urllib3.PoolManager(cert_reqs='CERT_REQUIRED',
-                                 ca_certs=certifi.where()) as httpPoolManager:
-            encodedParameters = urlencode(requestDictionary, doseq=True)
-            requestUrl = self.CMR_BASE_URL + encodedParameters
-            logging.debug(requestUrl)
-            try:
-                requestResultPackage = httpPoolManager.request('GET',
-                                                               requestUrl)
-            except urllib3.exceptions.MaxRetryError:
-                self._error = True
-                return 0, None
-
-            status = int(requestResultPackage.status)
-
-            if not status == 200:
-                msg = 'CMR Query: Client or server error: ' + \
-                    'Status: {}, Request URL: {}, Params: {}'.format(
-                        str(status), requestUrl, encodedParameters)
-                logging.error(msg)
-                return 0, None
-
-            else:
-                requestResultData = json.loads(
-                    requestResultPackage.data.decode('utf-8'))
-                totalHits = len(requestResultData['items'])
-                return totalHits, requestResultData
+        requestResultData, _ = self._fetchPage(requestDictionary)
+
+        if requestResultData is None:
+            return 0, None
+
+        totalHits = len(requestResultData['items'])
+        return totalHits, requestResultData
 
     # -------------------------------------------------------------------------
-    # _processRequest
+    # _fetchPage
+    #
+    # Return the decoded page and the response headers we care about for a
+    # request, served from the on-disk response cache when one was given and
+    # it holds a fresh copy. Returns (None, None) if the request failed.
+    # -------------------------------------------------------------------------
+    def _fetchPage(self, requestDictionary, headers=None):
+        cacheKey = None
+
+        if self._cache is not None:
+
+            cacheKey = self._cache.makeKey(self._baseUrl,
+                                           requestDictionary,
+                                           headers)
+
+            cachedPage = self._cache.get(cacheKey)
+
+            if cachedPage is not None:
+                logging.debug(f'CMR cache hit: {requestDictionary}')
+                return cachedPage['data'], cachedPage['headers']
+
+        requestResultPackage = self._getResponse(requestDictionary,
+                                                 headers=headers)
+
+        if requestResultPackage is None:
+            return None, None
+
+        requestResultData = requestResultPackage.json()
+
+        responseHeaders = {
+            name: requestResultPackage.headers[name]
+            for name in self.CACHED_HEADERS
+            if name in requestResultPackage.headers}
+
+        if self._cache is not None:
+            self._cache.put(cacheKey, {'data': requestResultData,
+                                       'headers': responseHeaders})
+
+        return requestResultData, responseHeaders
+
+    # -------------------------------------------------------------------------
+    # _getResponse
     #
-    # For each result in the CMR query, unpackage relevant information to
-    # a dictionary. While doing so set flags if data is not desirable (too
-    # close to edge of dataset).
+    # GET the encoded request through the shared, keep-alive HttpClient
+    # session (which retries on 429/5xx with backoff). Returns the response
+    # on a 200, otherwise logs the failure and returns None.
+    # -------------------------------------------------------------------------
+    def _getResponse(self, requestDictionary, headers=None):
+        encodedParameters = urlencode(requestDictionary, doseq=True)
+        requestUrl = self._baseUrl + encodedParameters
+        logging.debug(requestUrl)
+        try:
+            requestResultPackage = HttpClient.get(requestUrl, headers=headers)
+        except requests.exceptions.RequestException as e:
+            logging.error(f'CMR Query: request failed: {e}, ' +
+                          f'Request URL: {requestUrl}')
+            self._error = True
+            return None
+
+        status = int(requestResultPackage.status_code)
+
+        if not status == 200:
+            msg = 'CMR Query: Client or server error: ' + \
+                'Status: {}, Request URL: {}, Params: {}'.format(
+                    str(status), requestUrl, encodedParameters)
+            logging.error(msg)
+            return None
+
+        return requestResultPackage
+
+    # -------------------------------------------------------------------------
+    # _processRequest
     #
-    #  REVIEW: Make the hard-coded names class constants? There are a lot...
+    # For each result in the CMR query, build a compact GranuleRecord (URL,
+    # provider, parsed time range and bounding box) in a single pass over the
+    # returned JSON. Records are keyed by file name.
     # -------------------------------------------------------------------------
     def _processRequest(self, resultDict):
 
@@ -183,34 +561,25 @@ class CmrProcess(object):
 
         for hit in resultDict['items']:
 
-            fileName = hit['umm']['RelatedUrls'][0]['URL'].split(
-                '/')[-1]
-
-            # ---
-            # These are hardcoded here because the only time these names will
-            # ever change is if we changed which format of metadata we wanted
-            # the CMR results back in.
-            #
-            # These could be placed as class constants in the future.
-            # ---
-            fileUrl = hit['umm']['RelatedUrls'][1]['URL']
-            providerID = hit['meta']['provider-id']
-
-            temporalRange = hit['umm']['TemporalExtent']['RangeDateTime']
-            dayNight = hit['umm']['DataGranule']['DayNightFlag']
-
-            spatialExtent = hit['umm']['SpatialExten' +
-                                       't']['HorizontalSpatialDom' +
-                                            'ain']
+            granule = GranuleRecord.fromUmm(hit)
 
-            key = fileName
+            self._updateLatestRevisionDate(granule.revision_date)
 
-            resultDictProcessed[key] = {
-                'file_name': fileName,
-                'file_url': fileUrl,
-                'provider_id': providerID,
-                'temporal_range': temporalRange,
-                'spatial_extent': spatialExtent,
-                'day_night_flag': dayNight}
+            resultDictProcessed[granule.file_name] = granule
 
         return resultDictProcessed
+
+    # -------------------------------------------------------------------------
+    # _updateLatestRevisionDate
+    #
+    # CMR revision dates are ISO 8601 UTC timestamps, so comparing the strings
+    # orders them. Pages may be processed from several threads in run().
+    # -------------------------------------------------------------------------
+    def _updateLatestRevisionDate(self, revisionDate):
+        if not revisionDate:
+            return
+
+        with self._revisionLock:
+            if self._latestRevisionDate is None or \
+                    revisionDate > self._latestRevisionDate:
+                self._latestRevisionDate = revisionDate
@@ -30,6 +30,106 @@ class TimeBounds:
     end: str = ''
 
 
+@dataclass
+class Http:
+    retries: int = 5
+    backoff_factor: float = 0.5
+    connect_timeout: float = 10.0
+    read_timeout: float = 60.0
+    pool_maxsize: int = 32
+
+
+@dataclass
+class CmrCache:
+    enabled: bool = False
+    path: str = ''
+    ttl: int = 3600
+    max_size_mb: int = 256
+
+
+@dataclass
+class Credentials:
+    providers: List[str] = field(default_factory=lambda: [])
+    refresh_margin: int = 300
+
+
+@dataclass
+class GranuleCache:
+    enabled: bool = False
+    path: str = ''
+    max_size_mb: int = 10240
+    block_size_mb: int = 8
+    whole_files: bool = False
+    validate_ttl: int = 3600
+
+
+@dataclass
+class ReferenceIndexSettings:
+    enabled: bool = False
+    path: str = ''
+    concat_dim: str = 'time'
+
+
+@dataclass
+class Materialize:
+    enabled: bool = False
+    path: str = ''
+    spatial_chunk: int = 16
+
+
+@dataclass
+class StorageBackendSettings:
+    protocol: str = 's3'
+    root: str = ''
+
+
+@dataclass
+class Storage:
+    default: StorageBackendSettings = \
+        field(default_factory=StorageBackendSettings)
+    collections: Dict[str, StorageBackendSettings] = \
+        field(default_factory=lambda: {})
+
+
+@dataclass
+class ZarrMetadataCacheSettings:
+    enabled: bool = False
+    path: str = ''
+    ttl: int = 86400
+
+
+@dataclass
+class DatasetCacheSettings:
+    max_size_mb: int = 4096
+    policy: str = 'lru'
+
+
+@dataclass
+class IngestSettings:
+    collection_workers: int = 4
+    cmr_workers: int = 4
+    prefilter_granules: bool = True
+    open_workers: int = 16
+    subset_to_bounds: bool = True
+    subset_margin: float = 0.0
+    normalize_coordinates: bool = True
+    pipeline: bool = False
+    pipeline_queue_size: int = 64
+    fast_combine: bool = False
+    lazy_granules: bool = False
+    lazy_max_open: int = 64
+
+
+@dataclass
+class DaskSettings:
+    enabled: bool = False
+    n_workers: int = 4
+    threads_per_worker: int = 2
+    memory_limit: str = '4GB'
+    processes: bool = True
+    dashboard_address: str = ':8787'
+
+
 @dataclass
 class Config:
     """
@@ -50,6 +150,31 @@ class Config:
 
     time_bounds: TimeBounds = field(default_factory=TimeBounds)
 
+    http: Http = field(default_factory=Http)
+
+    cmr_cache: CmrCache = field(default_factory=CmrCache)
+
+    granule_cache: GranuleCache = field(default_factory=GranuleCache)
+
+    reference_index: ReferenceIndexSettings = \
+        field(default_factory=ReferenceIndexSettings)
+
+    materialize: Materialize = field(default_factory=Materialize)
+
+    zarr_metadata_cache: ZarrMetadataCacheSettings = \
+        field(default_factory=ZarrMetadataCacheSettings)
+
+    dataset_cache: DatasetCacheSettings = \
+        field(default_factory=DatasetCacheSettings)
+
+    ingest: IngestSettings = field(default_factory=IngestSettings)
+
+    credentials: Credentials = field(default_factory=Credentials)
+
+    storage: Storage = field(default_factory=Storage)
+
+    dask: DaskSettings = field(default_factory=DaskSettings)
+
     log_level: str = 'INFO'
 
     log_dir: str = ''
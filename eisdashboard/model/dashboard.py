@@ -2,8 +2,13 @@ import eisdashboard.model.utils as dashboard_utils
 from eisdashboard.model.data.ingest import Ingest
 from eisdashboard.model.interactivity import InteractivityManager
 from eisdashboard.model.common import read_config
+from eisdashboard.model.exceptions import DashboardRuntimeException
+from eisdashboard.model.http_client import HttpClient
 
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 import datetime
+from functools import partial
 from typing import Tuple
 import logging
 import os
@@ -44,6 +49,8 @@ class Dashboard(object):
 
         self._logger = self.initializeLogging()
 
+        self.initializeHttpClient()
+
         self._start_date = self._conf['time_bounds']['start']
         self._end_date = self._conf['time_bounds']['end']
 
@@ -69,6 +76,8 @@ class Dashboard(object):
 
         self._datasetsVariables = {}
 
+        self._queryPackages = {}
+
         self.initializeData()
 
         self._variableOptions = self.initializeVariableOptions()
@@ -85,8 +94,13 @@ class Dashboard(object):
 
         self._logger.debug(self._validStarterVariables)
 
+        # Start with the data.default variables that loaded, if any
+        defaultVariables = [
+            var for var in self._conf['data']['default']
+            if var in self._validStarterVariables]
+
         self._interactivityManager._timeSeriesVariablesWidget.value = \
-            [self._validStarterVariables[0]]
+            defaultVariables or self._validStarterVariables[:1]
 
     # ------------------------------------------------------------------------
     # initializeLogging
@@ -126,25 +140,69 @@ class Dashboard(object):
 
         return logger
 
+    # ------------------------------------------------------------------------
+    # initializeHttpClient
+    # ------------------------------------------------------------------------
+    def initializeHttpClient(self):
+        httpConf = self._conf['http']
+
+        self._logger.debug(f'Configuring shared HTTP client: {httpConf}')
+
+        HttpClient.configure(retries=httpConf['retries'],
+                             backoffFactor=httpConf['backoff_factor'],
+                             connectTimeout=httpConf['connect_timeout'],
+                             readTimeout=httpConf['read_timeout'],
+                             poolMaxsize=httpConf['pool_maxsize'])
+
     # ------------------------------------------------------------------------
     # initializeData
     # ------------------------------------------------------------------------
     def initializeData(self):
+        """Load the NASA Earthdata and custom collections together, in one
+        ingestCollections pass.
+
+        Raises:
+            DashboardRuntimeException: no collection could be loaded
+        """
         self._logger.debug('Initializing data')
 
+        ingestFunctions = {}
+        queryPackages = {}
+
         collectionIDs = list(self._conf['nasa_earthdata_collections']['ids'])
+
         if collectionIDs:
-            self.initializeNasaEarthdata(collectionIDs)
+            nasaIngestFunctions, queryPackages = \
+                self.initializeNasaEarthdata(collectionIDs)
+            ingestFunctions.update(nasaIngestFunctions)
 
         customCollectionIDs = self._conf['custom_collections']['ids']
 
         if customCollectionIDs:
-            self.initializeCustomData(customCollectionIDs)
+            ingestFunctions.update(
+                self.initializeCustomData(customCollectionIDs))
+
+        loadedCollectionIDs = self.ingestCollections(ingestFunctions)
+
+        if not loadedCollectionIDs:
+            raise DashboardRuntimeException(
+                f'None of the {len(ingestFunctions)} configured ' +
+                'collections could be loaded, see the reported errors')
+
+        # Only loaded NASA collections can be refreshed
+        for collectionID in loadedCollectionIDs:
+            if collectionID in queryPackages:
+                self._queryPackages[collectionID] = \
+                    queryPackages[collectionID]
+
+        self._logger.debug(self._datasetsVariables)
 
     # ------------------------------------------------------------------------
     # initializeNasaEarthData
     # ------------------------------------------------------------------------
-    def initializeNasaEarthdata(self, collectionIDs):
+    def initializeNasaEarthdata(self, collectionIDs) -> Tuple[dict, dict]:
+        """Ingest functions and query packages, by collection ID, for the
+        NASA Earthdata collections."""
         self._logger.debug('Initializing nasa earthdata')
 
         boundingBox: list = self._bounds
@@ -158,38 +216,164 @@ class Dashboard(object):
 
         self._logger.debug(queryPackages)
 
-        for queryPackage in queryPackages:
+        ingestFunctions = {
+            queryPackage['collection_id']:
+                partial(self._ingest.get_nasa_earthdata, queryPackage)
+            for queryPackage in queryPackages}
 
-            dataPackage = self._ingest.get_nasa_earthdata(queryPackage)
+        return ingestFunctions, {
+            queryPackage['collection_id']: queryPackage
+            for queryPackage in queryPackages}
 
-            self._datasetsData[dataPackage['key']] = dataPackage['data']
+    # ------------------------------------------------------------------------
+    # refreshNasaEarthdata
+    # ------------------------------------------------------------------------
+    def refreshNasaEarthdata(self):
+        """Append granules added or revised in CMR since the dashboard
+        loaded (or last refreshed) to the open datasets, without
+        re-ingesting what is already loaded. Useful for near-real-time
+        collections. A collection that fails to refresh is reported through
+        the exception widget and keeps its current data, the others still
+        refresh.
+        """
+        self._logger.debug('Refreshing nasa earthdata')
 
-            self._datasetsVariables[dataPackage['key']] = \
-                dataPackage['variables']
+        for collectionID, queryPackage in self._queryPackages.items():
 
-        self._logger.debug(self._datasetsVariables)
+            # Collections that failed to load have nothing to append to
+            if collectionID not in self._datasetsData:
+                continue
+
+            self.indicateStatus(f'Checking {collectionID} for new data')
+
+            try:
+                dataPackage = self._ingest.refresh_nasa_earthdata(
+                    queryPackage, self._datasetsData[collectionID])
+
+                self._datasetsData[collectionID] = dataPackage['data']
+
+                self._datasetsVariables[collectionID] = \
+                    dataPackage['variables']
+
+            except Exception as exceptionCaptured:
+                step = f'Refreshing collection {collectionID}'
+                self.exceptionHandler(exceptionCaptured, step)
+
+        self.indicateStatus('Idle')
+
+    # ------------------------------------------------------------------------
+    # close
+    # ------------------------------------------------------------------------
+    def close(self) -> None:
+        """Release the Dask cluster, stopped once no other dashboard in the
+        process uses it, and cancel credential refreshes."""
+        self._logger.debug('Closing dashboard')
+
+        self._ingest.close()
+
+    # ------------------------------------------------------------------------
+    # getDatasetCacheStats
+    # ------------------------------------------------------------------------
+    def getDatasetCacheStats(self) -> dict:
+        """Hit, miss and eviction counts and size of the ingest dataset
+        cache."""
+        return self._ingest.dataset_cache_stats()
+
+    # ------------------------------------------------------------------------
+    # invalidateCollection
+    # ------------------------------------------------------------------------
+    def invalidateCollection(self, collectionID: str) -> int:
+        """Drop a collection's cached datasets, so its next ingest opens
+        the granules again."""
+        self._logger.debug(f'Invalidating cached {collectionID} datasets')
+
+        return self._ingest.invalidate_collection(collectionID)
 
     # ------------------------------------------------------------------------
     # initializeCustomData
     # ------------------------------------------------------------------------
-    def initializeCustomData(self, customCollectionIDs):
+    def initializeCustomData(self, customCollectionIDs) -> dict:
+        """Ingest functions, by collection ID, for the custom
+        collections."""
         self._logger.debug('Initializing custom data')
 
         self._logger.debug(customCollectionIDs)
 
+        ingestFunctions = {}
+
         for collectionID, s3Path in customCollectionIDs.items():
 
             self._logger.debug(f'collection ID: {collectionID}')
             self._logger.debug(f's3 path: {s3Path}')
 
-            dataPackage = self._ingest.get_custom_s3_data(collectionID, s3Path)
+            ingestFunctions[collectionID] = partial(
+                self._ingest.get_custom_s3_data, collectionID, s3Path)
+
+        return ingestFunctions
+
+    # ------------------------------------------------------------------------
+    # ingestCollections
+    # ------------------------------------------------------------------------
+    def ingestCollections(self, ingestFunctions: dict) -> list:
+        """Run each collection's ingest function concurrently, on up to
+        ingest.collection_workers threads. A collection that fails is
+        reported through the exception widget and left out, the others
+        still load. Each collection is reported as soon as it finishes,
+        datasets are stored in the order they were given.
+
+        Args:
+            ingestFunctions (dict): collection ID -> no-argument callable
+                returning a data package (key, data, variables)
+
+        Returns:
+            list: collection IDs that loaded successfully
+        """
+        maxWorkers = self._conf['ingest']['collection_workers']
+
+        self._logger.debug(f'Ingesting {len(ingestFunctions)} collections ' +
+                           f'with {maxWorkers} workers')
+
+        dataPackages = {}
+
+        with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            futures = {
+                executor.submit(ingestFunction): collectionID
+                for collectionID, ingestFunction in ingestFunctions.items()}
+
+            for future in as_completed(futures):
+
+                collectionID = futures[future]
+
+                try:
+                    dataPackages[collectionID] = future.result()
+
+                except Exception as exceptionCaptured:
+                    step = f'Ingesting collection {collectionID}'
+                    self.exceptionHandler(exceptionCaptured, step)
+                    continue
+
+                self._logger.info(f'Loaded {collectionID}, ' +
+                                  f'{len(dataPackages)} of ' +
+                                  f'{len(ingestFunctions)} collections')
+                self.indicateStatus(f'Loaded {collectionID}')
+
+        loadedCollectionIDs = []
+
+        for collectionID in ingestFunctions:
+
+            if collectionID not in dataPackages:
+                continue
+
+            dataPackage = dataPackages[collectionID]
 
             self._datasetsData[dataPackage['key']] = dataPackage['data']
 
             self._datasetsVariables[dataPackage['key']] = \
                 dataPackage['variables']
 
-        self._logger.debug(self._datasetsVariables)
+            loadedCollectionIDs.append(collectionID)
+
+        return loadedCollectionIDs
 
     # ------------------------------------------------------------------------
     # initializeVariableOptions
@@ -0,0 +1,153 @@
+import logging
+import threading
+
+try:
+    from distributed import Client
+    from distributed import LocalCluster
+except ImportError:
+    Client = None
+    LocalCluster = None
+
+
+# -----------------------------------------------------------------------------
+# DaskCluster
+# -----------------------------------------------------------------------------
+class DaskCluster(object):
+    """A local Dask cluster whose client is the default scheduler.
+
+    Once started, every dask computation in the process runs on the
+    cluster's workers instead of the threaded scheduler: the granule opens
+    of open_mfdataset(parallel=True), and the loads behind clipping,
+    resampling and time series reads. With processes, each worker is a
+    separate process, so NetCDF decoding is not bound by one GIL; the task
+    graphs are then pickled to the workers, which objects holding locks or
+    open database handles cannot be.
+
+    Ingest uses one cluster per process, see acquire(), so several
+    dashboards in one notebook share the workers and the dashboard port.
+
+    Needs the optional distributed package, see available().
+    """
+
+    # The process-wide cluster and how many acquire() calls hold it
+    _shared = None
+    _shared_users = 0
+    _shared_lock = threading.Lock()
+
+    def __init__(self, n_workers: int = 4, threads_per_worker: int = 2,
+                 memory_limit: str = '4GB', processes: bool = True,
+                 dashboard_address: str = ':8787'):
+
+        self._n_workers = n_workers
+        self._threads_per_worker = threads_per_worker
+        self._memory_limit = memory_limit
+        self._processes = processes
+        self._dashboard_address = dashboard_address or None
+
+        self._cluster = None
+        self._client = None
+
+    # -------------------------------------------------------------------------
+    # available
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def available() -> bool:
+        """Whether the distributed package is installed."""
+        return LocalCluster is not None
+
+    # -------------------------------------------------------------------------
+    # acquire
+    # -------------------------------------------------------------------------
+    @classmethod
+    def acquire(cls, **settings) -> 'DaskCluster':
+        """The process-wide cluster, started with these settings on first
+        use. Later calls reuse the running cluster and ignore their
+        settings. Pair each call with release()."""
+        with cls._shared_lock:
+
+            if cls._shared is None:
+                cls._shared = cls(**settings).start()
+            else:
+                logging.info('Reusing the running Dask cluster, dashboard: ' +
+                             f'{cls._shared.dashboard_link}')
+
+            cls._shared_users += 1
+
+            return cls._shared
+
+    # -------------------------------------------------------------------------
+    # release
+    # -------------------------------------------------------------------------
+    def release(self) -> None:
+        """Give back one acquire(), the cluster is closed after the last
+        one."""
+        with DaskCluster._shared_lock:
+
+            if self is DaskCluster._shared:
+
+                DaskCluster._shared_users -= 1
+
+                if DaskCluster._shared_users > 0:
+                    return
+
+                DaskCluster._shared = None
+
+        self.close()
+
+    # -------------------------------------------------------------------------
+    # start
+    # -------------------------------------------------------------------------
+    def start(self) -> 'DaskCluster':
+        """Start the workers and make the cluster's client the default
+        scheduler. Does nothing if already started."""
+        if self._client is not None:
+            return self
+
+        self._cluster = LocalCluster(
+            n_workers=self._n_workers,
+            threads_per_worker=self._threads_per_worker,
+            memory_limit=self._memory_limit,
+            processes=self._processes,
+            dashboard_address=self._dashboard_address)
+
+        self._client = Client(self._cluster, set_as_default=True)
+
+        logging.info(f'Started local Dask cluster: {self._n_workers} ' +
+                     f'{"processes" if self._processes else "workers"} x ' +
+                     f'{self._threads_per_worker} threads, ' +
+                     f'{self._memory_limit} each, dashboard: ' +
+                     f'{self.dashboard_link}')
+
+        return self
+
+    # -------------------------------------------------------------------------
+    # client
+    # -------------------------------------------------------------------------
+    @property
+    def client(self):
+        return self._client
+
+    # -------------------------------------------------------------------------
+    # dashboard_link
+    # -------------------------------------------------------------------------
+    @property
+    def dashboard_link(self) -> str:
+        """URL of the Dask dashboard, None if not started or disabled."""
+        if self._client is None or self._dashboard_address is None:
+            return None
+
+        return self._client.dashboard_link
+
+    # -------------------------------------------------------------------------
+    # close
+    # -------------------------------------------------------------------------
+    def close(self) -> None:
+        """Stop the workers; computations go back to the threaded
+        scheduler."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+        if self._cluster is not None:
+            self._cluster.close()
+            self._cluster = None
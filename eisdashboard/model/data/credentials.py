@@ -0,0 +1,271 @@
+from eisdashboard.model.http_client import HttpClient
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import logging
+import threading
+
+import requests
+import s3fs
+
+
+# -----------------------------------------------------------------------------
+# CredentialManager
+# -----------------------------------------------------------------------------
+class CredentialManager(object):
+    """Temporary DAAC S3 credentials and one reused S3 filesystem per
+    provider.
+
+    DAAC credentials expire after about an hour. Each provider's
+    credentials are refreshed in the background refresh_margin seconds
+    before they expire, and are also checked on every access. A refresh
+    rotates the keys in place on the provider's existing S3FileSystem. Files
+    (and lazily loaded datasets) opened through it keep working after the
+    original credentials expire.
+    """
+
+    PROVIDER_CREDENTIAL_ENDPOINT: dict = {
+        'GES_DISC': 'https://data.gesdisc.earthdata.nasa.gov/s3credentials',
+        'POCLOUD': 'https://archive.podaac.earthdata.nasa.gov/s3credentials',
+        'LPDAAC': 'https://data.lpdaac.earthdatacloud.nasa.gov/s3credentials',
+        'ORNLDAAC': 'https://data.ornldaac.earthdata.nasa.gov/s3credentials',
+        'GHRCDAAC': 'https://data.ghrc.earthdata.nasa.gov/s3credentials'
+    }
+
+    # Assumed lifetime when the endpoint does not say when keys expire
+    DEFAULT_LIFETIME: timedelta = timedelta(hours=1)
+
+    # Wait before retrying a failed background refresh
+    RETRY_DELAY: float = 60.0
+
+    def __init__(self, refresh_margin: float = 300):
+
+        self._refresh_margin = timedelta(seconds=refresh_margin)
+
+        self._credentials = {}
+        self._expirations = {}
+        self._file_systems = {}
+        self._timers = {}
+
+        self._lock = threading.Lock()
+        self._provider_locks = {}
+
+    # -------------------------------------------------------------------------
+    # prefetch
+    # -------------------------------------------------------------------------
+    def prefetch(self, providers: list) -> None:
+        """Start fetching credentials for every provider concurrently, in
+        the background. A later get_* call for a provider still being
+        fetched waits for that fetch instead of starting another."""
+        providers = list(providers)
+
+        if not providers:
+            return
+
+        logging.info(f'Prefetching S3 credentials for {providers}')
+
+        executor = ThreadPoolExecutor(max_workers=len(providers))
+
+        for provider in providers:
+            executor.submit(self.get_credentials, provider)
+
+        executor.shutdown(wait=False)
+
+    # -------------------------------------------------------------------------
+    # get_credentials
+    # -------------------------------------------------------------------------
+    def get_credentials(self, provider: str) -> dict:
+        """Current credentials for a provider, fetched or refreshed if they
+        are missing or about to expire. None if they could not be fetched.
+        """
+        with self._provider_lock(provider):
+
+            if self._needs_refresh(provider):
+                self._refresh(provider)
+
+            return self._credentials.get(provider)
+
+    # -------------------------------------------------------------------------
+    # get_file_system
+    # -------------------------------------------------------------------------
+    def get_file_system(self, provider: str) -> s3fs.S3FileSystem:
+        """The provider's shared S3FileSystem, None if there are no
+        credentials for it."""
+        credentials = self.get_credentials(provider)
+
+        if credentials is None:
+            return None
+
+        with self._provider_lock(provider):
+
+            if provider not in self._file_systems:
+                self._file_systems[provider] = s3fs.S3FileSystem(
+                    anon=False,
+                    key=credentials['accessKeyId'],
+                    secret=credentials['secretAccessKey'],
+                    token=credentials['sessionToken'],
+                    skip_instance_cache=True)
+
+            return self._file_systems[provider]
+
+    # -------------------------------------------------------------------------
+    # fetch_credentials
+    # -------------------------------------------------------------------------
+    def fetch_credentials(self, provider: str) -> dict:
+        """Request temporary S3 credentials from a DAAC's endpoint.
+
+        Args:
+            provider (str): CMR provider ID, e.g. GES_DISC
+
+        Returns:
+            dict: accessKeyId, secretAccessKey, sessionToken and expiration,
+                None if the request failed
+        """
+        requestUrl = self.PROVIDER_CREDENTIAL_ENDPOINT.get(provider)
+
+        if requestUrl is None:
+            logging.error('No S3 credential endpoint for provider: ' +
+                          f'{provider}, supported providers: ' +
+                          f'{list(self.PROVIDER_CREDENTIAL_ENDPOINT)}')
+            return None
+
+        try:
+
+            requestResultPackage = HttpClient.get(requestUrl)
+
+            requestResultPackage.raise_for_status()
+
+            temporaryS3Credentials = requestResultPackage.json()
+
+        except (requests.exceptions.RequestException, ValueError) as e:
+
+            logging.error(f'{provider} S3 credential error: ' +
+                          f'Exception: {e} ' +
+                          'Client or server error: ' +
+                          f'Request URL: {requestUrl}')
+
+            return None
+
+        logging.debug(f'Fetched {provider} S3 credentials, expiration: ' +
+                      f'{temporaryS3Credentials.get("expiration")}')
+
+        return temporaryS3Credentials
+
+    # -------------------------------------------------------------------------
+    # close
+    # -------------------------------------------------------------------------
+    def close(self) -> None:
+        """Cancel scheduled refreshes."""
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+
+    # -------------------------------------------------------------------------
+    # _needs_refresh
+    # -------------------------------------------------------------------------
+    def _needs_refresh(self, provider: str) -> bool:
+        expiration = self._expirations.get(provider)
+
+        if provider not in self._credentials or expiration is None:
+            return True
+
+        return datetime.now(timezone.utc) >= \
+            expiration - self._refresh_margin
+
+    # -------------------------------------------------------------------------
+    # _refresh
+    #
+    # Caller must hold the provider's lock.
+    # -------------------------------------------------------------------------
+    def _refresh(self, provider: str) -> bool:
+
+        credentials = self.fetch_credentials(provider)
+
+        if credentials is None:
+            return False
+
+        expiration = self._parse_expiration(credentials.get('expiration'))
+
+        self._credentials[provider] = credentials
+        self._expirations[provider] = expiration
+
+        file_system = self._file_systems.get(provider)
+
+        if file_system is not None:
+            logging.info(f'Rotating {provider} S3 credentials in place')
+            file_system.key = credentials['accessKeyId']
+            file_system.secret = credentials['secretAccessKey']
+            file_system.token = credentials['sessionToken']
+            file_system.connect(refresh=True)
+
+        remaining = (expiration - datetime.now(timezone.utc)).total_seconds()
+
+        delay = remaining - self._refresh_margin.total_seconds()
+
+        # Keys that do not outlive the margin are refreshed halfway through
+        # their lifetime, and never more often than failed refreshes are
+        # retried, rather than in a loop
+        if delay <= 0:
+            delay = max(remaining / 2, self.RETRY_DELAY)
+
+        self._schedule_refresh(provider, delay)
+
+        return True
+
+    # -------------------------------------------------------------------------
+    # _schedule_refresh
+    # -------------------------------------------------------------------------
+    def _schedule_refresh(self, provider: str, delay: float) -> None:
+
+        def refresh():
+            with self._provider_lock(provider):
+                refreshed = self._refresh(provider)
+
+            if not refreshed:
+                logging.warning(f'Background refresh of {provider} S3 ' +
+                                'credentials failed, retrying in ' +
+                                f'{self.RETRY_DELAY}s')
+                self._schedule_refresh(provider, self.RETRY_DELAY)
+
+        timer = threading.Timer(delay, refresh)
+        timer.daemon = True
+
+        with self._lock:
+
+            previous_timer = self._timers.get(provider)
+
+            if previous_timer is not None:
+                previous_timer.cancel()
+
+            self._timers[provider] = timer
+
+        logging.debug(f'Refreshing {provider} S3 credentials in {delay}s')
+
+        timer.start()
+
+    # -------------------------------------------------------------------------
+    # _provider_lock
+    # -------------------------------------------------------------------------
+    def _provider_lock(self, provider: str) -> threading.Lock:
+        with self._lock:
+            return self._provider_locks.setdefault(provider, threading.Lock())
+
+    # -------------------------------------------------------------------------
+    # _parse_expiration
+    # -------------------------------------------------------------------------
+    def _parse_expiration(self, expiration: str) -> datetime:
+        """DAAC endpoints return e.g. '2024-05-01 15:57:09+00:00'."""
+        try:
+            parsed = datetime.fromisoformat(expiration)
+
+        except (TypeError, ValueError):
+            logging.warning('Could not parse credential expiration ' +
+                            f'{expiration}, assuming ' +
+                            f'{self.DEFAULT_LIFETIME}')
+            return datetime.now(timezone.utc) + self.DEFAULT_LIFETIME
+
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+
+        return parsed
@@ -0,0 +1,160 @@
+from collections import OrderedDict
+import logging
+import threading
+
+import xarray as xr
+
+
+# -----------------------------------------------------------------------------
+# DatasetCache
+# -----------------------------------------------------------------------------
+class DatasetCache(object):
+    """In-memory cache of ingested datasets with a byte budget.
+
+    Each dataset is charged its estimated in-memory size (Dataset.nbytes,
+    what its arrays take once loaded). Past max_bytes, entries are evicted
+    least-recently-used ('lru') or least-frequently-used ('lfu', ties go to
+    the least recently used). Entries are tagged with their collection so
+    one collection can be invalidated without touching the others. Hit,
+    miss and eviction counters are kept for the lifetime of the object.
+    """
+
+    POLICIES: tuple = ('lru', 'lfu')
+
+    def __init__(self, max_bytes: int = 4 * 1024 * 1024 * 1024,
+                 policy: str = 'lru'):
+
+        if policy not in self.POLICIES:
+            raise ValueError(f'Unknown dataset cache policy: {policy}, ' +
+                             f'expected one of {self.POLICIES}')
+
+        self._max_bytes = max_bytes
+        self._policy = policy
+
+        # key -> entry dict, least recently used first
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # get
+    # -------------------------------------------------------------------------
+    def get(self, key) -> xr.Dataset:
+        """The cached dataset for key, None on a miss."""
+        with self._lock:
+
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            entry['uses'] += 1
+            self.hits += 1
+
+            return entry['dataset']
+
+    # -------------------------------------------------------------------------
+    # put
+    # -------------------------------------------------------------------------
+    def put(self, key, dataset: xr.Dataset,
+            collection_id: str = None) -> None:
+
+        size = dataset.nbytes
+
+        if size > self._max_bytes:
+            logging.info(f'Not caching {collection_id} dataset, ' +
+                         f'{size} bytes is over the {self._max_bytes} ' +
+                         'byte budget')
+            return
+
+        with self._lock:
+
+            self._remove(key)
+
+            self._entries[key] = {'dataset': dataset,
+                                  'size': size,
+                                  'collection_id': collection_id,
+                                  'uses': 1}
+            self._bytes += size
+
+            self._evict()
+
+    # -------------------------------------------------------------------------
+    # invalidate
+    # -------------------------------------------------------------------------
+    def invalidate(self, collection_id: str) -> int:
+        """Drop every dataset of a collection, returning how many."""
+        with self._lock:
+
+            keys = [key for key, entry in self._entries.items()
+                    if entry['collection_id'] == collection_id]
+
+            for key in keys:
+                self._remove(key)
+
+        logging.debug(f'Invalidated {len(keys)} cached {collection_id} ' +
+                      'datasets')
+
+        return len(keys)
+
+    # -------------------------------------------------------------------------
+    # clear
+    # -------------------------------------------------------------------------
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # -------------------------------------------------------------------------
+    # stats
+    # -------------------------------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'entries': len(self._entries),
+                    'bytes': self._bytes,
+                    'max_bytes': self._max_bytes,
+                    'policy': self._policy}
+
+    # -------------------------------------------------------------------------
+    # _remove
+    #
+    # Caller must hold the lock.
+    # -------------------------------------------------------------------------
+    def _remove(self, key) -> None:
+        entry = self._entries.pop(key, None)
+
+        if entry is not None:
+            self._bytes -= entry['size']
+
+    # -------------------------------------------------------------------------
+    # _evict
+    #
+    # Drop entries by the eviction policy until the cache fits in
+    # max_bytes. Caller must hold the lock.
+    # -------------------------------------------------------------------------
+    def _evict(self) -> None:
+
+        while self._bytes > self._max_bytes and self._entries:
+
+            if self._policy == 'lfu':
+                # min() keeps the first, i.e. least recent, of equal counts
+                key = min(self._entries,
+                          key=lambda key: self._entries[key]['uses'])
+            else:
+                key = next(iter(self._entries))
+
+            logging.debug('Evicting cached ' +
+                          f'{self._entries[key]["collection_id"]} dataset')
+
+            self._remove(key)
+            self.evictions += 1
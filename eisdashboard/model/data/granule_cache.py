@@ -0,0 +1,468 @@
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+# -----------------------------------------------------------------------------
+# LocalGranuleCache
+# -----------------------------------------------------------------------------
+class LocalGranuleCache(object):
+    """Size-bounded local disk cache of S3 granules.
+
+    Granules are cached either as fixed-size byte-range blocks, fetched the
+    first time a reader touches them, or as whole files, downloaded on first
+    open. Entries are keyed by S3 path and ETag, so a re-processed granule
+    is not served from a stale copy. A granule's ETag is looked up (one
+    HEAD request) on its first open and again once the last check is
+    validate_ttl seconds old; opens in between trust the recorded ETag, so
+    a re-processed granule can be served stale for up to validate_ttl. Data
+    files live under path/data with an SQLite index (path/index.sqlite) of
+    their size and last access time, and of each granule's last checked
+    ETag.
+    The least-recently-used entries are evicted once the total goes over
+    max_bytes. Hit and miss counters (entries and bytes) are kept for the
+    lifetime of the object.
+    """
+
+    DEFAULT_PATH: str = os.path.join(os.path.expanduser('~'), '.cache',
+                                     'eis-dashboard', 'granules')
+
+    WHOLE_FILE: int = -1
+
+    def __init__(self, path: str = None,
+                 max_bytes: int = 10 * 1024 * 1024 * 1024,
+                 block_size: int = 8 * 1024 * 1024,
+                 whole_files: bool = False, validate_ttl: int = 3600):
+
+        self._path = path or self.DEFAULT_PATH
+        self._data_path = os.path.join(self._path, 'data')
+        self._max_bytes = max_bytes
+        self._block_size = block_size
+        self._whole_files = whole_files
+        self._validate_ttl = validate_ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.hit_bytes = 0
+        self.miss_bytes = 0
+        self.validations = 0
+
+        self._lock = threading.Lock()
+
+        os.makedirs(self._data_path, exist_ok=True)
+
+        self._connection = sqlite3.connect(
+            os.path.join(self._path, 'index.sqlite'),
+            check_same_thread=False)
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'name TEXT PRIMARY KEY, '
+                's3_path TEXT NOT NULL, '
+                'etag TEXT NOT NULL, '
+                'size INTEGER NOT NULL, '
+                'accessed REAL NOT NULL)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS granules ('
+                's3_path TEXT PRIMARY KEY, '
+                'etag TEXT NOT NULL, '
+                'size INTEGER NOT NULL, '
+                'checked REAL NOT NULL)')
+
+        logging.debug(f'Granule cache at {self._path} ' +
+                      f'(max bytes={self._max_bytes}, ' +
+                      f'block size={self._block_size}, ' +
+                      f'whole files={self._whole_files})')
+
+    # -------------------------------------------------------------------------
+    # open
+    # -------------------------------------------------------------------------
+    def open(self, file_system, s3_path: str):
+        """Open an S3 granule through the cache.
+
+        Args:
+            file_system: fsspec filesystem the granule is read from on a
+                miss, e.g. s3fs.S3FileSystem
+            s3_path (str): granule path
+
+        Returns:
+            A seekable, read-only binary file object
+        """
+        etag, size = self._validated(file_system, s3_path)
+
+        key = hashlib.sha256(
+            f'{s3_path}\n{etag}'.encode('utf-8')).hexdigest()
+
+        if self._whole_files:
+            return self._open_whole_file(file_system, s3_path, etag, key)
+
+        raw = _CachedBlockFile(self, file_system, s3_path, etag, key, size)
+
+        return io.BufferedReader(raw, buffer_size=self._block_size)
+
+    # -------------------------------------------------------------------------
+    # read_block
+    # -------------------------------------------------------------------------
+    def read_block(self, file_system, s3_path: str, etag: str, key: str,
+                   block: int, size: int) -> bytes:
+        """One block of a granule, from disk or fetched from S3."""
+        name = f'{key}.{block}'
+
+        data = self._read_entry(name)
+
+        if data is not None:
+            return data
+
+        start = block * self._block_size
+        end = min(start + self._block_size, size)
+
+        data = file_system.cat_file(s3_path, start=start, end=end)
+
+        self._write_entry(name, s3_path, etag, data)
+
+        return data
+
+    # -------------------------------------------------------------------------
+    # clear
+    # -------------------------------------------------------------------------
+    def clear(self) -> None:
+        with self._lock, self._connection:
+
+            names = self._connection.execute(
+                'SELECT name FROM entries').fetchall()
+
+            self._connection.execute('DELETE FROM entries')
+            self._connection.execute('DELETE FROM granules')
+
+        for name, in names:
+            self._remove_file(name)
+
+    # -------------------------------------------------------------------------
+    # stats
+    # -------------------------------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total_bytes = self._connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) ' +
+                'FROM entries').fetchone()
+
+        lookups = self.hits + self.misses
+
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'hit_bytes': self.hit_bytes,
+                'miss_bytes': self.miss_bytes,
+                'evictions': self.evictions,
+                'validations': self.validations,
+                'entries': entries,
+                'bytes': total_bytes}
+
+    # -------------------------------------------------------------------------
+    # _validated
+    #
+    # The granule's ETag and size: the recorded ones if checked within
+    # validate_ttl, otherwise read from the filesystem (dropping entries for
+    # an older ETag) and recorded.
+    # -------------------------------------------------------------------------
+    def _validated(self, file_system, s3_path: str) -> tuple:
+
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT etag, size, checked FROM granules WHERE s3_path = ?',
+                (s3_path,)).fetchone()
+
+        if row is not None and time.time() - row[2] < self._validate_ttl:
+            return row[0], row[1]
+
+        info = file_system.info(s3_path)
+
+        size = info['size']
+
+        # Not every filesystem reports an ETag, S3 always does
+        etag = str(info.get('ETag') or info.get('LastModified') or size)
+
+        self._drop_stale(s3_path, etag)
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO granules VALUES (?, ?, ?, ?)',
+                (s3_path, etag, size, time.time()))
+            self.validations += 1
+
+        return etag, size
+
+    # -------------------------------------------------------------------------
+    # _open_whole_file
+    # -------------------------------------------------------------------------
+    def _open_whole_file(self, file_system, s3_path: str, etag: str,
+                         key: str):
+
+        name = f'{key}.{self.WHOLE_FILE}'
+
+        local_file = self._open_entry(name)
+
+        if local_file is not None:
+            return local_file
+
+        temp_path = self._temp_path(name)
+
+        try:
+            file_system.get_file(s3_path, temp_path)
+            self._add_entry(name, s3_path, etag, temp_path)
+
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        # Read straight from S3 if the file did not fit in the cache
+        return self._open_entry(name, count=False) or \
+            file_system.open(s3_path)
+
+    # -------------------------------------------------------------------------
+    # _read_entry
+    # -------------------------------------------------------------------------
+    def _read_entry(self, name: str) -> bytes:
+        entry_file = self._open_entry(name)
+
+        if entry_file is None:
+            return None
+
+        with entry_file:
+            return entry_file.read()
+
+    # -------------------------------------------------------------------------
+    # _open_entry
+    #
+    # Open a cached data file and mark it used, None on a miss.
+    # -------------------------------------------------------------------------
+    def _open_entry(self, name: str, count: bool = True):
+
+        with self._lock, self._connection:
+
+            row = self._connection.execute(
+                'SELECT size FROM entries WHERE name = ?',
+                (name,)).fetchone()
+
+            entry_file = None
+
+            if row is not None:
+                try:
+                    entry_file = open(self._file_path(name), 'rb')
+                except FileNotFoundError:
+                    self._connection.execute(
+                        'DELETE FROM entries WHERE name = ?', (name,))
+
+            if entry_file is None:
+                if count:
+                    self.misses += 1
+                return None
+
+            self._connection.execute(
+                'UPDATE entries SET accessed = ? WHERE name = ?',
+                (time.time(), name))
+
+            if count:
+                self.hits += 1
+                self.hit_bytes += row[0]
+
+        return entry_file
+
+    # -------------------------------------------------------------------------
+    # _write_entry
+    # -------------------------------------------------------------------------
+    def _write_entry(self, name: str, s3_path: str, etag: str,
+                     data: bytes) -> None:
+
+        temp_path = self._temp_path(name)
+
+        with open(temp_path, 'wb') as temp_file:
+            temp_file.write(data)
+
+        self._add_entry(name, s3_path, etag, temp_path)
+
+    # -------------------------------------------------------------------------
+    # _add_entry
+    #
+    # Move a downloaded temp file into the cache and index it. Readers never
+    # see a partial file, it only gets its final name once complete.
+    # -------------------------------------------------------------------------
+    def _add_entry(self, name: str, s3_path: str, etag: str,
+                   temp_path: str) -> None:
+
+        size = os.path.getsize(temp_path)
+
+        with self._lock:
+            self.miss_bytes += size
+
+        if size > self._max_bytes:
+            logging.debug(f'Not caching {s3_path}, {size} bytes is larger ' +
+                          'than the cache')
+            os.remove(temp_path)
+            return
+
+        os.replace(temp_path, self._file_path(name))
+
+        with self._lock, self._connection:
+
+            self._connection.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                (name, s3_path, etag, size, time.time()))
+
+            self._evict()
+
+    # -------------------------------------------------------------------------
+    # _drop_stale
+    #
+    # Remove entries for an older version (ETag) of the granule.
+    # -------------------------------------------------------------------------
+    def _drop_stale(self, s3_path: str, etag: str) -> None:
+
+        with self._lock, self._connection:
+
+            names = self._connection.execute(
+                'SELECT name FROM entries WHERE s3_path = ? AND etag != ?',
+                (s3_path, etag)).fetchall()
+
+            if not names:
+                return
+
+            logging.debug(f'{s3_path} changed, dropping {len(names)} ' +
+                          'cached entries')
+
+            self._connection.execute(
+                'DELETE FROM entries WHERE s3_path = ? AND etag != ?',
+                (s3_path, etag))
+
+        for name, in names:
+            self._remove_file(name)
+
+    # -------------------------------------------------------------------------
+    # _evict
+    #
+    # Drop least-recently-accessed entries until the cache fits in
+    # max_bytes. Caller must hold the lock.
+    # -------------------------------------------------------------------------
+    def _evict(self) -> None:
+
+        total_bytes = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+        if total_bytes <= self._max_bytes:
+            return
+
+        rows = self._connection.execute(
+            'SELECT name, size FROM entries ORDER BY accessed ASC').fetchall()
+
+        for name, size in rows:
+
+            if total_bytes <= self._max_bytes:
+                break
+
+            self._connection.execute(
+                'DELETE FROM entries WHERE name = ?', (name,))
+
+            self._remove_file(name)
+
+            total_bytes -= size
+            self.evictions += 1
+
+    # -------------------------------------------------------------------------
+    # _file_path
+    # -------------------------------------------------------------------------
+    def _file_path(self, name: str) -> str:
+        return os.path.join(self._data_path, name)
+
+    # -------------------------------------------------------------------------
+    # _temp_path
+    # -------------------------------------------------------------------------
+    def _temp_path(self, name: str) -> str:
+        return os.path.join(self._data_path, f'{name}.{uuid.uuid4().hex}.tmp')
+
+    # -------------------------------------------------------------------------
+    # _remove_file
+    # -------------------------------------------------------------------------
+    def _remove_file(self, name: str) -> None:
+        try:
+            os.remove(self._file_path(name))
+        except FileNotFoundError:
+            pass
+
+
+# -----------------------------------------------------------------------------
+# _CachedBlockFile
+#
+# Raw, seekable file over one granule that reads through the block cache.
+# -----------------------------------------------------------------------------
+class _CachedBlockFile(io.RawIOBase):
+
+    def __init__(self, cache: LocalGranuleCache, file_system, s3_path: str,
+                 etag: str, key: str, size: int):
+
+        self._cache = cache
+        self._file_system = file_system
+        self._s3_path = s3_path
+        self._etag = etag
+        self._key = key
+        self._size = size
+        self._position = 0
+
+        self.name = s3_path
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = self._size + offset
+        else:
+            raise ValueError(f'Invalid whence: {whence}')
+
+        return self._position
+
+    def readinto(self, buffer) -> int:
+
+        start = self._position
+        end = min(start + len(buffer), self._size)
+
+        if start >= end:
+            return 0
+
+        block_size = self._cache._block_size
+        view = memoryview(buffer)
+        written = 0
+
+        for block in range(start // block_size, (end - 1) // block_size + 1):
+
+            data = self._cache.read_block(self._file_system, self._s3_path,
+                                          self._etag, self._key, block,
+                                          self._size)
+
+            block_start = block * block_size
+            low = max(start, block_start) - block_start
+            high = min(end, block_start + len(data)) - block_start
+
+            view[written:written + high - low] = data[low:high]
+            written += high - low
+
+        self._position += written
+
+        return written
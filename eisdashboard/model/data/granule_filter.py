@@ -0,0 +1,158 @@
+from eisdashboard.model.granule import GranuleRecord
+
+import logging
+import math
+
+from shapely import STRtree
+from shapely.geometry import MultiPolygon
+from shapely.geometry import box
+
+
+# -----------------------------------------------------------------------------
+# parse_time_range
+# -----------------------------------------------------------------------------
+def parse_time_range(datetime_str: str) -> tuple:
+    """Split a CMR temporal parameter ('start,end') into POSIX timestamps.
+    Open or unparseable ends are NaN."""
+    start, _, end = datetime_str.partition(',')
+    return (GranuleRecord.parseTimestamp(start),
+            GranuleRecord.parseTimestamp(end))
+
+
+# -----------------------------------------------------------------------------
+# filter_granules
+# -----------------------------------------------------------------------------
+def filter_granules(granules: dict, bounds: list,
+                    time_range: tuple = (math.nan, math.nan)) -> dict:
+    """Drop granules whose extent does not overlap the query box or time
+    window, before any of them are opened.
+
+    CMR's bounding box match is coarse, so granules that only share an edge
+    with the query box are returned too. Granule boxes are loaded into an
+    STR-tree and kept only if their interiors intersect the query box. A
+    point or line query box, which has no interior, keeps every granule it
+    intersects, including granules it lies on the edge of. Boxes crossing
+    the antimeridian (west > east), granule or query, are split in two.
+    Granules without a parseable extent or time range are kept.
+
+    Granule polygons (UMM GPolygons) are reduced to their envelope by
+    GranuleRecord, so a granule whose polygon misses the query box but
+    whose envelope overlaps it is kept and opened.
+
+    Args:
+        granules (dict): s3 path -> GranuleRecord
+        bounds (list): query box [west, south, east, north], west > east
+            for a box crossing the antimeridian
+        time_range (tuple): query (start, end) POSIX timestamps
+
+    Returns:
+        dict: the s3 path -> GranuleRecord entries to open
+    """
+    if not granules:
+        return granules
+
+    query_box = _query_geometry(bounds)
+    query_start, query_end = time_range
+
+    paths = []
+    geometries = []
+    kept = {}
+
+    for s3_path, granule in granules.items():
+
+        if not _overlaps_in_time(granule, query_start, query_end):
+            continue
+
+        if any(math.isnan(value) for value in granule.bbox):
+            kept[s3_path] = granule
+            continue
+
+        for geometry in _granule_boxes(granule):
+            paths.append(s3_path)
+            geometries.append(geometry)
+
+    tree = STRtree(geometries)
+
+    # A query box without area only ever touches a granule edge
+    has_area = query_box.area > 0
+
+    for index in tree.query(query_box, predicate='intersects'):
+
+        if has_area and geometries[index].touches(query_box):
+            continue
+
+        s3_path = paths[index]
+        kept[s3_path] = granules[s3_path]
+
+    logging.info(f'Pre-filter kept {len(kept)} of {len(granules)} granules')
+
+    # Keep the caller's ordering
+    return {s3_path: granule for s3_path, granule in granules.items()
+            if s3_path in kept}
+
+
+# -----------------------------------------------------------------------------
+# overlaps
+# -----------------------------------------------------------------------------
+def overlaps(granule: GranuleRecord, bounds: list,
+             time_range: tuple = (math.nan, math.nan)) -> bool:
+    """Whether filter_granules would keep one granule, for granules that
+    arrive one at a time."""
+    if not _overlaps_in_time(granule, *time_range):
+        return False
+
+    if any(math.isnan(value) for value in granule.bbox):
+        return True
+
+    query_box = _query_geometry(bounds)
+    has_area = query_box.area > 0
+
+    return any(geometry.intersects(query_box) and
+               not (has_area and geometry.touches(query_box))
+               for geometry in _granule_boxes(granule))
+
+
+# -----------------------------------------------------------------------------
+# _overlaps_in_time
+# -----------------------------------------------------------------------------
+def _overlaps_in_time(granule: GranuleRecord, query_start: float,
+                      query_end: float) -> bool:
+    # NaN comparisons are False, so unknown ends never exclude a granule
+    if granule.end < query_start:
+        return False
+
+    if granule.start > query_end:
+        return False
+
+    return True
+
+
+# -----------------------------------------------------------------------------
+# _granule_boxes
+# -----------------------------------------------------------------------------
+def _granule_boxes(granule: GranuleRecord) -> list:
+    """Granule extent as boxes, split in two if it crosses the
+    antimeridian (west > east)."""
+    return _split_box(*granule.bbox)
+
+
+# -----------------------------------------------------------------------------
+# _query_geometry
+# -----------------------------------------------------------------------------
+def _query_geometry(bounds: list):
+    """The query box, or both halves of one crossing the antimeridian."""
+    boxes = _split_box(*bounds)
+
+    return boxes[0] if len(boxes) == 1 else MultiPolygon(boxes)
+
+
+# -----------------------------------------------------------------------------
+# _split_box
+# -----------------------------------------------------------------------------
+def _split_box(west: float, south: float, east: float,
+               north: float) -> list:
+
+    if west > east:
+        return [box(west, south, 180, north), box(-180, south, east, north)]
+
+    return [box(west, south, east, north)]
@@ -1,11 +1,33 @@
+from eisdashboard.model.cmr_cache import CmrResponseCache
 from eisdashboard.model.cmr_query import CmrProcess
-
-from functools import lru_cache
+from eisdashboard.model.data.cluster import DaskCluster
+from eisdashboard.model.data.credentials import CredentialManager
+from eisdashboard.model.data.dataset_cache import DatasetCache
+from eisdashboard.model.data.granule_cache import LocalGranuleCache
+from eisdashboard.model.data.granule_filter import filter_granules
+from eisdashboard.model.data.granule_filter import overlaps
+from eisdashboard.model.data.granule_filter import parse_time_range
+from eisdashboard.model.data.lazy_granules import LazyGranuleDataset
+from eisdashboard.model.data.normalize import normalize_coordinates
+from eisdashboard.model.data.reference_index import ReferenceIndex
+from eisdashboard.model.data.storage import StorageBackend
+from eisdashboard.model.data.storage import make_backend
+from eisdashboard.model.data.subset import select_variables
+from eisdashboard.model.data.subset import variables_to_drop
+from eisdashboard.model.data.subset import subset_to_bounds
+from eisdashboard.model.data.subset_store import SubsetStore
+from eisdashboard.model.data.zarr_store import ZarrMetadataCache
+from eisdashboard.model.data.zarr_store import open_zarr_store
+from eisdashboard.model.exceptions import DashboardRuntimeException
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import copy
 import logging
+import math
+import queue
+import threading
 
-import requests
-import s3fs
-import warnings
 import xarray as xr
 import time
 
@@ -15,18 +37,226 @@ import time
 # -----------------------------------------------------------------------------
 class Ingest(object):
 
-    PROVIDER_CREDENTIAL_ENDPOINT: dict = {
-        'GES_DISC': 'https://data.gesdisc.earthdata.nasa.gov/s3credentials',
-        'POCLOUD': 'https://archive.podaac.earthdata.nasa.gov/s3credentials',
-        'LPDAAC': 'https://data.lpdaac.earthdatacloud.nasa.gov/s3credentials',
-        'ORNLDAAC': 'https://data.ornldaac.earthdata.nasa.gov/s3credentials',
-        'GHRCDAAC': 'https://data.ghrc.earthdata.nasa.gov/s3credentials'
-    }
+    PROVIDER_CREDENTIAL_ENDPOINT: dict = \
+        CredentialManager.PROVIDER_CREDENTIAL_ENDPOINT
+
+    CMR_PAGE_SIZE: int = 150
 
     def __init__(self, config):
 
         self.config = config
 
+        self._cmr_cache = self._initialize_cmr_cache()
+
+        self._granule_cache = self._initialize_granule_cache()
+
+        self._reference_index = self._initialize_reference_index()
+
+        self._subset_store = self._initialize_subset_store()
+
+        self._zarr_metadata_cache = self._initialize_zarr_metadata_cache()
+
+        self._dataset_cache = DatasetCache(
+            max_bytes=self.config['dataset_cache']['max_size_mb'] *
+            1024 * 1024,
+            policy=self.config['dataset_cache']['policy'])
+
+        self._credentials = CredentialManager(
+            refresh_margin=self.config['credentials']['refresh_margin'])
+
+        self._credentials.prefetch(self.config['credentials']['providers'])
+
+        self._dask_cluster = self._initialize_dask_cluster()
+
+        # Collection ID -> StorageBackend, see storage_backend. Collections
+        # are ingested on several threads.
+        self._storage_backends = {}
+        self._storage_lock = threading.Lock()
+
+        # Per collection: newest CMR revision date and s3 paths seen so far
+        self._query_state = {}
+
+    # -------------------------------------------------------------------------
+    # _initialize_cmr_cache
+    # -------------------------------------------------------------------------
+    def _initialize_cmr_cache(self):
+
+        cache_config = self.config['cmr_cache']
+
+        if not cache_config['enabled']:
+            return None
+
+        return CmrResponseCache(
+            path=cache_config['path'] or None,
+            ttl=cache_config['ttl'],
+            maxBytes=cache_config['max_size_mb'] * 1024 * 1024)
+
+    # -------------------------------------------------------------------------
+    # _initialize_granule_cache
+    # -------------------------------------------------------------------------
+    def _initialize_granule_cache(self):
+
+        cache_config = self.config['granule_cache']
+
+        if not cache_config['enabled']:
+            return None
+
+        return LocalGranuleCache(
+            path=cache_config['path'] or None,
+            max_bytes=cache_config['max_size_mb'] * 1024 * 1024,
+            block_size=cache_config['block_size_mb'] * 1024 * 1024,
+            whole_files=cache_config['whole_files'],
+            validate_ttl=cache_config['validate_ttl'])
+
+    # -------------------------------------------------------------------------
+    # _initialize_reference_index
+    # -------------------------------------------------------------------------
+    def _initialize_reference_index(self):
+
+        index_config = self.config['reference_index']
+
+        if not index_config['enabled']:
+            return None
+
+        if not ReferenceIndex.available():
+            logging.warning('reference_index is enabled but kerchunk (or ' +
+                            'a recent enough fsspec) is not installed, ' +
+                            'opening granules directly')
+            return None
+
+        return ReferenceIndex(
+            path=index_config['path'] or None,
+            concat_dim=index_config['concat_dim'],
+            max_workers=self.config['ingest']['open_workers'])
+
+    # -------------------------------------------------------------------------
+    # _initialize_subset_store
+    # -------------------------------------------------------------------------
+    def _initialize_subset_store(self):
+
+        store_config = self.config['materialize']
+
+        if not store_config['enabled']:
+            return None
+
+        return SubsetStore(path=store_config['path'] or None,
+                           spatial_chunk=store_config['spatial_chunk'])
+
+    # -------------------------------------------------------------------------
+    # _initialize_zarr_metadata_cache
+    # -------------------------------------------------------------------------
+    def _initialize_zarr_metadata_cache(self):
+
+        cache_config = self.config['zarr_metadata_cache']
+
+        if not cache_config['enabled']:
+            return None
+
+        if not ZarrMetadataCache.available():
+            logging.warning('zarr_metadata_cache is enabled but zarr 3 is ' +
+                            'not installed, reading metadata from the store')
+            return None
+
+        return ZarrMetadataCache(path=cache_config['path'] or None,
+                                 ttl=cache_config['ttl'])
+
+    # -------------------------------------------------------------------------
+    # _initialize_dask_cluster
+    # -------------------------------------------------------------------------
+    def _initialize_dask_cluster(self):
+
+        dask_config = self.config['dask']
+
+        if not dask_config['enabled']:
+            return None
+
+        if not DaskCluster.available():
+            logging.warning('dask is enabled but distributed is not ' +
+                            'installed, using the threaded scheduler')
+            return None
+
+        processes = dask_config['processes']
+
+        # Granule cache files and lazy granule handles hold locks and
+        # SQLite connections, which cannot be sent to worker processes.
+        if processes and (self._granule_cache is not None or
+                          self.config['ingest']['lazy_granules']):
+            logging.warning('granule_cache and ingest.lazy_granules cannot ' +
+                            'be shared with worker processes, starting ' +
+                            'the Dask workers as threads')
+            processes = False
+
+        # One cluster per process, shared by every Ingest
+        return DaskCluster.acquire(
+            n_workers=dask_config['n_workers'],
+            threads_per_worker=dask_config['threads_per_worker'],
+            memory_limit=dask_config['memory_limit'],
+            processes=processes,
+            dashboard_address=dask_config['dashboard_address'])
+
+    # -------------------------------------------------------------------------
+    # close
+    # -------------------------------------------------------------------------
+    def close(self) -> None:
+        """Release the Dask cluster, stopping it if no other Ingest uses
+        it, and cancel credential refreshes."""
+        if self._dask_cluster is not None:
+            self._dask_cluster.release()
+            self._dask_cluster = None
+
+        self._credentials.close()
+
+    # -------------------------------------------------------------------------
+    # storage_backend
+    # -------------------------------------------------------------------------
+    def storage_backend(self, collection_id: str = None) -> StorageBackend:
+        """Where a collection's granules are read from: its
+        storage.collections entry, or storage.default.
+
+        Raises:
+            ValueError: unknown protocol, or a file backend without a root
+        """
+        storage_config = self.config['storage']
+
+        if collection_id not in storage_config['collections']:
+            collection_id = None
+
+        with self._storage_lock:
+
+            if collection_id not in self._storage_backends:
+
+                backend_config = \
+                    storage_config['collections'][collection_id] \
+                    if collection_id is not None \
+                    else storage_config['default']
+
+                self._storage_backends[collection_id] = make_backend(
+                    backend_config['protocol'], backend_config['root'],
+                    self._credentials)
+
+            return self._storage_backends[collection_id]
+
+    # -------------------------------------------------------------------------
+    # _get_file_system
+    # -------------------------------------------------------------------------
+    def _get_file_system(self, collection_id: str, provider_id: str):
+        """The filesystem of the collection's storage backend for a
+        provider.
+
+        Raises:
+            ValueError: the backend cannot reach the provider (e.g. no S3
+                credentials)
+        """
+        backend = self.storage_backend(collection_id)
+
+        file_system = backend.get_file_system(provider_id)
+
+        if file_system is None:
+            raise ValueError(f'The {backend.PROTOCOL} storage backend ' +
+                             f'cannot reach provider: {provider_id}')
+
+        return file_system
+
     # -------------------------------------------------------------------------
     # get_nasa_earthdata
     # -------------------------------------------------------------------------
@@ -40,30 +270,66 @@ class Ingest(object):
 
         search_dict = query_package
 
-        logging.info(f'Querying CMR for data links: {search_dict}')
+        variables = self.allowed_variables(search_dict['collection_id'])
 
-        cmrP = CmrProcess(mission=search_dict['collection_id'],
-                          dateTime=search_dict['datetime'],
-                          lonLat=','.join(str(e)
-                                          for e in search_dict['coords']),
-                          spatialParameter=search_dict['spatialParameter'],
-                          pageSize=150,
-                          maxPages=1)
+        if self._subset_store is not None:
 
-        resultList, providerID = cmrP.run()
+            store_key = self._subset_store.make_key(search_dict, variables)
 
-        logging.info('Filtering URL data paths')
-        resultList = self._refine_urls(resultList)
+            materialized = self._subset_store.open(store_key)
 
-        logging.info('Ingesting data')
+            if materialized is not None:
+
+                data, query_state = materialized
+
+                self._query_state[search_dict['collection_id']] = \
+                    query_state
+
+                return {'key': search_dict['collection_id'],
+                        'data': data,
+                        'variables': list(data.variables)}
+
+        if self.config['ingest']['pipeline'] and \
+                self._reference_index is None and \
+                not self.config['ingest']['lazy_granules']:
+
+            logging.info('Querying and ingesting data')
+
+            st = time.time()
+            data = self._query_and_ingest(search_dict, variables)
+
+        else:
+
+            resultList, providerID, granules = self._query_cmr(search_dict)
+
+            logging.info('Ingesting data')
+
+            st = time.time()
+            data = self.ingest(providerID, resultList,
+                               tuple(search_dict['coords']), variables,
+                               collection_id=search_dict['collection_id'],
+                               granules=granules) if resultList else None
 
-        st = time.time()
-        data = self.ingest(providerID, resultList)
         et = time.time()
         logging.info(f'Time to get data: {et-st}')
 
+        if data is None:
+            raise DashboardRuntimeException(
+                f'No {search_dict["collection_id"]} data could be loaded ' +
+                'for the bounds and time range')
+
         logging.info('Done ingesting data')
 
+        if self._subset_store is not None:
+
+            st = time.time()
+            data = self._subset_store.write(
+                store_key, data, list(search_dict['coords']),
+                parse_time_range(search_dict['datetime']),
+                self._query_state[search_dict['collection_id']])
+            et = time.time()
+            logging.info(f'Time to materialize subset: {et-st}')
+
         return_dict = {'key': search_dict['collection_id'],
                        'data': data,
                        'variables': list(data.variables)}
@@ -71,84 +337,552 @@ class Ingest(object):
         return return_dict
 
     # -------------------------------------------------------------------------
-    # _get_temp_credentials
+    # refresh_nasa_earthdata
     # -------------------------------------------------------------------------
-    @lru_cache(maxsize=32)
-    def _get_temp_credentials(self, provider: str):
-        """_summary_
+    def refresh_nasa_earthdata(self, query_package: dict,
+                               dataset: xr.Dataset) -> dict:
+        """Fetch only granules added or revised since the last query for
+        this collection and append them to the already-open dataset. A
+        known URL is read again only if its CMR revision date changed.
 
         Args:
-            provider (str): _description_
+            query_package (dict): the package originally used to query
+            dataset (xr.Dataset): the dataset returned by that query
+
+        The query state only advances once the new granules are appended,
+        so a failed refresh fetches them again next time.
 
         Returns:
-            _type_: _description_
+            dict: same layout as get_data_from_bounds. The data is the
+                original dataset when there is nothing new.
+
+        Raises:
+            DashboardRuntimeException: none of the new granules could be
+                loaded
         """
+        collection_id = query_package['collection_id']
+
+        query_state = self._query_state.get(collection_id)
+
+        if query_state is None:
+            logging.info(f'{collection_id} has not been queried yet, ' +
+                         'running a full query')
+            return self.get_data_from_bounds(query_package)
+
+        # _query_cmr records the new query into the state, this copy is put
+        # back if the append fails
+        previous_state = copy.deepcopy(query_state)
+
+        seen_urls = previous_state['file_urls']
+        revisions = previous_state.get('revisions', {})
 
-        requestUrl = self.PROVIDER_CREDENTIAL_ENDPOINT[provider]
+        new_urls, providerID, granules = self._query_cmr(
+            query_package, updated_since=query_state['revision_date'])
+
+        # A granule re-processed under the same URL comes back with a newer
+        # revision date and is read again
+        new_urls = tuple(
+            url for url in new_urls
+            if url not in seen_urls or
+            granules[url].revision_date != revisions.get(url))
+
+        return_dict = {'key': collection_id,
+                       'data': dataset,
+                       'variables': list(dataset.variables)}
+
+        if not new_urls:
+            logging.info(f'No new granules for {collection_id}')
+            return return_dict
+
+        logging.info(f'Appending {len(new_urls)} new granules to ' +
+                     f'{collection_id}')
+
+        variables = self.allowed_variables(collection_id)
 
         try:
+            new_data = self.ingest(providerID, new_urls,
+                                   tuple(query_package['coords']), variables,
+                                   collection_id=collection_id,
+                                   granules=granules)
+
+            if new_data is None:
+                raise DashboardRuntimeException(
+                    f'None of the {len(new_urls)} new {collection_id} ' +
+                    'granules could be loaded')
+
+            # Keep the newest copy of any timestep that was re-processed
+            combined = xr.concat([dataset, new_data], dim='time',
+                                 data_vars='minimal', coords='minimal',
+                                 compat='override', join='override')
+            duplicated = combined.get_index('time').duplicated(keep='last')
+            combined = combined.isel(time=~duplicated).sortby('time')
+
+            # Write the new timesteps back to the materialized subset, with
+            # the query state, so later sessions do not start from a stale
+            # copy
+            if self._subset_store is not None:
+                combined = self._subset_store.write(
+                    self._subset_store.make_key(query_package, variables),
+                    combined, list(query_package['coords']),
+                    parse_time_range(query_package['datetime']),
+                    self._query_state[collection_id])
+
+        except Exception:
+            self._query_state[collection_id] = previous_state
+            raise
+
+        return_dict['data'] = combined
 
-            requestResultPackage = requests.get(requestUrl)
+        return return_dict
 
-        except requests.exceptions.RequestException as e:
+    # -------------------------------------------------------------------------
+    # _query_cmr
+    # -------------------------------------------------------------------------
+    def _query_cmr(self, search_dict: dict, updated_since: str = None):
+        """Search CMR for a query package, returning the s3 paths, the
+        provider ID and the GranuleRecord for each s3 path. Remembers the
+        newest granule revision seen and every path returned per collection
+        so refresh_nasa_earthdata can ask CMR for just what changed.
 
-            msg = f'{provider} S3 credential error: ' + \
-                f'Exception: {e}' + \
-                'Client or server error: ' + \
-                f'Request URL: {requestUrl}'
+        Raises:
+            CmrQueryError: a CMR page failed. Nothing is recorded, so a
+                truncated granule list is never taken as the full one.
+        """
+        collection_id = search_dict['collection_id']
 
-            warnings.warn(msg)
+        cmrP = self._make_cmr_process(search_dict, updated_since)
 
-            self._error = True
+        granules = {}
+        providerID = None
 
-            logging.error(msg)
+        logging.info('Filtering URL data paths')
+
+        for granule in cmrP.iterGranules():
+
+            providerID = granule.provider_id
+
+            s3_path = self._refine_url(granule.file_url, collection_id)
+
+            if s3_path is not None:
+                granules[s3_path] = granule
+
+        logging.info(f'CMR returned {len(granules)} granules')
+
+        if self._cmr_cache is not None:
+            logging.info(f'CMR cache stats: {self._cmr_cache.stats()}')
+
+        if self.config['ingest']['prefilter_granules']:
+            granules = filter_granules(
+                granules,
+                list(search_dict['coords']),
+                parse_time_range(search_dict['datetime']))
+
+        resultList = tuple(sorted(granules))
+
+        self._record_query(collection_id, cmrP, resultList, granules)
+
+        return resultList, providerID, granules
+
+    # -------------------------------------------------------------------------
+    # _make_cmr_process
+    # -------------------------------------------------------------------------
+    def _make_cmr_process(self, search_dict: dict,
+                          updated_since: str = None) -> CmrProcess:
+
+        logging.info(f'Querying CMR for data links: {search_dict}')
+
+        # ---
+        # Incremental queries always go to CMR, a cached "what's new"
+        # response would hide granules added since it was stored.
+        # ---
+        return CmrProcess(mission=search_dict['collection_id'],
+                          dateTime=search_dict['datetime'],
+                          lonLat=','.join(str(e)
+                                          for e in search_dict['coords']),
+                          spatialParameter=search_dict['spatialParameter'],
+                          pageSize=self.CMR_PAGE_SIZE,
+                          maxWorkers=self.config['ingest']['cmr_workers'],
+                          cache=None if updated_since else self._cmr_cache,
+                          updatedSince=updated_since,
+                          adaptive=True)
+
+    # -------------------------------------------------------------------------
+    # _record_query
+    #
+    # Remember the newest revision date, the paths a query returned and the
+    # revision date of each, see refresh_nasa_earthdata.
+    # -------------------------------------------------------------------------
+    def _record_query(self, collection_id: str, cmrP: CmrProcess,
+                      s3_list: tuple, granules: dict) -> None:
+
+        query_state = self._query_state.setdefault(
+            collection_id, {'revision_date': None, 'file_urls': set()})
+
+        query_state['revision_date'] = cmrP.latestRevisionDate
+        query_state['file_urls'].update(s3_list)
+        query_state.setdefault('revisions', {}).update(
+            (s3_path, granules[s3_path].revision_date)
+            for s3_path in s3_list)
+
+    # -------------------------------------------------------------------------
+    # _query_and_ingest
+    # -------------------------------------------------------------------------
+    def _query_and_ingest(self, search_dict: dict,
+                          variables: tuple) -> xr.Dataset:
+        """Pipelined _query_cmr and ingest, used when ingest.pipeline is
+        set. A producer thread walks the CMR pages and puts each granule on
+        a bounded queue (ingest.pipeline_queue_size) as its page arrives;
+        this thread hands them straight to the open pool. Opening overlaps
+        the CMR paging, so startup takes about max(query, open) instead of
+        their sum. The combine waits for every granule, so the result and
+        its dataset cache entry are the same as ingest's.
+
+        Returns:
+            xr.Dataset: None if CMR returned no granules or none opened
+
+        Raises:
+            ValueError: the storage backend cannot reach the provider
+            CmrQueryError: a CMR page failed
+        """
+        ingest_config = self.config['ingest']
+        collection_id = search_dict['collection_id']
+        bounds = tuple(search_dict['coords'])
+        time_range = parse_time_range(search_dict['datetime'])
+
+        cmrP = self._make_cmr_process(search_dict)
+
+        granule_queue = queue.Queue(
+            maxsize=max(1, ingest_config['pipeline_queue_size']))
+        stop = threading.Event()
+        producer_errors = []
+
+        def produce():
+            try:
+                for granule in cmrP.iterGranules():
 
-            return 0, None
+                    if stop.is_set():
+                        return
 
-        temporaryS3Credentials = requestResultPackage.json()
+                    s3_path = self._refine_url(granule.file_url,
+                                               collection_id)
 
-        logging.debug(temporaryS3Credentials)
+                    if s3_path is None:
+                        continue
 
-        return temporaryS3Credentials
+                    if ingest_config['prefilter_granules'] and \
+                            not overlaps(granule, list(bounds), time_range):
+                        continue
+
+                    granule_queue.put((s3_path, granule))
+
+            except Exception as e:
+                producer_errors.append(e)
+
+            finally:
+                granule_queue.put(None)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+
+        futures = {}
+        granules = {}
+        provider_id = None
+        file_system = None
+
+        with ThreadPoolExecutor(
+                max_workers=max(1, ingest_config['open_workers'])) \
+                as executor:
+
+            try:
+                for s3_path, granule in iter(granule_queue.get, None):
+
+                    if s3_path in futures:
+                        continue
+
+                    if file_system is None:
+
+                        provider_id = granule.provider_id
+
+                        file_system = self._get_file_system(
+                            collection_id, provider_id)
+
+                    granules[s3_path] = granule
+                    futures[s3_path] = executor.submit(
+                        self._open_s3_file, file_system, s3_path)
+
+            except Exception:
+                # Unblock and stop the producer
+                stop.set()
+                for _ in iter(granule_queue.get, None):
+                    pass
+                self._discard_opens(futures.values())
+                raise
+
+            producer.join()
+
+            # A failed CMR page means the granule list is incomplete:
+            # nothing is recorded or cached for it
+            if producer_errors:
+                self._discard_opens(futures.values())
+                raise producer_errors[0]
+
+            s3_list = tuple(sorted(futures))
+
+            logging.info(f'CMR returned {len(s3_list)} granules')
+
+            if self._cmr_cache is not None:
+                logging.info(f'CMR cache stats: {self._cmr_cache.stats()}')
+
+            self._record_query(collection_id, cmrP, s3_list, granules)
+
+            if not s3_list:
+                logging.warning(f'No {collection_id} granules for ' +
+                                f'{search_dict}')
+                return None
+
+            # Known as soon as CMR is done: on a hit the opens still
+            # running are not waited for
+            cache_key = (provider_id, s3_list, bounds, variables)
+
+            ingested_data = self._dataset_cache.get(cache_key)
+
+            if ingested_data is not None:
+                logging.info(f'Using cached {collection_id} dataset')
+                self._discard_opens(futures.values())
+                return ingested_data
+
+        time_order = self._time_order(s3_list, granules) \
+            if ingest_config['fast_combine'] else None
+
+        s3_file_objects = []
+        failures = {}
+
+        for s3_path in time_order or s3_list:
+
+            s3_file_object, error = futures[s3_path].result()
+
+            if error is not None:
+                failures[s3_path] = error
+                continue
+
+            s3_file_objects.append(s3_file_object)
+
+        ingested_data = self._combine_s3_files(
+            provider_id, s3_list, s3_file_objects, failures,
+            self._make_preprocess(bounds, variables),
+            nested=time_order is not None, variables=variables)
+
+        if ingested_data is not None:
+            self._dataset_cache.put(cache_key, ingested_data, collection_id)
+
+        return ingested_data
+
+    # ------------------------------------------------------------------------
+    # _discard_opens
+    # ------------------------------------------------------------------------
+    @staticmethod
+    def _discard_opens(futures) -> None:
+        """Cancel granule opens that have not started and close the files
+        of those that have, when their results will not be used."""
+        for future in futures:
+
+            if future.cancel():
+                continue
+
+            s3_file_object, _ = future.result()
+
+            if s3_file_object is not None:
+                try:
+                    s3_file_object.close()
+                except Exception as e:
+                    logging.debug(f'Error closing discarded granule: {e}')
 
     # ------------------------------------------------------------------------
     # ingest
     # ------------------------------------------------------------------------
-    @lru_cache(maxsize=32)
-    def ingest(self, provider_id: str, s3_list: list) -> xr.DataArray:
-        """_summary_
+    def ingest(self, provider_id: str, s3_list: list,
+               bounds: tuple = None, variables: tuple = None,
+               collection_id: str = None,
+               granules: dict = None) -> xr.DataArray:
+        """Open a provider's granules as one dataset, or return it from the
+        dataset cache if the same granules were opened the same way before.
+
+        Args:
+            provider_id (str): CMR provider ID, selects the S3 credentials
+            s3_list (list): granule paths
+            bounds (tuple): [west, south, east, north]. When given (and
+                ingest.subset_to_bounds is on), only the lat/lon window
+                around it is kept from each granule.
+            variables (tuple): data variables to keep, all when None
+            collection_id (str): tags the cached dataset, see
+                invalidate_collection
+            granules (dict): s3 path -> GranuleRecord from the CMR query.
+                With ingest.fast_combine, their start times order the
+                granules instead of their time coordinates.
+
+        The granules are read through the collection's storage backend,
+        see storage_backend.
 
         Raises:
-            ValueError: _description_
+            ValueError: the storage backend cannot reach the provider
 
         Returns:
-            _type_: _description_
+            xr.Dataset: None if no granule could be opened
         """
-        temp_s3_creds = self._get_temp_credentials(provider_id)
+        cache_key = (provider_id, tuple(s3_list), bounds, variables)
 
-        s3FileSystem = s3fs.S3FileSystem(
-            anon=False,
-            key=temp_s3_creds['accessKeyId'],
-            secret=temp_s3_creds['secretAccessKey'],
-            token=temp_s3_creds['sessionToken'])
+        ingested_data = self._dataset_cache.get(cache_key)
 
-        s3_file_objects = []
+        if ingested_data is not None:
+            logging.info(f'Using cached {collection_id} dataset')
+            return ingested_data
 
-        for s3_file_path in s3_list:
+        ingested_data = self._open_granules(provider_id, s3_list, bounds,
+                                            variables, granules,
+                                            collection_id)
 
-            logging.debug(f'Opening {s3_file_path}')
+        if ingested_data is not None:
+            self._dataset_cache.put(cache_key, ingested_data, collection_id)
 
-            try:
+        logging.info(f'Dataset cache stats: {self._dataset_cache.stats()}')
 
-                s3_file_object = s3FileSystem.open(s3_file_path)
+        return ingested_data
 
-                s3_file_objects.append(s3_file_object)
+    # ------------------------------------------------------------------------
+    # dataset_cache_stats
+    # ------------------------------------------------------------------------
+    def dataset_cache_stats(self) -> dict:
+        return self._dataset_cache.stats()
 
-            except Exception as e:
+    # ------------------------------------------------------------------------
+    # invalidate_collection
+    # ------------------------------------------------------------------------
+    def invalidate_collection(self, collection_id: str) -> int:
+        """Drop a collection's cached datasets, so its next ingest opens the
+        granules again. Returns the number of datasets dropped."""
+        return self._dataset_cache.invalidate(collection_id)
+
+    # ------------------------------------------------------------------------
+    # _open_granules
+    # ------------------------------------------------------------------------
+    def _open_granules(self, provider_id: str, s3_list: list,
+                       bounds: tuple, variables: tuple,
+                       granules: dict = None,
+                       collection_id: str = None) -> xr.Dataset:
+        """Uncached ingest, see ingest."""
+        preprocess = self._make_preprocess(bounds, variables)
+
+        s3FileSystem = self._get_file_system(collection_id, provider_id)
+
+        if self._reference_index is not None:
+
+            ingested_data = self._ingest_from_references(s3FileSystem,
+                                                         s3_list)
+
+            if ingested_data is not None:
+                if preprocess is not None:
+                    ingested_data = preprocess(ingested_data)
+                return self.normalize(self.rename_dims(ingested_data))
+
+        time_order = self._time_order(s3_list, granules)
+
+        if time_order is not None and \
+                self.config['ingest']['lazy_granules']:
+
+            ingested_data = self._ingest_lazily(s3FileSystem, time_order,
+                                                granules, preprocess)
+
+            if ingested_data is not None:
+                return self.normalize(self.rename_dims(ingested_data))
+
+        if not self.config['ingest']['fast_combine']:
+            time_order = None
+
+        s3_file_objects, failures = self._open_s3_files(
+            s3FileSystem, time_order or s3_list)
+
+        return self._combine_s3_files(provider_id, s3_list, s3_file_objects,
+                                      failures, preprocess,
+                                      nested=time_order is not None,
+                                      variables=variables)
+
+    # ------------------------------------------------------------------------
+    # _time_order
+    # ------------------------------------------------------------------------
+    def _time_order(self, s3_list: list, granules: dict) -> tuple:
+        """The paths sorted by their CMR start time, for the nested
+        combine and lazy ingest. None when a granule has no start time, so
+        the caller combines by coordinates instead."""
+        if not granules:
+            return None
+
+        records = [granules.get(s3_path) for s3_path in s3_list]
+
+        if any(record is None or math.isnan(record.start)
+               for record in records):
+            logging.info('CMR start time missing for some granules, ' +
+                         'combining by coordinates')
+            return None
+
+        return tuple(s3_path for _, s3_path in
+                     sorted(zip((record.start for record in records),
+                                s3_list)))
+
+    # ------------------------------------------------------------------------
+    # _ingest_lazily
+    # ------------------------------------------------------------------------
+    def _ingest_lazily(self, file_system, s3_list: tuple, granules: dict,
+                       preprocess) -> xr.Dataset:
+        """A LazyGranuleDataset over the granules, which opens only the
+        granules a computation touches. None if it cannot be built (e.g. no
+        time dimension), so the caller opens every granule instead."""
+        try:
+            lazy = LazyGranuleDataset(
+                partial(self._open_file, file_system),
+                {s3_path: granules[s3_path] for s3_path in s3_list},
+                preprocess=preprocess,
+                max_open=self.config['ingest']['lazy_max_open'])
+
+            return lazy.to_dataset()
+
+        except Exception as e:
+            logging.warning('Could not build a lazy dataset, opening ' +
+                            f'every granule instead: {e}')
+            return None
+
+    # ------------------------------------------------------------------------
+    # _combine_s3_files
+    # ------------------------------------------------------------------------
+    def _combine_s3_files(self, provider_id: str, s3_list: list,
+                          s3_file_objects: list, failures: dict,
+                          preprocess, nested: bool = False,
+                          variables: tuple = None) -> xr.Dataset:
+        """Combine the opened granules into one normalized dataset, None
+        if none of them opened.
+
+        With a variables allow-list, the first granule's other data
+        variables are passed as drop_variables, so no granule decodes their
+        metadata; preprocess still drops any a later granule adds.
+
+        By default xarray orders and aligns the granules by reading and
+        comparing every granule's coordinates. With nested, the file
+        objects must already be in time order (see _time_order); they are
+        concatenated along time as they are and the lat/lon indexes are
+        taken from the first granule, so nothing is compared. Both modes
+        concatenate every data variable (data_vars='all'), so variables
+        without a time dimension are repeated along time either way and
+        the results are identical.
+        """
+        for s3_file_path, error in failures.items():
+            logging.error(f'Error opening {s3_file_path} for this' +
+                          f' DAAC: {provider_id}: {error}')
 
-                logging.error(f'Error opening {s3_file_path} using these' +
-                              f' credentials {temp_s3_creds} for this' +
-                              f' DAAC: {provider_id}: {e}')
+        logging.info(f'Opened {len(s3_file_objects)} of {len(s3_list)} ' +
+                     f'granules, {len(failures)} failed')
+
+        if self._granule_cache is not None:
+            logging.info('Granule cache stats: ' +
+                         f'{self._granule_cache.stats()}')
 
         if len(s3_file_objects) == 0:
 
@@ -160,13 +894,194 @@ class Ingest(object):
         logging.info('Done opening s3 files, ' +
                      'combining into single XR data-array.')
 
-        ingested_data = xr.open_mfdataset(s3_file_objects, combine='by_coords')
+        if nested:
+            combine_kwargs = {'combine': 'nested',
+                              'concat_dim': 'time',
+                              'data_vars': 'all',
+                              'coords': 'minimal',
+                              'compat': 'override',
+                              'join': 'override'}
+        else:
+            combine_kwargs = {'combine': 'by_coords',
+                              'data_vars': 'all'}
+
+        ingested_data = xr.open_mfdataset(
+            s3_file_objects,
+            preprocess=preprocess,
+            parallel=True,
+            drop_variables=self._variables_to_drop(s3_file_objects[0],
+                                                   variables),
+            **combine_kwargs)
 
         logging.info('Checking if dims/coords need to be renamed')
 
         ingested_data = self.rename_dims(ingested_data)
 
-        return ingested_data
+        return self.normalize(ingested_data)
+
+    # ------------------------------------------------------------------------
+    # _variables_to_drop
+    # ------------------------------------------------------------------------
+    def _variables_to_drop(self, s3_file_object, variables: tuple) -> list:
+        """The granule's data variables not in the allow-list, read from
+        its metadata without decoding. None to keep everything, or if the
+        granule cannot be read here."""
+        if variables is None:
+            return None
+
+        try:
+            with xr.open_dataset(s3_file_object, decode_cf=False) as granule:
+                return variables_to_drop(granule, list(variables))
+
+        except Exception as e:
+            logging.debug(f'Could not list granule variables: {e}')
+            return None
+
+    # ------------------------------------------------------------------------
+    # normalize
+    # ------------------------------------------------------------------------
+    def normalize(self, dataset: xr.Dataset) -> xr.Dataset:
+        """Sort lat/lon ascending and wrap lon to -180..180 (lazily), if
+        ingest.normalize_coordinates is set, so selections can slice the
+        sorted indexes. See normalize_coordinates."""
+        if not self.config['ingest']['normalize_coordinates']:
+            return dataset
+
+        return normalize_coordinates(dataset)
+
+    # ------------------------------------------------------------------------
+    # allowed_variables
+    # ------------------------------------------------------------------------
+    def allowed_variables(self, collection_id: str) -> tuple:
+        """The collection's variable allow-list from data.datasets (plus
+        its data.default variables), written 'collection:variable' like the
+        dashboard's variable options. None, i.e. keep everything, when no
+        data.datasets entry names the collection; data.default entries alone
+        do not restrict it."""
+        variables = {'datasets': [], 'default': []}
+
+        for key, names in variables.items():
+
+            for entry in self.config['data'][key]:
+
+                collection, separator, variable = entry.partition(':')
+
+                if not separator:
+                    logging.warning(f'Ignoring data entry {entry}, ' +
+                                    'expected collection:variable')
+                    continue
+
+                if collection == collection_id and variable not in names:
+                    names.append(variable)
+
+        if not variables['datasets']:
+            return None
+
+        return tuple(variables['datasets'] +
+                     [variable for variable in variables['default']
+                      if variable not in variables['datasets']])
+
+    # ------------------------------------------------------------------------
+    # _make_preprocess
+    # ------------------------------------------------------------------------
+    def _make_preprocess(self, bounds: tuple, variables: tuple):
+        """The per-granule open_mfdataset preprocess hook, None if there
+        is nothing to do. Drops variables not in the allow-list and trims
+        each granule to the bounds (plus ingest.subset_margin degrees), so
+        nothing else is ever read or held."""
+        ingest_config = self.config['ingest']
+
+        steps = []
+
+        if variables is not None:
+            steps.append(partial(select_variables,
+                                 variables=list(variables)))
+
+        if bounds is not None and ingest_config['subset_to_bounds']:
+            steps.append(partial(subset_to_bounds,
+                                 bounds=list(bounds),
+                                 margin=ingest_config['subset_margin']))
+
+        if not steps:
+            return None
+
+        def preprocess(dataset):
+            for step in steps:
+                dataset = step(dataset)
+            return dataset
+
+        return preprocess
+
+    # ------------------------------------------------------------------------
+    # _ingest_from_references
+    # ------------------------------------------------------------------------
+    def _ingest_from_references(self, file_system,
+                                s3_list: list) -> xr.Dataset:
+        """Open the granules as one virtual Zarr store through their
+        reference index, None if that fails (e.g. granules that kerchunk
+        cannot combine), so the caller can open them directly instead.
+        """
+        try:
+            return self._reference_index.open_dataset(file_system, s3_list)
+
+        except Exception as e:
+            logging.warning('Could not open granules through a reference ' +
+                            f'index, opening them directly: {e}')
+            return None
+
+    # ------------------------------------------------------------------------
+    # _open_s3_files
+    # ------------------------------------------------------------------------
+    def _open_s3_files(self, file_system, s3_list: list) -> tuple:
+        """Open every path on a bounded thread pool (ingest.open_workers),
+        so per-object latency overlaps instead of adding up. Reads go
+        through the local granule cache when it is enabled.
+
+        Returns:
+            tuple: the opened file objects, in s3_list order, and a dict of
+                path -> exception for each path that could not be opened
+        """
+        max_workers = max(1, min(self.config['ingest']['open_workers'],
+                                 len(s3_list)))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(
+                partial(self._open_s3_file, file_system), s3_list))
+
+        s3_file_objects = []
+        failures = {}
+
+        for s3_file_path, (s3_file_object, error) in zip(s3_list, results):
+
+            if error is not None:
+                failures[s3_file_path] = error
+                continue
+
+            s3_file_objects.append(s3_file_object)
+
+        return s3_file_objects, failures
+
+    # ------------------------------------------------------------------------
+    # _open_s3_file
+    # ------------------------------------------------------------------------
+    def _open_s3_file(self, file_system, s3_file_path: str) -> tuple:
+        """Open one path, through the granule cache when it is enabled.
+        Returns (file object, None) or (None, exception)."""
+        logging.debug(f'Opening {s3_file_path}')
+        try:
+            return self._open_file(file_system, s3_file_path), None
+        except Exception as e:
+            return None, e
+
+    # ------------------------------------------------------------------------
+    # _open_file
+    # ------------------------------------------------------------------------
+    def _open_file(self, file_system, s3_file_path: str):
+        """A file object for a path, read through the granule cache when
+        it is enabled."""
+        if self._granule_cache is not None:
+            return self._granule_cache.open(file_system, s3_file_path)
+        return file_system.open(s3_file_path)
 
     def rename_dims(self, dataset: xr.Dataset) -> xr.Dataset:
 
@@ -227,6 +1142,13 @@ class Ingest(object):
 
         logging.info('Done ingesting custom s3 data')
 
+        variables = self.allowed_variables(collectionID)
+
+        if variables is not None:
+            data = select_variables(data, list(variables))
+
+        data = self.normalize(data)
+
         return_dict = {'key': collectionID,
                        'data': data,
                        'variables': list(data.variables)}
@@ -237,14 +1159,27 @@ class Ingest(object):
     # ingest_custom_s3
     # ------------------------------------------------------------------------
     def ingest_custom_s3(self, s3_path: str) -> xr.DataArray:
-
+        """Open a custom collection's Zarr store with its native chunks,
+        through its consolidated metadata when it has it. Store metadata is
+        read through the local zarr_metadata_cache when it is enabled.
+        Without zarr 3 the store is opened with open_mfdataset."""
         logging.debug(f'Opening user-supplied s3 path: {s3_path}')
 
         try:
 
-            ingested_data = xr.open_mfdataset([s3_path], engine='zarr')
+            if ZarrMetadataCache.available():
+                ingested_data = open_zarr_store(s3_path,
+                                                self._zarr_metadata_cache)
+            else:
+                ingested_data = xr.open_mfdataset([s3_path], engine='zarr')
 
-            return ingested_data
+            logging.info(f'{s3_path} chunks: {dict(ingested_data.chunks)}')
+
+            if self._zarr_metadata_cache is not None:
+                logging.info('Zarr metadata cache stats: ' +
+                             f'{self._zarr_metadata_cache.stats()}')
+
+            return self.rename_dims(ingested_data)
 
         # ---
         # Need to add more specific error handling
@@ -264,18 +1199,21 @@ class Ingest(object):
     # ------------------------------------------------------------------------
     # refine CMR URL list
     # ------------------------------------------------------------------------
-    def _refine_urls(self, urls: list) -> list:
+    def _refine_urls(self, urls: list, collection_id: str = None) -> list:
         s3list = []
-        suffixes = ('.nc', '.nc4', '.hdf')
-        s3Prefix = 's3://'
 
         for e in urls:
-            if e.endswith(suffixes):
-                if e.startswith(s3Prefix):
-                    s3path = e
-                    s3list.append(s3path)
-                elif e.startswith('http'):
-                    s3path = '/'.join(['s3:/']+e.split('/')[3:])
-                    s3list.append(s3path)
+            s3path = self._refine_url(e, collection_id)
+            if s3path is not None:
+                s3list.append(s3path)
 
         return tuple(s3list)
+
+    # ------------------------------------------------------------------------
+    # refine a single CMR URL
+    # ------------------------------------------------------------------------
+    def _refine_url(self, url: str, collection_id: str = None) -> str:
+        """Rewrite a CMR data URL to the path of the granule in the
+        collection's storage backend (its s3 path by default), None if it is
+        not a supported granule format."""
+        return self.storage_backend(collection_id).granule_path(url)
@@ -0,0 +1,201 @@
+from collections import OrderedDict
+import logging
+import threading
+import uuid
+
+import dask
+import dask.array
+import numpy as np
+import xarray as xr
+
+
+# -----------------------------------------------------------------------------
+# LazyGranuleDataset
+# -----------------------------------------------------------------------------
+class LazyGranuleDataset(object):
+    """A virtual dataset over many granules that opens a granule only when
+    data from its time range is computed.
+
+    to_dataset() opens just the first granule, as a template for the
+    variables, grid and timesteps per granule, and builds the time axis from
+    the CMR start times. Each granule becomes one dask chunk along time
+    whose task opens the granule, so selecting or resampling a time window
+    only opens the granules overlapping it. Opened granules are kept in an
+    LRU of at most max_open handles; evicted handles are released when the
+    last read using them finishes.
+
+    Every granule is assumed to have the template's grid and number of
+    timesteps, at the same offsets from its start time.
+    """
+
+    def __init__(self, open_file, granules: dict, preprocess=None,
+                 max_open: int = 64):
+        """
+        Args:
+            open_file (callable): path -> file object
+            granules (dict): path -> GranuleRecord, every start time set
+            preprocess (callable): applied to each granule once opened
+            max_open (int): granules kept open at once
+        """
+        if not granules:
+            raise ValueError('No granules to open')
+
+        self._open_file = open_file
+        self._preprocess = preprocess
+        self._max_open = max(1, max_open)
+
+        self._granules = granules
+        self._paths = sorted(granules,
+                             key=lambda path: (granules[path].start, path))
+
+        # Task keys are unique to this instance: another dataset over the
+        # same granules may apply a different preprocess (e.g. bounds), so
+        # its chunks must not be shared with this one's in a computation.
+        self._token = uuid.uuid4().hex
+
+        # path -> opened granule, least recently used first
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.opens = 0
+        self.hits = 0
+        self.evictions = 0
+
+    # -------------------------------------------------------------------------
+    # paths
+    # -------------------------------------------------------------------------
+    @property
+    def paths(self) -> list:
+        """Granule paths in time order."""
+        return list(self._paths)
+
+    # -------------------------------------------------------------------------
+    # to_dataset
+    # -------------------------------------------------------------------------
+    def to_dataset(self) -> xr.Dataset:
+
+        template = self._open(self._paths[0])
+
+        if 'time' not in template.dims:
+            raise ValueError('Granules have no time dimension')
+
+        steps = template.sizes['time']
+        offsets = self._time_offsets(template, self._paths[0])
+
+        times = np.concatenate([
+            self._start(path) + offsets
+            for path in self._paths]).astype('datetime64[ns]')
+
+        data_vars = {}
+
+        for name, variable in template.data_vars.items():
+
+            if 'time' not in variable.dims:
+                data_vars[name] = variable.load()
+                continue
+
+            axis = variable.dims.index('time')
+            read = dask.delayed(self._read, pure=True)
+
+            chunks = [
+                dask.array.from_delayed(
+                    read(path, name,
+                         dask_key_name=f'lazy-granule-{name}-' +
+                         dask.base.tokenize(self._token, path, name)),
+                    shape=variable.shape, dtype=variable.dtype)
+                for path in self._paths]
+
+            data_vars[name] = xr.Variable(
+                variable.dims, dask.array.concatenate(chunks, axis=axis),
+                attrs=variable.attrs)
+
+        coords = {name: coord.variable.load()
+                  for name, coord in template.coords.items()
+                  if 'time' not in coord.dims}
+        coords['time'] = ('time', times, template['time'].attrs)
+
+        logging.info(f'Virtual dataset over {len(self._paths)} granules ' +
+                     f'of {steps} timestep(s), opened 1')
+
+        return xr.Dataset(data_vars, coords=coords, attrs=template.attrs)
+
+    # -------------------------------------------------------------------------
+    # stats
+    # -------------------------------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            return {'granules': len(self._paths),
+                    'open': len(self._handles),
+                    'max_open': self._max_open,
+                    'opens': self.opens,
+                    'hits': self.hits,
+                    'evictions': self.evictions}
+
+    # -------------------------------------------------------------------------
+    # close
+    # -------------------------------------------------------------------------
+    def close(self) -> None:
+        with self._lock:
+            self._handles.clear()
+
+    # -------------------------------------------------------------------------
+    # _read
+    # -------------------------------------------------------------------------
+    def _read(self, path: str, name: str) -> np.ndarray:
+        logging.debug(f'Reading {name} from {path}')
+        return self._open(path)[name].values
+
+    # -------------------------------------------------------------------------
+    # _open
+    #
+    # The opened granule from the LRU, opening it on a miss. The open runs
+    # outside the lock so granules can be opened concurrently.
+    # -------------------------------------------------------------------------
+    def _open(self, path: str) -> xr.Dataset:
+
+        with self._lock:
+
+            granule = self._handles.get(path)
+
+            if granule is not None:
+                self._handles.move_to_end(path)
+                self.hits += 1
+                return granule
+
+        logging.debug(f'Opening granule {path}')
+
+        granule = xr.open_dataset(self._open_file(path))
+
+        if self._preprocess is not None:
+            granule = self._preprocess(granule)
+
+        with self._lock:
+
+            self.opens += 1
+            self._handles[path] = granule
+            self._handles.move_to_end(path)
+
+            while len(self._handles) > self._max_open:
+                self._handles.popitem(last=False)
+                self.evictions += 1
+
+        return granule
+
+    # -------------------------------------------------------------------------
+    # _start
+    # -------------------------------------------------------------------------
+    def _start(self, path: str) -> np.datetime64:
+        return np.datetime64(int(self._granules[path].start * 1e6), 'us')
+
+    # -------------------------------------------------------------------------
+    # _time_offsets
+    # -------------------------------------------------------------------------
+    def _time_offsets(self, template: xr.Dataset, path: str) -> np.ndarray:
+        """Template timesteps as offsets from its CMR start time, all zero
+        if its time axis is not datetime."""
+        times = template['time'].values
+
+        if np.issubdtype(times.dtype, np.datetime64):
+            return (times.astype('datetime64[us]') - self._start(path))
+
+        return np.zeros(times.shape, dtype='timedelta64[us]')
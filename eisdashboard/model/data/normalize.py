@@ -0,0 +1,114 @@
+import logging
+
+import numpy as np
+import xarray as xr
+
+
+NORMALIZED_ATTR: str = 'normalized'
+
+
+# -----------------------------------------------------------------------------
+# normalize_coordinates
+# -----------------------------------------------------------------------------
+def normalize_coordinates(dataset: xr.Dataset) -> xr.Dataset:
+    """Give lat and lon ascending, monotonic indexes, with lon in -180..180.
+
+    Descending latitude is reversed with a slice and 0-360 longitude is
+    wrapped and reordered with a lazy index selection, so nothing is loaded.
+    Sets the 'normalized' attribute to 1, so selection code can rely on
+    sorted-index slicing (e.g. sel(lat=slice(south, north))). Expects the
+    lat/lon names from Ingest.rename_dims.
+    """
+    if dataset.attrs.get(NORMALIZED_ATTR):
+        return dataset
+
+    if 'lon' in dataset.dims and 'lon' in dataset.coords:
+
+        longitudes = dataset['lon'].values
+
+        if longitudes.size and (longitudes.max() > 180 or
+                                longitudes.min() < -180):
+            logging.debug('Wrapping longitude to -180..180')
+            dataset = dataset.assign_coords(
+                lon=('lon', (longitudes + 180) % 360 - 180,
+                     dataset['lon'].attrs))
+
+    for dim in ('lat', 'lon'):
+
+        if dim not in dataset.dims or dim not in dataset.coords:
+            continue
+
+        indexer = _ascending_indexer(dataset[dim].values)
+
+        if indexer is not None:
+            logging.debug(f'Sorting {dim} ascending')
+            dataset = dataset.isel({dim: indexer})
+
+    return dataset.assign_attrs({NORMALIZED_ATTR: 1})
+
+
+# -----------------------------------------------------------------------------
+# is_normalized
+# -----------------------------------------------------------------------------
+def is_normalized(data) -> bool:
+    """Whether a dataset or data array has ascending lat and lon indexes,
+    i.e. supports slice-based selection."""
+    for dim in ('lat', 'lon'):
+        if dim in data.dims and dim in data.indexes and \
+                not data.indexes[dim].is_monotonic_increasing:
+            return False
+    return True
+
+
+# -----------------------------------------------------------------------------
+# wrap_longitude
+# -----------------------------------------------------------------------------
+def wrap_longitude(lon: float) -> float:
+    """A longitude in -180..180, e.g. for a map click on a wrapped world
+    copy, to match normalized datasets."""
+    return (lon + 180) % 360 - 180
+
+
+# -----------------------------------------------------------------------------
+# wrap_polygon
+# -----------------------------------------------------------------------------
+def wrap_polygon(geometry: dict) -> dict:
+    """A GeoJSON polygon shifted by whole turns so the center longitude of
+    its outer ring is in -180..180.
+
+    All vertices move together, so a polygon drawn across the antimeridian
+    keeps its shape rather than being wrapped vertex by vertex.
+    """
+    longitudes = [point[0] for point in geometry['coordinates'][0]]
+    center = (min(longitudes) + max(longitudes)) / 2
+    shift = wrap_longitude(center) - center
+
+    if not shift:
+        return geometry
+
+    rings = [[[point[0] + shift, *point[1:]] for point in ring]
+             for ring in geometry['coordinates']]
+
+    return {**geometry, 'coordinates': rings}
+
+
+# -----------------------------------------------------------------------------
+# _ascending_indexer
+#
+# None if the values are already ascending, a reversing slice if they
+# descend, otherwise a stable sort order.
+# -----------------------------------------------------------------------------
+def _ascending_indexer(values: np.ndarray):
+
+    if values.size < 2:
+        return None
+
+    steps = np.diff(values)
+
+    if (steps >= 0).all():
+        return None
+
+    if (steps <= 0).all():
+        return slice(None, None, -1)
+
+    return np.argsort(values, kind='stable')
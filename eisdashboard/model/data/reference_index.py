@@ -0,0 +1,215 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import logging
+import os
+import uuid
+
+from fsspec.implementations.reference import ReferenceFileSystem
+import xarray as xr
+
+try:
+    from fsspec.implementations.asyn_wrapper import AsyncFileSystemWrapper
+    from kerchunk.combine import MultiZarrToZarr
+    from kerchunk.hdf import SingleHdf5ToZarr
+except ImportError:
+    AsyncFileSystemWrapper = None
+    MultiZarrToZarr = None
+    SingleHdf5ToZarr = None
+
+
+# -----------------------------------------------------------------------------
+# ReferenceIndex
+# -----------------------------------------------------------------------------
+class ReferenceIndex(object):
+    """Kerchunk reference indexes of NetCDF4/HDF5 granules, persisted as
+    JSON so a set of granules opens as one virtual Zarr store.
+
+    Building an index reads each granule's HDF5 metadata once and records
+    the byte range of every chunk. The per-granule references are combined
+    along concat_dim and saved under path, keyed by the granule list.
+    Reopening the same granules later reads only the local JSON file, and
+    chunk data is still read from the original objects on demand.
+
+    Needs the optional kerchunk package and an fsspec with
+    AsyncFileSystemWrapper, see available().
+    """
+
+    DEFAULT_PATH: str = os.path.join(os.path.expanduser('~'), '.cache',
+                                     'eis-dashboard', 'references')
+
+    def __init__(self, path: str = None, concat_dim: str = 'time',
+                 max_workers: int = 16):
+
+        self._path = path or self.DEFAULT_PATH
+        self._concat_dim = concat_dim
+        self._max_workers = max_workers
+
+        os.makedirs(self._path, exist_ok=True)
+
+    # -------------------------------------------------------------------------
+    # available
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def available() -> bool:
+        return MultiZarrToZarr is not None and \
+            AsyncFileSystemWrapper is not None
+
+    # -------------------------------------------------------------------------
+    # make_key
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def make_key(s3_list: list) -> str:
+        """Stable key for a set of granules, independent of their order."""
+        return hashlib.sha256(
+            '\n'.join(sorted(s3_list)).encode('utf-8')).hexdigest()
+
+    # -------------------------------------------------------------------------
+    # open_dataset
+    # -------------------------------------------------------------------------
+    def open_dataset(self, file_system, s3_list: list) -> xr.Dataset:
+        """Open the granules as one dataset through their reference index,
+        building and saving the index first if there is none yet. An index
+        is only saved once every granule could be indexed.
+
+        Args:
+            file_system: fsspec filesystem the granules are read from
+            s3_list (list): granule paths
+
+        Raises:
+            ValueError: a granule could not be indexed
+
+        Returns:
+            xr.Dataset: lazily loaded, chunked like the granules
+        """
+        key = self.make_key(s3_list)
+
+        references = self.load(key)
+
+        if references is None:
+            references = self.build(file_system, s3_list)
+            self.save(key, references)
+        else:
+            logging.info(f'Opening {len(s3_list)} granules from reference ' +
+                         f'index {key}')
+
+        return self.open_references(references, file_system)
+
+    # -------------------------------------------------------------------------
+    # build
+    # -------------------------------------------------------------------------
+    def build(self, file_system, s3_list: list) -> dict:
+        """Index every granule and combine the references along
+        concat_dim.
+
+        Raises:
+            ValueError: a granule could not be indexed. Each failure is
+                logged; nothing is combined, so a transient read error is
+                not kept as a partial index.
+        """
+        logging.info(f'Building reference index for {len(s3_list)} ' +
+                     'granules')
+
+        def index_granule(s3_path):
+            try:
+                with file_system.open(s3_path) as granule_file:
+                    return SingleHdf5ToZarr(
+                        granule_file,
+                        file_system.unstrip_protocol(s3_path),
+                        inline_threshold=0).translate(), None
+            except Exception as e:
+                return None, e
+
+        max_workers = max(1, min(self._max_workers, len(s3_list)))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(index_granule, s3_list))
+
+        granule_references = []
+        failures = 0
+
+        for s3_path, (references, error) in zip(s3_list, results):
+
+            if error is not None:
+                logging.error(f'Error indexing {s3_path}: {error}')
+                failures += 1
+                continue
+
+            granule_references.append(references)
+
+        if failures:
+            raise ValueError(f'{failures} of {len(s3_list)} granules could ' +
+                             'not be indexed')
+
+        return MultiZarrToZarr(
+            granule_references,
+            remote_protocol=self._protocol(file_system),
+            concat_dims=[self._concat_dim],
+            coo_map={self._concat_dim: f'cf:{self._concat_dim}'}).translate()
+
+    # -------------------------------------------------------------------------
+    # open_references
+    # -------------------------------------------------------------------------
+    def open_references(self, references: dict,
+                        file_system) -> xr.Dataset:
+
+        protocol = self._protocol(file_system)
+
+        # Zarr reads chunks through the async API
+        if not file_system.async_impl:
+            file_system = AsyncFileSystemWrapper(file_system)
+
+        reference_file_system = ReferenceFileSystem(
+            fo=references,
+            fs={protocol: file_system})
+
+        return xr.open_dataset(reference_file_system.get_mapper(),
+                               engine='zarr',
+                               consolidated=False,
+                               chunks={})
+
+    # -------------------------------------------------------------------------
+    # load
+    # -------------------------------------------------------------------------
+    def load(self, key: str) -> dict:
+        """The saved index for key, None if there is none."""
+        try:
+            with open(self._index_path(key)) as index_file:
+                return json.load(index_file)
+
+        except FileNotFoundError:
+            return None
+
+        except ValueError as e:
+            logging.warning(f'Ignoring unreadable reference index {key}: ' +
+                            f'{e}')
+            return None
+
+    # -------------------------------------------------------------------------
+    # save
+    # -------------------------------------------------------------------------
+    def save(self, key: str, references: dict) -> None:
+
+        index_path = self._index_path(key)
+        temp_path = f'{index_path}.{uuid.uuid4().hex}.tmp'
+
+        with open(temp_path, 'w') as index_file:
+            json.dump(references, index_file)
+
+        os.replace(temp_path, index_path)
+
+        logging.info(f'Saved reference index to {index_path}')
+
+    # -------------------------------------------------------------------------
+    # _protocol
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _protocol(file_system) -> str:
+        protocol = file_system.protocol
+        return protocol if isinstance(protocol, str) else protocol[0]
+
+    # -------------------------------------------------------------------------
+    # _index_path
+    # -------------------------------------------------------------------------
+    def _index_path(self, key: str) -> str:
+        return os.path.join(self._path, f'{key}.json')
@@ -0,0 +1,180 @@
+import logging
+import posixpath
+
+import fsspec
+
+from eisdashboard.model.data.credentials import CredentialManager
+
+
+GRANULE_SUFFIXES: tuple = ('.nc', '.nc4', '.hdf')
+
+
+# -----------------------------------------------------------------------------
+# to_s3_path
+# -----------------------------------------------------------------------------
+def to_s3_path(url: str) -> str:
+    """Rewrite a CMR data URL to its s3 path, None if it is not a supported
+    granule format. https URLs keep their path after the host, whose first
+    part is the bucket."""
+    if url.endswith(GRANULE_SUFFIXES):
+        if url.startswith('s3://'):
+            return url
+        elif url.startswith('http'):
+            return '/'.join(['s3:/'] + url.split('/')[3:])
+
+    return None
+
+
+# -----------------------------------------------------------------------------
+# StorageBackend
+# -----------------------------------------------------------------------------
+class StorageBackend(object):
+    """Where a collection's granules are read from: maps CMR data URLs to
+    paths and gives the fsspec filesystem that opens them. Every backend
+    lays granules out as bucket/key, like their s3 path."""
+
+    PROTOCOL: str = None
+
+    # -------------------------------------------------------------------------
+    # granule_path
+    # -------------------------------------------------------------------------
+    def granule_path(self, url: str) -> str:
+        """The path to open for a CMR data URL, None if it is not a
+        supported granule format."""
+        raise NotImplementedError
+
+    # -------------------------------------------------------------------------
+    # get_file_system
+    # -------------------------------------------------------------------------
+    def get_file_system(self, provider_id: str):
+        """The filesystem for a provider's granules, None if it cannot be
+        reached (e.g. no S3 credentials)."""
+        raise NotImplementedError
+
+
+# -----------------------------------------------------------------------------
+# S3Backend
+# -----------------------------------------------------------------------------
+class S3Backend(StorageBackend):
+    """The DAAC S3 buckets, with each provider's temporary credentials."""
+
+    PROTOCOL: str = 's3'
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, credentials: CredentialManager):
+        self._credentials = credentials
+
+    # -------------------------------------------------------------------------
+    # granule_path
+    # -------------------------------------------------------------------------
+    def granule_path(self, url: str) -> str:
+        return to_s3_path(url)
+
+    # -------------------------------------------------------------------------
+    # get_file_system
+    # -------------------------------------------------------------------------
+    def get_file_system(self, provider_id: str):
+        return self._credentials.get_file_system(provider_id)
+
+
+# -----------------------------------------------------------------------------
+# LocalBackend
+# -----------------------------------------------------------------------------
+class LocalBackend(StorageBackend):
+    """A mirror of the buckets on a local or parallel filesystem, granules
+    at <root>/<bucket>/<key>."""
+
+    PROTOCOL: str = 'file'
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, root: str):
+
+        if not root:
+            raise ValueError('A file storage backend needs a root')
+
+        self._file_system = fsspec.filesystem('file')
+        self._root = self._file_system._strip_protocol(root)
+
+    # -------------------------------------------------------------------------
+    # granule_path
+    # -------------------------------------------------------------------------
+    def granule_path(self, url: str) -> str:
+        s3_path = to_s3_path(url)
+
+        if s3_path is None:
+            return None
+
+        return posixpath.join(self._root, s3_path[len('s3://'):])
+
+    # -------------------------------------------------------------------------
+    # get_file_system
+    # -------------------------------------------------------------------------
+    def get_file_system(self, provider_id: str):
+        return self._file_system
+
+
+# -----------------------------------------------------------------------------
+# MemoryBackend
+# -----------------------------------------------------------------------------
+class MemoryBackend(StorageBackend):
+    """fsspec's in-memory filesystem, granules at
+    memory://<root>/<bucket>/<key>. The store is shared by the whole
+    process, so a benchmark or test can write synthetic granules with
+    fsspec.filesystem('memory') and ingest them offline."""
+
+    PROTOCOL: str = 'memory'
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, root: str = ''):
+        self._file_system = fsspec.filesystem('memory')
+        self._root = root.strip('/')
+
+    # -------------------------------------------------------------------------
+    # granule_path
+    # -------------------------------------------------------------------------
+    def granule_path(self, url: str) -> str:
+        s3_path = to_s3_path(url)
+
+        if s3_path is None:
+            return None
+
+        return 'memory://' + posixpath.join('/', self._root,
+                                            s3_path[len('s3://'):])
+
+    # -------------------------------------------------------------------------
+    # get_file_system
+    # -------------------------------------------------------------------------
+    def get_file_system(self, provider_id: str):
+        return self._file_system
+
+
+# -----------------------------------------------------------------------------
+# make_backend
+# -----------------------------------------------------------------------------
+def make_backend(protocol: str, root: str,
+                 credentials: CredentialManager) -> StorageBackend:
+    """The backend for a storage config entry.
+
+    Raises:
+        ValueError: unknown protocol, or a file backend without a root
+    """
+    logging.debug(f'Storage backend: {protocol}, root: {root!r}')
+
+    if protocol == S3Backend.PROTOCOL:
+        return S3Backend(credentials)
+
+    if protocol == LocalBackend.PROTOCOL:
+        return LocalBackend(root)
+
+    if protocol == MemoryBackend.PROTOCOL:
+        return MemoryBackend(root)
+
+    raise ValueError(f'Unknown storage protocol: {protocol}, expected ' +
+                     f'one of {S3Backend.PROTOCOL}, {LocalBackend.PROTOCOL} ' +
+                     f'or {MemoryBackend.PROTOCOL}')
@@ -0,0 +1,151 @@
+import math
+
+import numpy as np
+import xarray as xr
+
+
+LAT_NAMES: tuple = ('lat', 'latitude')
+LON_NAMES: tuple = ('lon', 'longitude')
+
+
+# -----------------------------------------------------------------------------
+# subset_to_bounds
+# -----------------------------------------------------------------------------
+def subset_to_bounds(dataset: xr.Dataset, bounds: list,
+                     margin: float = 0.0) -> xr.Dataset:
+    """Lazily select the lat/lon window covering the bounds.
+
+    The window is widened by margin degrees, and by at least one grid cell,
+    on each side so boxes smaller than a cell keep the cells around them.
+    Works on descending-latitude and 0-360 longitude grids, with
+    lat/latitude and lon/longitude dims in any capitalization.
+    Used as the open_mfdataset preprocess hook, so it is applied to every
+    granule before anything is read.
+
+    Args:
+        dataset (xr.Dataset): a granule or combined dataset
+        bounds (list): [west, south, east, north], longitudes -180..180
+        margin (float): extra degrees kept on each side
+    """
+    west, south, east, north = bounds
+
+    indexers = {}
+
+    lat_dim = _find_dim(dataset, LAT_NAMES)
+
+    if lat_dim is not None:
+        latitudes = dataset[lat_dim].values
+        pad = max(margin, _grid_step(latitudes))
+        indexers[lat_dim] = _to_indexer(
+            (latitudes >= south - pad) & (latitudes <= north + pad))
+
+    lon_dim = _find_dim(dataset, LON_NAMES)
+
+    if lon_dim is not None:
+        longitudes = dataset[lon_dim].values
+        pad = max(margin, _grid_step(longitudes))
+        indexers[lon_dim] = _to_indexer(
+            _longitude_mask(longitudes, west - pad, east + pad))
+
+    return dataset.isel(indexers)
+
+
+# -----------------------------------------------------------------------------
+# subset_to_time_range
+# -----------------------------------------------------------------------------
+def subset_to_time_range(dataset: xr.Dataset,
+                         time_range: tuple) -> xr.Dataset:
+    """Select the timesteps in (start, end) POSIX timestamps, NaN ends are
+    open. Non-datetime time axes are left as they are."""
+    if 'time' not in dataset.dims or \
+            not np.issubdtype(dataset['time'].dtype, np.datetime64):
+        return dataset
+
+    times = dataset['time'].values
+    start, end = time_range
+    keep = np.ones(times.shape, dtype=bool)
+
+    if not math.isnan(start):
+        keep &= times >= np.datetime64(int(start), 's')
+
+    if not math.isnan(end):
+        keep &= times <= np.datetime64(int(end), 's')
+
+    return dataset.isel(time=_to_indexer(keep))
+
+
+# -----------------------------------------------------------------------------
+# select_variables
+# -----------------------------------------------------------------------------
+def select_variables(dataset: xr.Dataset, variables: list) -> xr.Dataset:
+    """Keep only the listed data variables (and their coordinates).
+    Names the dataset does not have are ignored."""
+    return dataset[[variable for variable in variables
+                    if variable in dataset.data_vars]]
+
+
+# -----------------------------------------------------------------------------
+# variables_to_drop
+# -----------------------------------------------------------------------------
+def variables_to_drop(dataset: xr.Dataset, variables: list) -> list:
+    """The data variables not in the allow-list, for open_dataset's
+    drop_variables. Coordinates are always kept."""
+    return [variable for variable in dataset.data_vars
+            if variable not in variables]
+
+
+# -----------------------------------------------------------------------------
+# _find_dim
+# -----------------------------------------------------------------------------
+def _find_dim(dataset: xr.Dataset, names: tuple) -> str:
+    for dim in dataset.dims:
+        if dim.lower() in names and dim in dataset.coords:
+            return dim
+    return None
+
+
+# -----------------------------------------------------------------------------
+# _grid_step
+# -----------------------------------------------------------------------------
+def _grid_step(coordinate: np.ndarray) -> float:
+    """Typical cell size, the median so a seam in a rolled 0-360 grid does
+    not count."""
+    if coordinate.size < 2:
+        return 0.0
+    return float(np.median(np.abs(np.diff(coordinate))))
+
+
+# -----------------------------------------------------------------------------
+# _longitude_mask
+# -----------------------------------------------------------------------------
+def _longitude_mask(longitudes: np.ndarray, west: float,
+                    east: float) -> np.ndarray:
+    """Longitudes between west and east, comparing on the grid's own
+    convention (-180..180 or 0..360) and across the wrap."""
+    if east - west >= 360:
+        return np.ones(longitudes.shape, dtype=bool)
+
+    if longitudes.size and longitudes.max() > 180:
+        west, east = west % 360, east % 360
+    else:
+        west, east = (west + 180) % 360 - 180, (east + 180) % 360 - 180
+
+    if west <= east:
+        return (longitudes >= west) & (longitudes <= east)
+
+    # The window crosses the grid's seam
+    return (longitudes >= west) | (longitudes <= east)
+
+
+# -----------------------------------------------------------------------------
+# _to_indexer
+#
+# Contiguous selections become slices, which every backend reads lazily.
+# -----------------------------------------------------------------------------
+def _to_indexer(mask: np.ndarray):
+    indices = np.nonzero(mask)[0]
+
+    if indices.size and indices[-1] - indices[0] + 1 == indices.size:
+        return slice(int(indices[0]), int(indices[-1]) + 1)
+
+    return indices
@@ -0,0 +1,164 @@
+from eisdashboard.model.data.subset import subset_to_bounds
+from eisdashboard.model.data.subset import subset_to_time_range
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+
+import xarray as xr
+
+
+# -----------------------------------------------------------------------------
+# SubsetStore
+# -----------------------------------------------------------------------------
+class SubsetStore(object):
+    """Local Zarr copies of query subsets, laid out for time-series reads.
+
+    Granules come one timestep per file, so a point or polygon time series
+    touches every granule. The subset of a query (its bounds and time range)
+    is written once to path/<key>.zarr with each chunk holding the full time
+    axis of a spatial_chunk x spatial_chunk tile. A time series is then a
+    single chunk read. The query state (newest CMR revision date and the
+    granules covered, with their revision dates) is saved beside it, so
+    refreshing a reused store only fetches granules added or revised since
+    it was written.
+    """
+
+    DEFAULT_PATH: str = os.path.join(os.path.expanduser('~'), '.cache',
+                                     'eis-dashboard', 'subsets')
+
+    SPATIAL_DIMS: tuple = ('lat', 'lon')
+
+    # Encoding carried over from the granules that would clash with the
+    # new chunks
+    CHUNK_ENCODINGS: tuple = ('chunks', 'preferred_chunks', 'chunksizes',
+                              'contiguous')
+
+    def __init__(self, path: str = None, spatial_chunk: int = 16):
+
+        self._path = path or self.DEFAULT_PATH
+        self._spatial_chunk = spatial_chunk
+
+        os.makedirs(self._path, exist_ok=True)
+
+    # -------------------------------------------------------------------------
+    # make_key
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def make_key(query_package: dict, variables: tuple = None) -> str:
+        """Stable key for a query package (collection, time and bounds)
+        and the variables kept from it."""
+        query = json.dumps({'collection_id': query_package['collection_id'],
+                            'datetime': query_package['datetime'],
+                            'coords': list(query_package['coords']),
+                            'spatialParameter':
+                                query_package['spatialParameter'],
+                            'variables': sorted(variables or [])},
+                           sort_keys=True)
+
+        return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+    # -------------------------------------------------------------------------
+    # open
+    # -------------------------------------------------------------------------
+    def open(self, key: str) -> tuple:
+        """The stored subset and its query state, None if there is none."""
+        store_path = self._store_path(key)
+
+        try:
+            with open(self._state_path(key)) as state_file:
+                state = json.load(state_file)
+
+            dataset = xr.open_zarr(store_path, consolidated=True)
+
+        except (OSError, ValueError, KeyError) as e:
+            if os.path.exists(store_path):
+                logging.warning('Ignoring unreadable subset store ' +
+                                f'{store_path}: {e}')
+            return None
+
+        logging.info(f'Opened materialized subset {store_path}')
+
+        state['file_urls'] = set(state['file_urls'])
+        state.setdefault('revisions', {})
+
+        return dataset, state
+
+    # -------------------------------------------------------------------------
+    # write
+    # -------------------------------------------------------------------------
+    def write(self, key: str, dataset: xr.Dataset, bounds: list,
+              time_range: tuple, state: dict) -> xr.Dataset:
+        """Subset dataset to the bounds and time range, write it
+        time-contiguous and return the dataset opened from the store.
+
+        Args:
+            key (str): make_key of the query package
+            dataset (xr.Dataset): the ingested granules
+            bounds (list): [west, south, east, north]
+            time_range (tuple): (start, end) POSIX timestamps, NaN if open
+            state (dict): query state, revision_date, file_urls and
+                revisions
+        """
+        subset = subset_to_time_range(subset_to_bounds(dataset, bounds),
+                                      time_range)
+
+        subset = self.rechunk(subset)
+
+        store_path = self._store_path(key)
+        temp_path = f'{store_path}.{uuid.uuid4().hex}.tmp'
+
+        logging.info(f'Materializing {dict(subset.sizes)} subset to ' +
+                     f'{store_path}')
+
+        try:
+            subset.to_zarr(temp_path, mode='w', consolidated=True)
+
+            if os.path.exists(store_path):
+                shutil.rmtree(store_path)
+
+            os.replace(temp_path, store_path)
+
+        finally:
+            if os.path.exists(temp_path):
+                shutil.rmtree(temp_path)
+
+        with open(self._state_path(key), 'w') as state_file:
+            json.dump({'revision_date': state['revision_date'],
+                       'file_urls': sorted(state['file_urls']),
+                       'revisions': state.get('revisions', {})},
+                      state_file)
+
+        return xr.open_zarr(store_path, consolidated=True)
+
+    # -------------------------------------------------------------------------
+    # rechunk
+    # -------------------------------------------------------------------------
+    def rechunk(self, dataset: xr.Dataset) -> xr.Dataset:
+        """Full time axis per chunk, spatial_chunk cells per spatial dim,
+        other dims whole."""
+        chunks = {dim: self._spatial_chunk if dim in self.SPATIAL_DIMS
+                  else -1 for dim in dataset.dims}
+
+        dataset = dataset.chunk(chunks)
+
+        for variable in dataset.variables.values():
+            for encoding in self.CHUNK_ENCODINGS:
+                variable.encoding.pop(encoding, None)
+
+        return dataset
+
+    # -------------------------------------------------------------------------
+    # _store_path
+    # -------------------------------------------------------------------------
+    def _store_path(self, key: str) -> str:
+        return os.path.join(self._path, f'{key}.zarr')
+
+    # -------------------------------------------------------------------------
+    # _state_path
+    # -------------------------------------------------------------------------
+    def _state_path(self, key: str) -> str:
+        return os.path.join(self._path, f'{key}.json')
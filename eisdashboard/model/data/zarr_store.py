@@ -0,0 +1,206 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import xarray as xr
+
+try:
+    from zarr.abc.store import Store
+    from zarr.storage import FsspecStore
+    from zarr.storage import WrapperStore
+except ImportError:
+    # zarr 2, see ZarrMetadataCache.available()
+    Store = None
+    FsspecStore = None
+    WrapperStore = object
+
+
+# Documents holding Zarr v2 and v3 group/array metadata
+METADATA_KEYS: tuple = ('zarr.json', '.zmetadata', '.zgroup', '.zattrs',
+                        '.zarray')
+
+
+# -----------------------------------------------------------------------------
+# ZarrMetadataCache
+# -----------------------------------------------------------------------------
+class ZarrMetadataCache(object):
+    """Local copies of the metadata documents of remote Zarr stores.
+
+    Each store gets a directory, named by a hash of its URL, holding the
+    metadata documents read from it under their store keys. Documents the
+    store does not have (e.g. the v2 keys probed on a v3 store) are kept as
+    empty files, which no real metadata document is. Copies older than ttl
+    seconds are read again from the store, so a store that gains
+    consolidated metadata is picked up. Chunks are never cached here.
+
+    Needs zarr 3's store API, see available().
+    """
+
+    DEFAULT_PATH: str = os.path.join(os.path.expanduser('~'), '.cache',
+                                     'eis-dashboard', 'zarr_metadata')
+
+    def __init__(self, path: str = None, ttl: int = 86400):
+
+        self._path = path or self.DEFAULT_PATH
+        self._ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # available
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def available() -> bool:
+        """Whether zarr 3, whose stores the cache and open_zarr_store
+        wrap, is installed."""
+        return FsspecStore is not None
+
+    # -------------------------------------------------------------------------
+    # get
+    # -------------------------------------------------------------------------
+    def get(self, store_url: str, key: str) -> bytes:
+        """The cached document, b'' if the store does not have it, None
+        on a miss or if it expired."""
+        path = self._document_path(store_url, key)
+
+        try:
+            if time.time() - os.path.getmtime(path) <= self._ttl:
+                with open(path, 'rb') as document:
+                    data = document.read()
+                with self._lock:
+                    self.hits += 1
+                return data
+
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            self.misses += 1
+
+        return None
+
+    # -------------------------------------------------------------------------
+    # put
+    # -------------------------------------------------------------------------
+    def put(self, store_url: str, key: str, data: bytes) -> None:
+        """Cache a document, b'' to record that the store does not have
+        it."""
+        path = self._document_path(store_url, key)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        file_descriptor, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path))
+
+        with os.fdopen(file_descriptor, 'wb') as document:
+            document.write(data)
+
+        os.replace(temp_path, path)
+
+    # -------------------------------------------------------------------------
+    # stats
+    # -------------------------------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_ratio': self.hits / lookups if lookups else 0.0}
+
+    # -------------------------------------------------------------------------
+    # _document_path
+    # -------------------------------------------------------------------------
+    def _document_path(self, store_url: str, key: str) -> str:
+        store_hash = hashlib.sha256(
+            store_url.rstrip('/').encode('utf-8')).hexdigest()
+        return os.path.join(self._path, store_hash, *key.split('/'))
+
+
+# -----------------------------------------------------------------------------
+# open_zarr_store
+# -----------------------------------------------------------------------------
+def open_zarr_store(url: str, metadata_cache: ZarrMetadataCache = None,
+                    storage_options: dict = None) -> xr.Dataset:
+    """Open a Zarr store lazily, with its native chunking.
+
+    Reads consolidated metadata (one document for the whole store) when the
+    store has it, and every group/array document otherwise. With a
+    metadata_cache those documents are served from local copies, so only
+    chunks are read from the store. Needs zarr 3, see
+    ZarrMetadataCache.available().
+
+    Args:
+        url (str): store URL, e.g. s3://bucket/store.zarr or file:///path
+        metadata_cache (ZarrMetadataCache): local metadata copies
+        storage_options (dict): passed to the fsspec filesystem
+    """
+    store = FsspecStore.from_url(url, read_only=True,
+                                 storage_options=storage_options)
+
+    if metadata_cache is not None:
+        store = _MetadataCachingStore(store, metadata_cache, url)
+
+    try:
+        dataset = xr.open_zarr(store, consolidated=True, chunks={})
+
+        logging.debug(f'Opened {url} with consolidated metadata')
+
+    except ValueError:
+        logging.info(f'{url} has no consolidated metadata, reading each ' +
+                     'group and array document')
+
+        dataset = xr.open_zarr(store, consolidated=False, chunks={})
+
+    return dataset
+
+
+# -----------------------------------------------------------------------------
+# _MetadataCachingStore
+#
+# Read-only store wrapper that reads metadata documents through a
+# ZarrMetadataCache and everything else from the wrapped store.
+# -----------------------------------------------------------------------------
+class _MetadataCachingStore(WrapperStore):
+
+    def __init__(self, store: Store, metadata_cache: ZarrMetadataCache,
+                 url: str):
+        super().__init__(store)
+        self._metadata_cache = metadata_cache
+        self._url = url
+
+    # -------------------------------------------------------------------------
+    # get
+    # -------------------------------------------------------------------------
+    async def get(self, key, prototype, byte_range=None):
+
+        if byte_range is not None or \
+                key.rsplit('/', 1)[-1] not in METADATA_KEYS:
+            return await self._store.get(key, prototype, byte_range)
+
+        data = self._metadata_cache.get(self._url, key)
+
+        if data is not None:
+            return prototype.buffer.from_bytes(data) if data else None
+
+        buffer = await self._store.get(key, prototype)
+
+        self._metadata_cache.put(
+            self._url, key, buffer.to_bytes() if buffer is not None else b'')
+
+        return buffer
+
+    # -------------------------------------------------------------------------
+    # _get_many
+    #
+    # The wrapper forwards batched reads straight to the wrapped store, read
+    # them one at a time through get instead.
+    # -------------------------------------------------------------------------
+    async def _get_many(self, requests):
+        for request in requests:
+            yield request[0], await self.get(*request)
@@ -3,6 +3,7 @@ import panel as pn
 import random
 
 from eisdashboard.model.dashboard import Dashboard
+from eisdashboard.model.data.normalize import wrap_polygon
 from eisdashboard.model.streams import PolygonDrawStream
 import eisdashboard.model.utils as utils
 
@@ -47,7 +48,9 @@ class PolygonDrawDashboard(Dashboard):
         if geometryDict["type"] != "Polygon":
             return
 
-        PolygonDrawDashboard.polyStream.event(polygon=geometryDict)
+        # Polygons drawn on a wrapped world copy are moved into -180..180
+        PolygonDrawDashboard.polyStream.event(
+            polygon=wrap_polygon(geometryDict))
 
     # ------------------------------------------------------------------------
     # generateTimeSeriesGrid
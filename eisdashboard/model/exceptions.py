@@ -7,3 +7,10 @@ class DashboardRuntimeException(Exception):
 
     def __init__(self, message):
         super().__init__(message)
+
+
+class CmrQueryError(DashboardRuntimeException):
+    """
+    A CMR search could not be completed (a page request failed or returned
+    an unreadable response), so its granule list would be truncated.
+    """
@@ -0,0 +1,181 @@
+from datetime import datetime, timezone
+import math
+
+
+# -----------------------------------------------------------------------------
+# class GranuleRecord
+#
+# Compact record of the CMR metadata the dashboard uses for one granule.
+# Uses __slots__ so large result sets do not carry a dict per granule, and
+# holds the temporal range as POSIX timestamps (seconds, UTC) and the spatial
+# extent as a float bounding box instead of the raw UMM blobs. Missing values
+# are NaN.
+# -----------------------------------------------------------------------------
+class GranuleRecord(object):
+
+    __slots__ = ('file_name', 'file_url', 'provider_id', 'day_night_flag',
+                 'revision_date', 'start', 'end', 'west', 'south', 'east',
+                 'north')
+
+    TIMESTAMP_FORMATS = ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S',
+                         '%Y-%m-%d')
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 file_name,
+                 file_url,
+                 provider_id,
+                 start=math.nan,
+                 end=math.nan,
+                 west=math.nan,
+                 south=math.nan,
+                 east=math.nan,
+                 north=math.nan,
+                 day_night_flag=None,
+                 revision_date=None):
+
+        self.file_name = file_name
+        self.file_url = file_url
+        self.provider_id = provider_id
+        self.start = start
+        self.end = end
+        self.west = west
+        self.south = south
+        self.east = east
+        self.north = north
+        self.day_night_flag = day_night_flag
+        self.revision_date = revision_date
+
+    # -------------------------------------------------------------------------
+    # bbox
+    # -------------------------------------------------------------------------
+    @property
+    def bbox(self) -> tuple:
+        return (self.west, self.south, self.east, self.north)
+
+    # -------------------------------------------------------------------------
+    # fromUmm
+    #
+    # Build a record from one item of a granules.umm_json_v1_4 response in a
+    # single pass. Raises KeyError if the item has no URLs or provider.
+    # -------------------------------------------------------------------------
+    @classmethod
+    def fromUmm(cls, hit: dict):
+
+        umm = hit['umm']
+        relatedUrls = umm['RelatedUrls']
+
+        rangeDateTime = umm.get('TemporalExtent', {}).get('RangeDateTime')
+
+        if isinstance(rangeDateTime, dict):
+            start = cls.parseTimestamp(rangeDateTime.get('BeginningDateTime'))
+            end = cls.parseTimestamp(rangeDateTime.get('EndingDateTime'))
+        else:
+            start = end = math.nan
+
+        west, south, east, north = cls.parseBoundingBox(
+            umm.get('SpatialExtent', {}).get('HorizontalSpatialDomain'))
+
+        return cls(file_name=relatedUrls[0]['URL'].split('/')[-1],
+                   file_url=relatedUrls[1]['URL'],
+                   provider_id=hit['meta']['provider-id'],
+                   start=start,
+                   end=end,
+                   west=west,
+                   south=south,
+                   east=east,
+                   north=north,
+                   day_night_flag=umm.get('DataGranule', {}).get(
+                       'DayNightFlag'),
+                   revision_date=hit['meta'].get('revision-date'))
+
+    # -------------------------------------------------------------------------
+    # parseTimestamp
+    # -------------------------------------------------------------------------
+    @classmethod
+    def parseTimestamp(cls, value) -> float:
+        """Parse a CMR (ISO 8601, UTC) date-time string to a POSIX
+        timestamp, NaN if it is missing or not parseable."""
+        if not isinstance(value, str):
+            return math.nan
+
+        value = value.rstrip('Z').replace('+00:00', '')
+
+        for timestampFormat in cls.TIMESTAMP_FORMATS:
+            try:
+                parsed = datetime.strptime(value, timestampFormat)
+            except ValueError:
+                continue
+            return parsed.replace(tzinfo=timezone.utc).timestamp()
+
+        return math.nan
+
+    # -------------------------------------------------------------------------
+    # parseBoundingBox
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def parseBoundingBox(horizontalSpatialDomain) -> tuple:
+        """Envelope (west, south, east, north) of every bounding rectangle
+        and polygon in a UMM HorizontalSpatialDomain. A single rectangle
+        crossing the antimeridian keeps west > east."""
+        if not isinstance(horizontalSpatialDomain, dict):
+            return (math.nan,) * 4
+
+        geometry = horizontalSpatialDomain.get('Geometry', {})
+
+        rectangles = geometry.get('BoundingRectangles', [])
+
+        if len(rectangles) == 1:
+            rectangle = rectangles[0]
+            return (float(rectangle['WestBoundingCoordinate']),
+                    float(rectangle['SouthBoundingCoordinate']),
+                    float(rectangle['EastBoundingCoordinate']),
+                    float(rectangle['NorthBoundingCoordinate']))
+
+        lons = []
+        lats = []
+
+        for rectangle in rectangles:
+            lons.extend((rectangle['WestBoundingCoordinate'],
+                         rectangle['EastBoundingCoordinate']))
+            lats.extend((rectangle['SouthBoundingCoordinate'],
+                         rectangle['NorthBoundingCoordinate']))
+
+        for polygon in geometry.get('GPolygons', []):
+            for point in polygon['Boundary']['Points']:
+                lons.append(point['Longitude'])
+                lats.append(point['Latitude'])
+
+        if not lons:
+            return (math.nan,) * 4
+
+        return (float(min(lons)), float(min(lats)),
+                float(max(lons)), float(max(lats)))
+
+    # -------------------------------------------------------------------------
+    # __eq__
+    # -------------------------------------------------------------------------
+    def __eq__(self, other):
+        if not isinstance(other, GranuleRecord):
+            return NotImplemented
+
+        # NaN != NaN, treat two missing values as equal
+        return all(
+            getattr(self, name) == getattr(other, name) or
+            (_isNan(getattr(self, name)) and _isNan(getattr(other, name)))
+            for name in self.__slots__)
+
+    __hash__ = None
+
+    # -------------------------------------------------------------------------
+    # __repr__
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        return f'GranuleRecord({self.file_name!r}, start={self.start}, ' + \
+            f'end={self.end}, bbox={self.bbox})'
+
+
+def _isNan(value) -> bool:
+    return isinstance(value, float) and math.isnan(value)
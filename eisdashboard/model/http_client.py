@@ -0,0 +1,161 @@
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# -----------------------------------------------------------------------------
+# class HttpClient
+#
+# Process-wide HTTP client shared by CmrProcess and Ingest. Each thread gets
+# its own requests.Session, which is not thread-safe, and every session
+# mounts one shared HTTPAdapter. The adapter's connection pool keeps TCP/TLS
+# connections alive between requests from any thread, retries with
+# exponential backoff on throttling (429) and server (5xx) errors, and a
+# default (connect, read) timeout is applied to every request.
+#
+# The adapter is built lazily on first use; call configure() before that
+# (or at any time, which rebuilds the adapter and every thread's session) to
+# change the settings.
+# -----------------------------------------------------------------------------
+class HttpClient(object):
+
+    RETRIES: int = 5
+    BACKOFF_FACTOR: float = 0.5
+    RETRY_STATUS_FORCELIST: tuple = (429, 500, 502, 503, 504)
+
+    CONNECT_TIMEOUT: float = 10.0
+    READ_TIMEOUT: float = 60.0
+
+    POOL_CONNECTIONS: int = 10
+    POOL_MAXSIZE: int = 32
+
+    _adapter: HTTPAdapter = None
+    _generation: int = 0
+    _local = threading.local()
+    _lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # configure
+    # -------------------------------------------------------------------------
+    @classmethod
+    def configure(cls,
+                  retries=None,
+                  backoffFactor=None,
+                  connectTimeout=None,
+                  readTimeout=None,
+                  poolMaxsize=None):
+        """Override the default retry, timeout and pool settings. The
+        shared adapter is closed so the next request on any thread picks
+        these up.
+        """
+        with cls._lock:
+
+            if retries is not None:
+                cls.RETRIES = retries
+
+            if backoffFactor is not None:
+                cls.BACKOFF_FACTOR = backoffFactor
+
+            if connectTimeout is not None:
+                cls.CONNECT_TIMEOUT = connectTimeout
+
+            if readTimeout is not None:
+                cls.READ_TIMEOUT = readTimeout
+
+            if poolMaxsize is not None:
+                cls.POOL_MAXSIZE = poolMaxsize
+
+            cls._closeAdapter()
+
+    # -------------------------------------------------------------------------
+    # getSession
+    # -------------------------------------------------------------------------
+    @classmethod
+    def getSession(cls) -> requests.Session:
+        """The calling thread's session, over the shared adapter."""
+        local = cls._local
+
+        if getattr(local, 'session', None) is None or \
+                local.generation != cls._generation:
+
+            with cls._lock:
+
+                if cls._adapter is None:
+                    cls._adapter = cls._buildAdapter()
+
+                adapter = cls._adapter
+                generation = cls._generation
+
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+
+            local.session = session
+            local.generation = generation
+
+        return local.session
+
+    # -------------------------------------------------------------------------
+    # get
+    # -------------------------------------------------------------------------
+    @classmethod
+    def get(cls, url: str, **kwargs) -> requests.Response:
+        """GET a url through the thread's session with the default
+        timeout.
+
+        Raises:
+            requests.exceptions.RequestException: the request could not be
+                completed after all retries.
+        """
+        kwargs.setdefault('timeout', (cls.CONNECT_TIMEOUT, cls.READ_TIMEOUT))
+
+        return cls.getSession().get(url, **kwargs)
+
+    # -------------------------------------------------------------------------
+    # close
+    # -------------------------------------------------------------------------
+    @classmethod
+    def close(cls):
+        with cls._lock:
+            cls._closeAdapter()
+
+    # -------------------------------------------------------------------------
+    # _buildAdapter
+    # -------------------------------------------------------------------------
+    @classmethod
+    def _buildAdapter(cls) -> HTTPAdapter:
+
+        logging.debug(f'Building HTTP adapter: retries={cls.RETRIES}, ' +
+                      f'backoff={cls.BACKOFF_FACTOR}, ' +
+                      f'pool size={cls.POOL_MAXSIZE}')
+
+        # ---
+        # raise_on_status=False hands the last response back once retries
+        # are exhausted so callers can report the status code themselves.
+        # ---
+        retry = Retry(total=cls.RETRIES,
+                      backoff_factor=cls.BACKOFF_FACTOR,
+                      status_forcelist=cls.RETRY_STATUS_FORCELIST,
+                      allowed_methods=frozenset(['GET', 'HEAD']),
+                      raise_on_status=False)
+
+        return HTTPAdapter(pool_connections=cls.POOL_CONNECTIONS,
+                           pool_maxsize=cls.POOL_MAXSIZE,
+                           max_retries=retry)
+
+    # -------------------------------------------------------------------------
+    # _closeAdapter
+    #
+    # Close the shared adapter's pools. Threads notice the new generation and
+    # build a fresh session on their next request. Caller must hold the lock.
+    # -------------------------------------------------------------------------
+    @classmethod
+    def _closeAdapter(cls):
+        if cls._adapter is not None:
+            cls._adapter.close()
+            cls._adapter = None
+
+        cls._generation += 1
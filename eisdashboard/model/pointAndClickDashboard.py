@@ -1,4 +1,5 @@
 from eisdashboard.model.dashboard import Dashboard
+from eisdashboard.model.data.normalize import wrap_longitude
 from eisdashboard.model.streams import ClickStream
 import eisdashboard.model.utils as utils
 
@@ -47,6 +48,10 @@ class PointDashBoard(Dashboard):
             # Update the marker position
             PointDashBoard.marker.location = (lat, lon)
 
+            # The map returns longitudes past 180 on wrapped world copies,
+            # datasets are normalized to -180..180
+            lon = wrap_longitude(lon)
+
             # Triggers an event that updates the time-series plots
             PointDashBoard.clickStream.event(lat=lat, lon=lon)
 
@@ -4,12 +4,20 @@ from datetime import datetime
 import rioxarray
 import logging
 
+import numpy as np
+
+from eisdashboard.model.data.normalize import is_normalized
+
 
 # -----------------------------------------------------------------------------
 # clip_to_shape
 # -----------------------------------------------------------------------------
 def clip_to_shape(raster, geometry):
-    """Given a raster and geometry, clip raster to the given geometry."""
+    """Given a raster and geometry, clip raster to the given geometry.
+    Rasters with ascending lat/lon indexes are first sliced to the geometry's
+    bounds, so only that window is loaded."""
+    if is_normalized(raster):
+        raster = slice_to_bounds(raster, geometry_bounds(geometry))
     raster = raster.load()
     raster.rio.set_spatial_dims(x_dim="lon", y_dim="lat", inplace=True)
     raster.rio.write_crs("epsg:4326", inplace=True)
@@ -17,6 +25,45 @@ def clip_to_shape(raster, geometry):
     return raster_clipped
 
 
+# -----------------------------------------------------------------------------
+# geometry_bounds
+# -----------------------------------------------------------------------------
+def geometry_bounds(geometry):
+    """(west, south, east, north) of a shapely geometry or a GeoDataFrame."""
+    if hasattr(geometry, "total_bounds"):
+        return tuple(geometry.total_bounds)
+    return geometry.bounds
+
+
+# -----------------------------------------------------------------------------
+# slice_to_bounds
+# -----------------------------------------------------------------------------
+def slice_to_bounds(raster, bounds):
+    """Label-slice a raster with ascending lat/lon indexes to the bounds,
+    padded by one cell. Returns the raster unchanged if the window holds no
+    cells, so callers see the same no-data error as for the full raster."""
+    west, south, east, north = bounds
+
+    indexers = {}
+
+    for dim, low, high in (("lat", south, north), ("lon", west, east)):
+
+        if dim not in raster.dims or dim not in raster.indexes:
+            continue
+
+        values = raster[dim].values
+        pad = float(np.abs(np.diff(values[:2]))[0]) if values.size > 1 \
+            else 0.0
+        indexers[dim] = slice(low - pad, high + pad)
+
+    window = raster.sel(indexers)
+
+    if any(window.sizes[dim] == 0 for dim in indexers):
+        return raster
+
+    return window
+
+
 # -----------------------------------------------------------------------------
 # collapseTo1D
 # -----------------------------------------------------------------------------
@@ -43,13 +90,13 @@ def collapseMean(datarray):
 # plotTS
 # -----------------------------------------------------------------------------
 def plotTS(datarray, lat, lon):
-    """Plot time-series given a xarray dataarray and lat/lon"""
-
-    datarray = datarray.load()
+    """Plot time-series given a xarray dataarray and lat/lon. Only the
+    selected pixel's time series is loaded, one chunk for a materialized
+    subset."""
 
     try:
         dataSelected = datarray.interactive.sel(lon=lon, lat=lat,
-                                                method="nearest")
+                                                method="nearest").load()
 
     except Exception as e:
 
@@ -0,0 +1,236 @@
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+
+# -----------------------------------------------------------------------------
+# class CmrStandInServer
+#
+# Local stand-in for the CMR granule search endpoint, so CmrProcess can be
+# tested and benchmarked without network access.
+#
+# Serves granules.umm_json_v1_4 pages from either synthetic granules or a
+# recorded response, with configurable per-request latency. Supports the
+# parts of the search API CmrProcess uses: page_num/page_size paging, the
+# CMR-Search-After cursor, page_size=0 hit counts and the CMR-Hits header.
+# Query filters (temporal, bounding_box, ...) are accepted and ignored.
+#
+# Usage:
+#   with CmrStandInServer(hits=500, latency=0.05) as server:
+#       CmrProcess(..., baseUrl=server.baseUrl).run()
+# -----------------------------------------------------------------------------
+class CmrStandInServer(object):
+
+    SEARCH_PATH = '/search/granules.umm_json_v1_4'
+
+    SEARCH_AFTER_HEADER = 'CMR-Search-After'
+    HITS_HEADER = 'CMR-Hits'
+
+    MAX_PAGE_SIZE = 2000
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, hits=1000, latency=0.0, items=None,
+                 shortName='SYNTHETIC_3H', providerID='GES_DISC'):
+
+        self._items = items if items is not None else \
+            self.makeSyntheticItems(hits, shortName, providerID)
+        self._latency = latency
+
+        self._server = None
+        self._thread = None
+
+        self.requestCount = 0
+        self._countLock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # fromRecording
+    # -------------------------------------------------------------------------
+    @classmethod
+    def fromRecording(cls, path: str, latency=0.0):
+        """Replay granules recorded from real CMR responses. The file holds
+        either one granules.umm_json_v1_4 response ({"items": [...]}) or a
+        list of them (one per page)."""
+        with open(path) as recordingFile:
+            recording = json.load(recordingFile)
+
+        pages = recording if isinstance(recording, list) else [recording]
+        items = [item for page in pages for item in page['items']]
+
+        return cls(latency=latency, items=items)
+
+    # -------------------------------------------------------------------------
+    # makeSyntheticItems
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def makeSyntheticItems(hits, shortName='SYNTHETIC_3H',
+                           providerID='GES_DISC') -> list:
+        """Global, 3-hourly granules shaped like GLDAS UMM-G records."""
+        startTime = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        timeStep = timedelta(hours=3)
+        items = []
+
+        for index in range(hits):
+
+            begin = startTime + index * timeStep
+            end = begin + timeStep - timedelta(seconds=1)
+            fileName = f'{shortName}.A{begin:%Y%m%d.%H%M}.nc4'
+            revisionDate = (begin + timedelta(days=30)).strftime(
+                '%Y-%m-%dT%H:%M:%S.000Z')
+
+            items.append({
+                'meta': {'provider-id': providerID,
+                         'concept-id': f'G{index:010d}-{providerID}',
+                         'revision-date': revisionDate},
+                'umm': {
+                    'RelatedUrls': [
+                        {'URL': 'https://data.example.gov/data/' +
+                                f'{shortName}/{fileName}'},
+                        {'URL': f's3://example-protected/{shortName}/' +
+                                f'{begin:%Y/%j}/{fileName}'}],
+                    'TemporalExtent': {'RangeDateTime': {
+                        'BeginningDateTime':
+                            begin.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                        'EndingDateTime':
+                            end.strftime('%Y-%m-%dT%H:%M:%S.000Z')}},
+                    'DataGranule': {'DayNightFlag': 'Unspecified'},
+                    'SpatialExtent': {'HorizontalSpatialDomain': {
+                        'Geometry': {'BoundingRectangles': [{
+                            'WestBoundingCoordinate': -180.0,
+                            'SouthBoundingCoordinate': -60.0,
+                            'EastBoundingCoordinate': 180.0,
+                            'NorthBoundingCoordinate': 90.0}]}}},
+                }})
+
+        return items
+
+    # -------------------------------------------------------------------------
+    # baseUrl
+    #
+    # Drop-in replacement for CmrProcess.CMR_BASE_URL.
+    # -------------------------------------------------------------------------
+    @property
+    def baseUrl(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}{self.SEARCH_PATH}?'
+
+    # -------------------------------------------------------------------------
+    # hits
+    # -------------------------------------------------------------------------
+    @property
+    def hits(self) -> int:
+        return len(self._items)
+
+    # -------------------------------------------------------------------------
+    # start
+    # -------------------------------------------------------------------------
+    def start(self):
+        standIn = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                standIn._handle(self)
+
+            def log_message(self, format, *args):
+                logging.debug('CMR stand-in: ' + format % args)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+
+        logging.debug(f'CMR stand-in serving {self.hits} granules at ' +
+                      f'{self.baseUrl}')
+
+        return self
+
+    # -------------------------------------------------------------------------
+    # stop
+    # -------------------------------------------------------------------------
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # -------------------------------------------------------------------------
+    # _handle
+    # -------------------------------------------------------------------------
+    def _handle(self, request: BaseHTTPRequestHandler):
+
+        with self._countLock:
+            self.requestCount += 1
+
+        if self._latency:
+            time.sleep(self._latency)
+
+        parsedUrl = urlparse(request.path)
+
+        if parsedUrl.path != self.SEARCH_PATH:
+            self._respond(request, 404, {'errors': ['Not found']})
+            return
+
+        params = parse_qs(parsedUrl.query)
+
+        try:
+            pageSize = int(params.get('page_size', ['10'])[0])
+            pageNum = int(params.get('page_num', ['1'])[0])
+        except ValueError:
+            self._respond(request, 400, {'errors': ['Bad paging']})
+            return
+
+        if not 0 <= pageSize <= self.MAX_PAGE_SIZE or pageNum < 1:
+            self._respond(request, 400, {'errors': ['Bad paging']})
+            return
+
+        searchAfter = request.headers.get(self.SEARCH_AFTER_HEADER)
+
+        # The cursor is the index of the last item already returned
+        if searchAfter is not None:
+            start = json.loads(searchAfter)[0] + 1
+        else:
+            start = (pageNum - 1) * pageSize
+
+        pageItems = self._items[start:start + pageSize]
+
+        headers = {self.HITS_HEADER: str(self.hits)}
+
+        if pageItems:
+            headers[self.SEARCH_AFTER_HEADER] = json.dumps(
+                [start + len(pageItems) - 1])
+
+        self._respond(request, 200, {'hits': self.hits,
+                                     'took': 1,
+                                     'items': pageItems}, headers)
+
+    # -------------------------------------------------------------------------
+    # _respond
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _respond(request, status, body, headers=None):
+        encodedBody = json.dumps(body).encode('utf-8')
+
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(encodedBody)))
+
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+
+        request.end_headers()
+        request.wfile.write(encodedBody)
@@ -0,0 +1,69 @@
+import unittest
+
+import dask.array as da
+import numpy as np
+
+from eisdashboard.model.data.cluster import DaskCluster
+
+try:
+    from distributed import default_client
+except ImportError:
+    default_client = None
+
+
+@unittest.skipUnless(DaskCluster.available(), 'distributed not installed')
+class TestDaskCluster(unittest.TestCase):
+
+    def test_default_scheduler(self):
+        cluster = DaskCluster(n_workers=1, threads_per_worker=2,
+                              memory_limit='1GB', processes=False,
+                              dashboard_address='')
+
+        try:
+            self.assertIs(cluster.start(), cluster)
+            self.assertIs(default_client(), cluster.client)
+            self.assertIsNone(cluster.dashboard_link)
+
+            # Starting again reuses the running cluster
+            client = cluster.client
+            cluster.start()
+            self.assertIs(cluster.client, client)
+
+            array = da.ones((4, 4), chunks=2)
+            self.assertEqual(array.sum().compute(), 16)
+
+        finally:
+            cluster.close()
+
+        self.assertIsNone(cluster.client)
+
+        with self.assertRaises(ValueError):
+            default_client()
+
+        # Computations fall back to the threaded scheduler
+        self.assertTrue(np.all(da.ones(4, chunks=2).compute() == 1))
+
+    def test_shared_cluster(self):
+        settings = {'n_workers': 1, 'threads_per_worker': 1,
+                    'memory_limit': '1GB', 'processes': False,
+                    'dashboard_address': ''}
+
+        first = DaskCluster.acquire(**settings)
+
+        try:
+            # A second user reuses the running cluster
+            second = DaskCluster.acquire(**settings)
+            self.assertIs(second, first)
+
+            second.release()
+            self.assertIs(default_client(), first.client)
+
+        finally:
+            first.release()
+
+        self.assertIsNone(first.client)
+
+        # The next acquire starts a new cluster
+        third = DaskCluster.acquire(**settings)
+        self.assertIsNot(third, first)
+        third.release()
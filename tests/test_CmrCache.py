@@ -0,0 +1,127 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from eisdashboard.model.cmr_cache import CmrResponseCache
+from eisdashboard.model.cmr_query import CmrProcess
+
+
+class TestCmrResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.temp_dir.name, 'cmr.sqlite')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key_is_order_independent(self):
+        key_a = CmrResponseCache.makeKey('url', {'a': 1, 'b': 2})
+        key_b = CmrResponseCache.makeKey('url', {'b': 2, 'a': 1})
+        key_c = CmrResponseCache.makeKey('url', {'a': 1, 'b': 2},
+                                         {'CMR-Search-After': 'x'})
+        self.assertEqual(key_a, key_b)
+        self.assertNotEqual(key_a, key_c)
+
+    def test_get_put_and_counters(self):
+        cache = CmrResponseCache(path=self.cache_path)
+
+        self.assertIsNone(cache.get('key'))
+        cache.put('key', {'items': [1, 2, 3]})
+        self.assertEqual(cache.get('key'), {'items': [1, 2, 3]})
+
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+
+    def test_persists_across_instances(self):
+        CmrResponseCache(path=self.cache_path).put('key', {'items': []})
+
+        cache = CmrResponseCache(path=self.cache_path)
+        self.assertEqual(cache.get('key'), {'items': []})
+
+    def test_ttl_expiry(self):
+        cache = CmrResponseCache(path=self.cache_path, ttl=10)
+        cache.put('key', {'items': []})
+
+        with patch('time.time', return_value=time.time() + 60):
+            self.assertIsNone(cache.get('key'))
+
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_size_bounded_lru_eviction(self):
+        # Room for two entries of this size, not three
+        value = {'items': ['x' * 100]}
+        cache = CmrResponseCache(path=self.cache_path, maxBytes=250)
+
+        cache.put('first', value)
+        time.sleep(0.01)
+        cache.put('second', value)
+        time.sleep(0.01)
+
+        # Touch first so that second is the least recently used
+        cache.get('first')
+        time.sleep(0.01)
+        cache.put('third', value)
+
+        self.assertIsNotNone(cache.get('first'))
+        self.assertIsNone(cache.get('second'))
+        self.assertIsNotNone(cache.get('third'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_cmr_process_warm_cache_skips_network(self):
+        cache = CmrResponseCache(path=self.cache_path)
+
+        response = MagicMock()
+        response.json.return_value = {'items': [{'a': 1}]}
+        response.headers = {'CMR-Hits': '1'}
+
+        cold = CmrProcess(mission='your_mission', dateTime='2023-01-01',
+                          cache=cache)
+        cold._getResponse = MagicMock(return_value=response)
+        self.assertEqual(cold._sendRequest(cold._buildRequest()),
+                         (1, {'items': [{'a': 1}]}))
+
+        warm = CmrProcess(mission='your_mission', dateTime='2023-01-01',
+                          cache=CmrResponseCache(path=self.cache_path))
+        warm._getResponse = MagicMock()
+        self.assertEqual(warm._sendRequest(warm._buildRequest()),
+                         (1, {'items': [{'a': 1}]}))
+        warm._getResponse.assert_not_called()
+
+    def test_adaptive_warm_query_skips_network(self):
+        items = [{'meta': {'provider-id': 'GES_DISC'},
+                  'umm': {'RelatedUrls': [
+                      {'URL': f'https://a.gov/granule{index}.nc'},
+                      {'URL': f's3://bucket/granule{index}.nc'}]}}
+                 for index in range(3)]
+
+        def get_response(requestDictionary, headers=None):
+            response = MagicMock()
+            response.headers = {'CMR-Hits': str(len(items))}
+            response.json.return_value = {
+                'items': items[:requestDictionary['page_size']]}
+            return response
+
+        def query(get_response):
+            cmr_process = CmrProcess(
+                mission='your_mission', dateTime='2023-01-01',
+                maxWorkers=4, adaptive=True,
+                cache=CmrResponseCache(path=self.cache_path))
+            cmr_process._getResponse = MagicMock(side_effect=get_response)
+            return cmr_process, list(cmr_process.iterGranules())
+
+        cold, expected = query(get_response)
+        self.assertEqual(len(expected), 3)
+
+        # Hit count and pages come from the cache, with the network down
+        warm, granules = query(lambda *args, **kwargs: None)
+        self.assertEqual(granules, expected)
+        warm._getResponse.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
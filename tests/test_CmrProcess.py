@@ -1,6 +1,11 @@
 import unittest
 from unittest.mock import MagicMock, patch
+
+import requests
+
 from eisdashboard.model.cmr_query import CmrProcess
+from eisdashboard.model.exceptions import CmrQueryError
+from eisdashboard.model.granule import GranuleRecord
 
 
 class TestCmrProcess(unittest.TestCase):
@@ -9,8 +14,7 @@ class TestCmrProcess(unittest.TestCase):
         self.cmr_process = CmrProcess(mission="your_mission",
                                       dateTime="2023-01-01")
 
-    @patch("urllib3.PoolManager")
-    def test_run_with_error(self, mock_pool_manager):
+    def test_run_with_error(self):
         # Mock the _cmrQuery method to return an error
         self.cmr_process._cmrQuery = MagicMock(return_value=(None, True))
 
@@ -18,7 +22,149 @@ class TestCmrProcess(unittest.TestCase):
         result = self.cmr_process.run()
 
         # Assert the expected results
-        self.assertEqual(result, [])
+        self.assertEqual(result, ((), None))
+
+    def test_run_concurrent(self):
+        # Pages 1-5 return one granule each, page 6 onwards is empty
+        def mock_cmr_query(pageNum=1):
+            if pageNum > 5:
+                return None, True
+            return {f"file{pageNum}": GranuleRecord(
+                f"file{pageNum}.nc", f"s3://bucket/file{pageNum}.nc",
+                "provider1")}, False
+
+        cmr_process = CmrProcess(mission="your_mission",
+                                 dateTime="2023-01-01",
+                                 maxPages=50,
+                                 maxWorkers=4)
+        cmr_process._cmrQuery = MagicMock(side_effect=mock_cmr_query)
+
+        result = cmr_process.run()
+
+        expected_urls = tuple(f"s3://bucket/file{i}.nc" for i in range(1, 6))
+        self.assertEqual(result, (expected_urls, "provider1"))
+
+        # Stops after the wave containing the first empty page
+        self.assertEqual(cmr_process._cmrQuery.call_count, 8)
+
+    def test_iter_granules_search_after(self):
+        def make_item(name):
+            return {
+                "meta": {"provider-id": "provider1"},
+                "umm": {
+                    "RelatedUrls": [{"URL": name},
+                                    {"URL": f"s3://bucket/{name}"}],
+                    "TemporalExtent": {"RangeDateTime": "temporal_range1"},
+                    "DataGranule": {"DayNightFlag": "day_night1"},
+                    "SpatialExtent": {"HorizontalSpatialDomain":
+                                      "spatial_extent1"},
+                },
+            }
+
+        first_page = MagicMock()
+        first_page.json.return_value = {
+            "items": [make_item("a.nc"), make_item("b.nc")]}
+        first_page.headers = {"CMR-Search-After": "[\"cursor\"]"}
+
+        last_page = MagicMock()
+        last_page.json.return_value = {"items": [make_item("c.nc")]}
+        last_page.headers = {"CMR-Search-After": "[\"cursor2\"]"}
+
+        cmr_process = CmrProcess(mission="your_mission",
+                                 dateTime="2023-01-01",
+                                 pageSize=2)
+        cmr_process._getResponse = MagicMock(
+            side_effect=[first_page, last_page])
+
+        # A stale hit count does not end the search early
+        cmr_process._totalHits = 2
+
+        granules = cmr_process.iterGranules()
+
+        # Nothing is requested until the generator is consumed
+        cmr_process._getResponse.assert_not_called()
+
+        urls = [granule.file_url for granule in granules]
+
+        self.assertEqual(urls, ["s3://bucket/a.nc", "s3://bucket/b.nc",
+                                "s3://bucket/c.nc"])
+
+        # The short second page ends the search, cursor forwarded once
+        self.assertEqual(cmr_process._getResponse.call_count, 2)
+        first_call, second_call = cmr_process._getResponse.call_args_list
+        self.assertNotIn("page_num", first_call.args[0])
+        self.assertEqual(first_call.kwargs["headers"], {})
+        self.assertEqual(second_call.kwargs["headers"],
+                         {"CMR-Search-After": "[\"cursor\"]"})
+
+    def test_iter_granules_request_failure(self):
+        self.cmr_process._getResponse = MagicMock(return_value=None)
+
+        with self.assertRaises(CmrQueryError):
+            list(self.cmr_process.iterGranules())
+
+        self.assertTrue(self.cmr_process._error)
+
+    def test_plan_pages(self):
+        cmr_process = CmrProcess(mission="your_mission",
+                                 dateTime="2023-01-01",
+                                 maxWorkers=8,
+                                 adaptive=True)
+        cmr_process._fetchPage = MagicMock(
+            return_value=({"items": []}, {"CMR-Hits": "4100"}))
+
+        plan = cmr_process.planPages()
+
+        # Hit count request asks for no items
+        request = cmr_process._fetchPage.call_args.args[0]
+        self.assertEqual(request["page_size"], 0)
+
+        # 4100 hits -> 3 evenly sized pages, one worker per page
+        self.assertEqual(plan, {"hits": 4100, "page_size": 1367,
+                                "pages": 3, "workers": 3})
+
+    def test_plan_pages_no_hit_count(self):
+        cmr_process = CmrProcess(mission="your_mission",
+                                 dateTime="2023-01-01",
+                                 adaptive=True)
+        cmr_process._fetchPage = MagicMock(return_value=(None, None))
+
+        self.assertIsNone(cmr_process.planPages())
+        self.assertEqual(cmr_process._pageSize, 150)
+        self.assertEqual(cmr_process._maxPages, 50)
+
+    def test_run_adaptive_fetches_exact_pages(self):
+        def mock_fetch_page(requestDictionary, headers=None):
+            if requestDictionary["page_size"] == 0:
+                return {"items": []}, {"CMR-Hits": "3"}
+            return {"items": ["item"]}, {}
+
+        cmr_process = CmrProcess(mission="your_mission",
+                                 dateTime="2023-01-01",
+                                 adaptive=True)
+        cmr_process._fetchPage = MagicMock(side_effect=mock_fetch_page)
+        cmr_process._processRequest = MagicMock(return_value={
+            "file1": GranuleRecord("file1.nc", "s3://bucket/file1.nc",
+                                   "provider1")})
+
+        urls, providerID = cmr_process.run()
+
+        # One hit-count request and a single page holding all three hits,
+        # with room for one more so it reads as the last page
+        self.assertEqual(cmr_process._fetchPage.call_count, 2)
+        self.assertEqual(cmr_process._pageSize, 4)
+        self.assertEqual(urls, ("s3://bucket/file1.nc",))
+        self.assertEqual(providerID, "provider1")
+
+    def test_iter_granules_no_hits(self):
+        cmr_process = CmrProcess(mission="your_mission",
+                                 dateTime="2023-01-01",
+                                 adaptive=True)
+        cmr_process._fetchPage = MagicMock(
+            return_value=({"items": []}, {"CMR-Hits": "0"}))
+
+        self.assertEqual(list(cmr_process.iterGranules()), [])
+        self.assertEqual(cmr_process._fetchPage.call_count, 1)
 
     def test_build_request(self):
         # Test the _buildRequest method
@@ -36,25 +182,24 @@ class TestCmrProcess(unittest.TestCase):
         }
         self.assertEqual(result, expected)
 
-    @patch("urllib3.PoolManager")
-    def test_send_request_success(self, mock_pool_manager):
+    @patch("eisdashboard.model.cmr_query.HttpClient.get")
+    def test_send_request_success(self, mock_get):
         # Mock the request to return sample data
-        mock_pool_manager.return_value.request.return_value.status = 200
-        mock_pool_manager.return_value.request.return_value.data = (
-            '{"items": []}'.encode("utf-8")
-        )
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {"items": []}
 
         # Test the _sendRequest method
         result = self.cmr_process._sendRequest(
             requestDictionary={"param": "value"})
 
         # Assert the expected results
-        self.assertEqual(result, (0, None))
+        self.assertEqual(result, (0, {"items": []}))
+        self.assertFalse(self.cmr_process._error)
 
-    @patch("urllib3.PoolManager")
-    def test_send_request_error(self, mock_pool_manager):
+    @patch("eisdashboard.model.cmr_query.HttpClient.get")
+    def test_send_request_error(self, mock_get):
         # Mock the request to return an error status
-        mock_pool_manager.return_value.request.return_value.status = 400
+        mock_get.return_value.status_code = 400
 
         # Test the _sendRequest method
         result = self.cmr_process._sendRequest(
@@ -63,18 +208,36 @@ class TestCmrProcess(unittest.TestCase):
         # Assert the expected results
         self.assertEqual(result, (0, None))
 
+    @patch("eisdashboard.model.cmr_query.HttpClient.get",
+           side_effect=requests.exceptions.ConnectionError("Mock error"))
+    def test_send_request_connection_error(self, mock_get):
+        # Retries exhausted on the shared client marks the query as failed
+        result = self.cmr_process._sendRequest(
+            requestDictionary={"param": "value"})
+
+        self.assertEqual(result, (0, None))
+        self.assertTrue(self.cmr_process._error)
+
     def test_process_request(self):
         # Test the _processRequest method
         sample_data = {
             "items": [
                 {
-                    "meta": {"provider-id": "provider1"},
+                    "meta": {"provider-id": "provider1",
+                             "revision-date": "2023-02-01T00:00:00.000Z"},
                     "umm": {
-                        "RelatedUrls": [{"URL": "url1"}, {"URL": "url2"}],
-                        "TemporalExtent": {"RangeDateTime": "temporal_range1"},
-                        "DataGranule": {"DayNightFlag": "day_night1"},
-                        "SpatialExtent": {"HorizontalSpatialDomain":
-                                          "spatial_extent1"},
+                        "RelatedUrls": [{"URL": "https://a.gov/url1"},
+                                        {"URL": "s3://bucket/url1"}],
+                        "TemporalExtent": {"RangeDateTime": {
+                            "BeginningDateTime": "2023-01-01T00:00:00.000Z",
+                            "EndingDateTime": "2023-01-01T02:59:59Z"}},
+                        "DataGranule": {"DayNightFlag": "Unspecified"},
+                        "SpatialExtent": {"HorizontalSpatialDomain": {
+                            "Geometry": {"BoundingRectangles": [{
+                                "WestBoundingCoordinate": -180,
+                                "SouthBoundingCoordinate": -60,
+                                "EastBoundingCoordinate": 180,
+                                "NorthBoundingCoordinate": 90}]}}},
                     },
                 }
             ]
@@ -82,17 +245,74 @@ class TestCmrProcess(unittest.TestCase):
         result = self.cmr_process._processRequest(sample_data)
         # Assert the expected results
         expected = {
-            "url1": {
-                "file_name": "url1",
-                "file_url": "url2",
-                "provider_id": "provider1",
-                "temporal_range": "temporal_range1",
-                "spatial_extent": "spatial_extent1",
-                "day_night_flag": "day_night1",
-            }
+            "url1": GranuleRecord(
+                file_name="url1",
+                file_url="s3://bucket/url1",
+                provider_id="provider1",
+                start=1672531200.0,
+                end=1672541999.0,
+                west=-180.0,
+                south=-60.0,
+                east=180.0,
+                north=90.0,
+                day_night_flag="Unspecified",
+                revision_date="2023-02-01T00:00:00.000Z"),
         }
         self.assertEqual(result, expected)
 
+    def test_process_request_polygons_and_missing_extents(self):
+        sample_data = {
+            "items": [
+                {
+                    "meta": {"provider-id": "provider1"},
+                    "umm": {
+                        "RelatedUrls": [{"URL": "url1"}, {"URL": "url2"}],
+                        "SpatialExtent": {"HorizontalSpatialDomain": {
+                            "Geometry": {"GPolygons": [{"Boundary": {
+                                "Points": [
+                                    {"Longitude": -77, "Latitude": 38},
+                                    {"Longitude": -76, "Latitude": 38},
+                                    {"Longitude": -76, "Latitude": 39},
+                                    {"Longitude": -77, "Latitude": 38}]}}]}}},
+                    },
+                }
+            ]
+        }
+        granule = self.cmr_process._processRequest(sample_data)["url1"]
+
+        self.assertEqual(granule.bbox, (-77.0, 38.0, -76.0, 39.0))
+        self.assertNotEqual(granule.start, granule.start)  # NaN
+        self.assertFalse(hasattr(granule, "__dict__"))
+
+    def test_updated_since_and_latest_revision(self):
+        cmr_process = CmrProcess(mission="your_mission",
+                                 dateTime="2023-01-01",
+                                 updatedSince="2023-01-01T00:00:00.000Z")
+
+        request = cmr_process._buildRequest()
+        self.assertEqual(request["updated_since"],
+                         "2023-01-01T00:00:00.000Z")
+
+        def make_item(name, revision_date):
+            return {
+                "meta": {"provider-id": "provider1",
+                         "revision-date": revision_date},
+                "umm": {
+                    "RelatedUrls": [{"URL": name}, {"URL": name}],
+                    "TemporalExtent": {"RangeDateTime": None},
+                    "DataGranule": {"DayNightFlag": None},
+                    "SpatialExtent": {"HorizontalSpatialDomain": None},
+                },
+            }
+
+        cmr_process._processRequest({"items": [
+            make_item("a", "2023-03-01T00:00:00.000Z"),
+            make_item("b", "2023-05-01T00:00:00.000Z"),
+            make_item("c", "2023-02-01T00:00:00.000Z")]})
+
+        self.assertEqual(cmr_process.latestRevisionDate,
+                         "2023-05-01T00:00:00.000Z")
+
 
 if __name__ == "__main__":
     unittest.main()
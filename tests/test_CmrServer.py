@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from eisdashboard.model.cmr_query import CmrProcess
+from eisdashboard.testing.cmr_server import CmrStandInServer
+
+
+class TestCmrStandInServer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = CmrStandInServer(hits=45).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def make_cmr_process(self, **kwargs):
+        return CmrProcess(mission='SYNTHETIC_3H',
+                          dateTime='2000-01-01T00:00:00Z,'
+                                   '2000-12-31T00:00:00Z',
+                          lonLat='-76.6,38.8,-76.5,38.9',
+                          baseUrl=self.server.baseUrl,
+                          **kwargs)
+
+    def test_run_sequential_and_concurrent_match(self):
+        sequential, providerID = self.make_cmr_process(
+            pageSize=10, maxPages=5).run()
+        concurrent, _ = self.make_cmr_process(
+            pageSize=10, maxPages=20, maxWorkers=4).run()
+
+        self.assertEqual(len(sequential), 45)
+        self.assertEqual(sequential, concurrent)
+        self.assertEqual(providerID, 'GES_DISC')
+
+    def test_iter_granules_matches_run(self):
+        urls, _ = self.make_cmr_process(pageSize=10, maxPages=5).run()
+
+        granules = list(self.make_cmr_process(pageSize=10).iterGranules())
+
+        self.assertEqual(tuple(sorted(g.file_url for g in granules)), urls)
+
+    def test_adaptive_plan_uses_hit_count(self):
+        requests_before = self.server.requestCount
+
+        cmr_process = self.make_cmr_process(maxWorkers=4, adaptive=True)
+        urls, _ = cmr_process.run()
+
+        self.assertEqual(len(urls), 45)
+        # One hit count request plus one page holding every hit
+        self.assertEqual(self.server.requestCount - requests_before, 2)
+
+    def test_iter_granules_fans_out_planned_pages(self):
+        urls, _ = self.make_cmr_process(pageSize=10, maxPages=5).run()
+
+        cmr_process = self.make_cmr_process(maxWorkers=4, adaptive=True)
+        cmr_process.MAX_PAGE_SIZE = 10
+
+        requests_before = self.server.requestCount
+
+        with patch.object(cmr_process, '_fetchGranulePage',
+                          wraps=cmr_process._fetchGranulePage) as fetch:
+            granules = list(cmr_process.iterGranules())
+
+        self.assertEqual(tuple(sorted(g.file_url for g in granules)), urls)
+
+        # 45 hits -> pages of 10, 10, 10, 10 and a short 5, by page_num
+        self.assertEqual(cmr_process._maxWorkers, 4)
+        self.assertEqual(self.server.requestCount - requests_before, 6)
+        self.assertEqual([call.args[0]['page_num']
+                          for call in fetch.call_args_list], [1, 2, 3, 4, 5])
+
+    def test_from_recording(self):
+        items = CmrStandInServer.makeSyntheticItems(3)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            recording_path = os.path.join(temp_dir, 'recording.json')
+            with open(recording_path, 'w') as recording_file:
+                json.dump([{'items': items[:2]}, {'items': items[2:]}],
+                          recording_file)
+
+            with CmrStandInServer.fromRecording(recording_path) as server:
+                self.assertEqual(server.hits, 3)
+                urls, _ = CmrProcess(mission='SYNTHETIC_3H',
+                                     dateTime='2000-01-01',
+                                     baseUrl=server.baseUrl,
+                                     maxPages=2).run()
+
+        self.assertEqual(len(urls), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
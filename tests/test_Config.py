@@ -3,6 +3,12 @@ import unittest
 from eisdashboard.model.config import Config, Data
 from eisdashboard.model.config import Collections, Title
 from eisdashboard.model.config import TimeBounds, CustomCollections
+from eisdashboard.model.config import Http, CmrCache, IngestSettings
+from eisdashboard.model.config import Credentials, GranuleCache
+from eisdashboard.model.config import ReferenceIndexSettings, Materialize
+from eisdashboard.model.config import DatasetCacheSettings
+from eisdashboard.model.config import ZarrMetadataCacheSettings
+from eisdashboard.model.config import Storage, DaskSettings
 
 
 class TestConfig(unittest.TestCase):
@@ -17,6 +23,20 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(config.custom_collections, CustomCollections())
         self.assertEqual(config.bounds, [])
         self.assertEqual(config.time_bounds, TimeBounds())
+        self.assertEqual(config.http, Http())
+        self.assertEqual(config.cmr_cache, CmrCache())
+        self.assertEqual(config.ingest, IngestSettings())
+        self.assertEqual(config.credentials, Credentials())
+        self.assertEqual(config.granule_cache, GranuleCache())
+        self.assertEqual(config.granule_cache.validate_ttl, 3600)
+        self.assertEqual(config.reference_index, ReferenceIndexSettings())
+        self.assertEqual(config.materialize, Materialize())
+        self.assertEqual(config.dataset_cache, DatasetCacheSettings())
+        self.assertEqual(config.zarr_metadata_cache,
+                         ZarrMetadataCacheSettings())
+        self.assertFalse(config.zarr_metadata_cache.enabled)
+        self.assertEqual(config.storage, Storage())
+        self.assertEqual(config.dask, DaskSettings())
 
     def test_custom_values(self):
         data = Data(default=['value1'], datasets=['value2'])
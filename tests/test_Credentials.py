@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+import requests
+
+from eisdashboard.model.data.credentials import CredentialManager
+
+
+def make_response(access_key='mock_access_key', expires_in=3600):
+    expiration = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+    response = MagicMock()
+    response.json.return_value = {
+        'accessKeyId': access_key,
+        'secretAccessKey': 'mock_secret_key',
+        'sessionToken': 'mock_session_token',
+        'expiration': expiration.strftime('%Y-%m-%d %H:%M:%S+00:00')
+    }
+    return response
+
+
+class TestCredentialManager(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = CredentialManager(refresh_margin=300)
+
+    def tearDown(self):
+        self.manager.close()
+
+    @patch('eisdashboard.model.data.credentials.HttpClient.get')
+    def test_get_credentials_success(self, mock_requests_get):
+        mock_requests_get.return_value = make_response()
+
+        credentials = self.manager.get_credentials('GES_DISC')
+
+        self.assertEqual(credentials['accessKeyId'], 'mock_access_key')
+        self.assertEqual(credentials['secretAccessKey'], 'mock_secret_key')
+        self.assertEqual(credentials['sessionToken'], 'mock_session_token')
+
+        # Still valid, so the second call does not hit the endpoint
+        self.manager.get_credentials('GES_DISC')
+        mock_requests_get.assert_called_once_with(
+            CredentialManager.PROVIDER_CREDENTIAL_ENDPOINT['GES_DISC'])
+
+    @patch('eisdashboard.model.data.credentials.HttpClient.get',
+           side_effect=requests.exceptions.RequestException('Mock error'))
+    def test_get_credentials_failure(self, mock_requests_get):
+        self.assertIsNone(self.manager.get_credentials('GES_DISC'))
+        self.assertIsNone(self.manager.get_file_system('GES_DISC'))
+
+    @patch('eisdashboard.model.data.credentials.HttpClient.get')
+    def test_unknown_provider(self, mock_requests_get):
+        self.assertIsNone(self.manager.get_credentials('UNKNOWN'))
+        mock_requests_get.assert_not_called()
+
+    @patch.object(CredentialManager, '_schedule_refresh')
+    @patch('eisdashboard.model.data.credentials.s3fs.S3FileSystem')
+    @patch('eisdashboard.model.data.credentials.HttpClient.get')
+    def test_file_system_reused_and_rotated(self, mock_requests_get,
+                                            mock_s3fs, mock_schedule):
+        # Inside the refresh margin, so every access refreshes. No
+        # background refresh, which would use up the mocked responses
+        mock_requests_get.side_effect = [make_response('key1', 60),
+                                         make_response('key2', 60)]
+
+        first = self.manager.get_file_system('GES_DISC')
+        second = self.manager.get_file_system('GES_DISC')
+
+        self.assertIs(first, second)
+        mock_s3fs.assert_called_once()
+        self.assertEqual(mock_s3fs.call_args.kwargs['key'], 'key1')
+
+        # The existing filesystem was handed the new keys
+        self.assertEqual(second.key, 'key2')
+        second.connect.assert_called_once_with(refresh=True)
+
+    @patch('eisdashboard.model.data.credentials.HttpClient.get')
+    def test_short_lived_keys_do_not_refresh_in_a_loop(self,
+                                                       mock_requests_get):
+        mock_requests_get.side_effect = [make_response('key1', 60),
+                                         make_response('key2', 200)]
+
+        with patch.object(self.manager, '_schedule_refresh') as schedule:
+
+            # Shorter than the refresh margin: wait the retry delay
+            self.manager.get_credentials('GES_DISC')
+            self.assertEqual(schedule.call_args.args,
+                             ('GES_DISC', CredentialManager.RETRY_DELAY))
+
+            # Or halfway through a lifetime longer than that
+            self.manager._refresh('GES_DISC')
+            self.assertAlmostEqual(schedule.call_args.args[1], 100,
+                                   delta=5)
+
+    @patch('eisdashboard.model.data.credentials.HttpClient.get')
+    def test_proactive_refresh(self, mock_requests_get):
+        refreshed = threading.Event()
+
+        def fetch(url):
+            if mock_requests_get.call_count > 1:
+                refreshed.set()
+            return make_response(expires_in=301)
+
+        mock_requests_get.side_effect = fetch
+
+        self.manager.get_credentials('GES_DISC')
+
+        # Due one second after being fetched, with no further access
+        self.assertTrue(refreshed.wait(timeout=5))
+
+    @patch('eisdashboard.model.data.credentials.HttpClient.get')
+    def test_prefetch(self, mock_requests_get):
+        mock_requests_get.return_value = make_response()
+
+        self.manager.prefetch(['GES_DISC', 'POCLOUD'])
+
+        self.assertIsNotNone(self.manager.get_credentials('GES_DISC'))
+        self.assertIsNotNone(self.manager.get_credentials('POCLOUD'))
+        self.assertEqual(mock_requests_get.call_count, 2)
+
+    def test_parse_expiration_default(self):
+        expiration = self.manager._parse_expiration(None)
+        remaining = expiration - datetime.now(timezone.utc)
+        self.assertAlmostEqual(remaining.total_seconds(), 3600, delta=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from eisdashboard.model.data.dataset_cache import DatasetCache
+
+
+def make_dataset(nbytes):
+    return xr.Dataset({'data': ('x', np.zeros(nbytes, dtype='uint8'))})
+
+
+class TestDatasetCache(unittest.TestCase):
+
+    def test_get_put_and_counters(self):
+        cache = DatasetCache(max_bytes=1000)
+        dataset = make_dataset(100)
+
+        self.assertIsNone(cache.get('key'))
+        cache.put('key', dataset, 'GLDAS')
+        self.assertIs(cache.get('key'), dataset)
+
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['bytes'], 100)
+
+    def test_lru_eviction(self):
+        cache = DatasetCache(max_bytes=250, policy='lru')
+
+        cache.put('first', make_dataset(100))
+        cache.put('second', make_dataset(100))
+        cache.get('first')
+        cache.put('third', make_dataset(100))
+
+        self.assertIsNotNone(cache.get('first'))
+        self.assertIsNone(cache.get('second'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertLessEqual(cache.stats()['bytes'], 250)
+
+    def test_lfu_eviction(self):
+        cache = DatasetCache(max_bytes=250, policy='lfu')
+
+        cache.put('first', make_dataset(100))
+        cache.put('second', make_dataset(100))
+        cache.get('first')
+        cache.get('first')
+        cache.get('second')
+        # Used most recently but least often
+        cache.put('third', make_dataset(100))
+        cache.put('fourth', make_dataset(100))
+
+        self.assertIsNotNone(cache.get('first'))
+        self.assertIsNone(cache.get('third'))
+
+    def test_over_budget_is_not_cached(self):
+        cache = DatasetCache(max_bytes=50)
+        cache.put('key', make_dataset(100))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_invalidate_collection(self):
+        cache = DatasetCache(max_bytes=1000)
+
+        cache.put('a', make_dataset(10), 'GLDAS')
+        cache.put('b', make_dataset(10), 'GLDAS')
+        cache.put('c', make_dataset(10), 'MERRA')
+
+        self.assertEqual(cache.invalidate('GLDAS'), 2)
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats()['bytes'], 10)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            DatasetCache(policy='fifo')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from fsspec.implementations.memory import MemoryFileSystem
+import numpy as np
+import xarray as xr
+
+from eisdashboard.model.data.granule_cache import LocalGranuleCache
+
+
+class CountingMemoryFileSystem(MemoryFileSystem):
+    """Memory filesystem that reports an ETag and counts remote reads."""
+
+    etag = 'v1'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads = 0
+
+    def info(self, path, **kwargs):
+        info = super().info(path, **kwargs)
+        info['ETag'] = self.etag
+        return info
+
+    def cat_file(self, path, start=None, end=None, **kwargs):
+        self.reads += 1
+        return super().cat_file(path, start=start, end=end, **kwargs)
+
+    def get_file(self, rpath, lpath, **kwargs):
+        self.reads += 1
+        return super().get_file(rpath, lpath, **kwargs)
+
+
+class TestLocalGranuleCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.temp_dir.name, 'granules')
+
+        self.file_system = CountingMemoryFileSystem(skip_instance_cache=True)
+        self.file_system.store.clear()
+        self.content = bytes(range(256)) * 40
+        self.file_system.pipe_file('/bucket/granule.nc', self.content)
+
+    def tearDown(self):
+        self.file_system.store.clear()
+        self.temp_dir.cleanup()
+
+    def test_block_reads_and_seeks(self):
+        cache = LocalGranuleCache(path=self.cache_path, block_size=1000)
+
+        with cache.open(self.file_system, '/bucket/granule.nc') as f:
+            f.seek(2500)
+            self.assertEqual(f.read(1000), self.content[2500:3500])
+            f.seek(-10, os.SEEK_END)
+            self.assertEqual(f.read(), self.content[-10:])
+
+        with cache.open(self.file_system, '/bucket/granule.nc') as f:
+            self.assertEqual(f.read(), self.content)
+
+        stats = cache.stats()
+        self.assertEqual(stats['entries'], 11)
+        self.assertEqual(stats['bytes'], len(self.content))
+        # Each block was fetched from the filesystem once
+        self.assertEqual(self.file_system.reads, 11)
+        self.assertGreater(stats['hit_ratio'], 0)
+
+    def test_persists_across_instances(self):
+        LocalGranuleCache(path=self.cache_path, whole_files=True).open(
+            self.file_system, '/bucket/granule.nc').close()
+
+        cache = LocalGranuleCache(path=self.cache_path, whole_files=True)
+
+        with cache.open(self.file_system, '/bucket/granule.nc') as f:
+            self.assertEqual(f.read(), self.content)
+
+        self.assertEqual(self.file_system.reads, 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['hit_ratio'], 1.0)
+
+    def test_changed_etag_is_refetched(self):
+        cache = LocalGranuleCache(path=self.cache_path, whole_files=True,
+                                  validate_ttl=0)
+        cache.open(self.file_system, '/bucket/granule.nc').close()
+
+        self.file_system.pipe_file('/bucket/granule.nc', b'reprocessed')
+        self.file_system.etag = 'v2'
+
+        with cache.open(self.file_system, '/bucket/granule.nc') as f:
+            self.assertEqual(f.read(), b'reprocessed')
+
+        self.assertEqual(self.file_system.reads, 2)
+        self.assertEqual(cache.stats()['entries'], 1)
+
+    def test_etag_trusted_within_ttl(self):
+        cache = LocalGranuleCache(path=self.cache_path, block_size=1000)
+
+        with patch.object(self.file_system, 'info',
+                          wraps=self.file_system.info) as info:
+
+            for _ in range(3):
+                cache.open(self.file_system, '/bucket/granule.nc').read(10)
+
+            # One HEAD for the first open, the others trust it
+            self.assertEqual(info.call_count, 1)
+            self.assertEqual(cache.stats()['validations'], 1)
+
+            # Checked again once the recorded ETag is validate_ttl old
+            with patch('eisdashboard.model.data.granule_cache.time.time',
+                       return_value=time.time() + 3600):
+                cache.open(self.file_system, '/bucket/granule.nc').read(10)
+
+            self.assertEqual(info.call_count, 2)
+
+        self.assertEqual(self.file_system.reads, 1)
+
+    def test_size_bounded_lru_eviction(self):
+        # Room for two 1000-byte blocks, not three
+        cache = LocalGranuleCache(path=self.cache_path, block_size=1000,
+                                  max_bytes=2500)
+
+        # A fresh reader per block, so every read goes to the cache
+        for block in (0, 1, 0, 2):
+            with cache.open(self.file_system, '/bucket/granule.nc') as f:
+                f.seek(block * 1000)
+                f.read(1000)
+
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], 2500)
+        self.assertGreater(stats['evictions'], 0)
+
+        # Block 0 was used more recently than block 1, so it survived
+        reads = self.file_system.reads
+        cache.open(self.file_system, '/bucket/granule.nc').read(1000)
+        self.assertEqual(self.file_system.reads, reads)
+
+    def test_open_netcdf_through_cache(self):
+        dataset = xr.Dataset(
+            {'precip': (('time', 'lat'), np.arange(12.0).reshape(3, 4))},
+            coords={'time': np.arange(3), 'lat': np.arange(4.0)})
+
+        netcdf_path = os.path.join(self.temp_dir.name, 'granule.nc')
+        dataset.to_netcdf(netcdf_path, engine='h5netcdf')
+
+        with open(netcdf_path, 'rb') as netcdf_file:
+            self.file_system.pipe_file('/bucket/real.nc', netcdf_file.read())
+
+        cache = LocalGranuleCache(path=self.cache_path, block_size=4096)
+
+        with xr.open_dataset(cache.open(self.file_system, '/bucket/real.nc'),
+                             engine='h5netcdf') as cached:
+            xr.testing.assert_identical(cached.load(), dataset)
+
+
+if __name__ == '__main__':
+    unittest.main()
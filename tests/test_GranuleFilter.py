@@ -0,0 +1,124 @@
+import unittest
+
+from eisdashboard.model.data.granule_filter import filter_granules
+from eisdashboard.model.data.granule_filter import overlaps
+from eisdashboard.model.data.granule_filter import parse_time_range
+from eisdashboard.model.granule import GranuleRecord
+
+
+def make_granule(name, bbox, start=0.0, end=10.0):
+    west, south, east, north = bbox
+    return GranuleRecord(name, f's3://bucket/{name}', 'provider',
+                         start=start, end=end, west=west, south=south,
+                         east=east, north=north)
+
+
+class TestGranuleFilter(unittest.TestCase):
+
+    def test_parse_time_range(self):
+        start, end = parse_time_range(
+            '2019-05-18T00:00:00Z,2019-06-18T00:00:00Z')
+        self.assertEqual(start, 1558137600.0)
+        self.assertEqual(end, 1560816000.0)
+
+    def test_spatial_filter(self):
+        granules = {
+            's3://bucket/inside.nc': make_granule('inside.nc',
+                                                  (-80, 35, -70, 45)),
+            's3://bucket/edge.nc': make_granule('edge.nc',
+                                                (-76.5, 38.8, -70, 45)),
+            's3://bucket/far.nc': make_granule('far.nc', (10, 10, 20, 20)),
+            's3://bucket/unknown.nc': GranuleRecord(
+                'unknown.nc', 's3://bucket/unknown.nc', 'provider'),
+        }
+
+        kept = filter_granules(granules, [-76.6, 38.8, -76.5, 38.9])
+
+        self.assertEqual(list(kept), ['s3://bucket/inside.nc',
+                                      's3://bucket/unknown.nc'])
+
+        # One granule at a time gives the same answer
+        self.assertEqual(
+            [s3_path for s3_path, granule in granules.items()
+             if overlaps(granule, [-76.6, 38.8, -76.5, 38.9])],
+            list(kept))
+
+    def test_antimeridian_granule(self):
+        granules = {
+            's3://bucket/wrap.nc': make_granule('wrap.nc',
+                                                (170, -10, -170, 10)),
+        }
+
+        self.assertEqual(len(filter_granules(granules, [175, -1, 176, 1])),
+                         1)
+        self.assertEqual(len(filter_granules(granules, [0, -1, 1, 1])), 0)
+
+    def test_antimeridian_query(self):
+        granules = {
+            's3://bucket/east.nc': make_granule('east.nc',
+                                                (172, -10, 178, 10)),
+            's3://bucket/west.nc': make_granule('west.nc',
+                                                (-178, -10, -172, 10)),
+            's3://bucket/middle.nc': make_granule('middle.nc',
+                                                  (-10, -10, 10, 10)),
+            's3://bucket/wrap.nc': make_granule('wrap.nc',
+                                                (179, -10, -179, 10)),
+        }
+        bounds = [170, -1, -170, 1]
+
+        kept = filter_granules(granules, bounds)
+
+        self.assertEqual(list(kept), ['s3://bucket/east.nc',
+                                      's3://bucket/west.nc',
+                                      's3://bucket/wrap.nc'])
+        self.assertEqual(
+            [s3_path for s3_path, granule in granules.items()
+             if overlaps(granule, bounds)],
+            list(kept))
+
+    def test_point_bounds(self):
+        granules = {
+            's3://bucket/inside.nc': make_granule('inside.nc',
+                                                  (-80, 35, -70, 45)),
+        }
+        kept = filter_granules(granules, [-76.5, 38.8, -76.5, 38.8])
+        self.assertEqual(len(kept), 1)
+
+    def test_point_and_line_bounds_on_shared_edge(self):
+        granules = {
+            's3://bucket/west.nc': make_granule('west.nc',
+                                                (-80, 30, -70, 40)),
+            's3://bucket/east.nc': make_granule('east.nc',
+                                                (-70, 30, -60, 40)),
+            's3://bucket/far.nc': make_granule('far.nc',
+                                               (0, 30, 10, 40)),
+        }
+
+        for bounds in ([-70, 35, -70, 35], [-70, 32, -70, 38]):
+
+            kept = filter_granules(granules, bounds)
+
+            self.assertEqual(list(kept), ['s3://bucket/west.nc',
+                                          's3://bucket/east.nc'])
+            self.assertEqual(
+                [s3_path for s3_path, granule in granules.items()
+                 if overlaps(granule, bounds)],
+                list(kept))
+
+    def test_temporal_filter(self):
+        granules = {
+            's3://bucket/before.nc': make_granule('before.nc', (0, 0, 1, 1),
+                                                  start=0, end=5),
+            's3://bucket/during.nc': make_granule('during.nc', (0, 0, 1, 1),
+                                                  start=5, end=15),
+            's3://bucket/after.nc': make_granule('after.nc', (0, 0, 1, 1),
+                                                 start=25, end=30),
+        }
+
+        kept = filter_granules(granules, [0.2, 0.2, 0.8, 0.8], (10, 20))
+
+        self.assertEqual(list(kept), ['s3://bucket/during.nc'])
+
+
+if __name__ == '__main__':
+    unittest.main()
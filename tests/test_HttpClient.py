@@ -0,0 +1,59 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from eisdashboard.model.http_client import HttpClient
+
+
+class TestHttpClient(unittest.TestCase):
+
+    def tearDown(self):
+        # Restore defaults so other tests see a fresh session
+        HttpClient.configure(retries=5, backoffFactor=0.5,
+                             connectTimeout=10.0, readTimeout=60.0,
+                             poolMaxsize=32)
+
+    def test_session_per_thread(self):
+        session_a = HttpClient.getSession()
+        session_b = HttpClient.getSession()
+        self.assertIs(session_a, session_b)
+
+        sessions = []
+        thread = threading.Thread(
+            target=lambda: sessions.append(HttpClient.getSession()))
+        thread.start()
+        thread.join()
+
+        # Another thread has its own session over the same adapter
+        self.assertIsNot(sessions[0], session_a)
+        self.assertIs(sessions[0].get_adapter('https://example.com'),
+                      session_a.get_adapter('https://example.com'))
+
+    def test_configure_rebuilds_session(self):
+        session_a = HttpClient.getSession()
+
+        HttpClient.configure(retries=2, backoffFactor=1.0, poolMaxsize=4)
+
+        session_b = HttpClient.getSession()
+        self.assertIsNot(session_a, session_b)
+
+        adapter = session_b.get_adapter('https://cmr.earthdata.nasa.gov')
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertEqual(adapter.max_retries.backoff_factor, 1.0)
+        self.assertIn(429, adapter.max_retries.status_forcelist)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+
+    def test_get_applies_default_timeout(self):
+        HttpClient.configure(connectTimeout=3.0, readTimeout=7.0)
+
+        with patch.object(HttpClient.getSession(), 'get') as mock_get:
+            HttpClient.get('https://example.com')
+            mock_get.assert_called_once_with('https://example.com',
+                                             timeout=(3.0, 7.0))
+
+            HttpClient.get('https://example.com', timeout=1)
+            mock_get.assert_called_with('https://example.com', timeout=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
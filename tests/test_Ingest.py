@@ -1,63 +1,40 @@
+import os
+import tempfile
+import time
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, patch, MagicMock
 import requests
 
+import fsspec
+import omegaconf
 import xarray as xr
 import numpy as np
 import pandas as pd
 
+from eisdashboard.model.config import Config
+from eisdashboard.model.config import StorageBackendSettings
+from eisdashboard.model.data.cluster import DaskCluster
 from eisdashboard.model.data.ingest import Ingest
+from eisdashboard.model.data.zarr_store import ZarrMetadataCache
+from eisdashboard.model.exceptions import CmrQueryError
+from eisdashboard.model.exceptions import DashboardRuntimeException
+from eisdashboard.model.granule import GranuleRecord
 
 
 class TestIngest(unittest.TestCase):
 
     def setUp(self):
-        # Initialize the Ingest object with a mock config
-        self.config = MagicMock()
+        # Initialize the Ingest object with the default config
+        self.config = omegaconf.OmegaConf.structured(Config)
         self.ingest = Ingest(self.config)
 
-    @patch('requests.get')
-    def test_get_temp_credentials_success(self, mock_requests_get):
-        # Mock the successful response from the S3 credentials endpoint
-        mock_response = MagicMock()
-        mock_response.json.return_value = {
-            'accessKeyId': 'mock_access_key',
-            'secretAccessKey': 'mock_secret_key',
-            'sessionToken': 'mock_session_token'
-        }
-        mock_requests_get.return_value = mock_response
-
-        # Call the _get_temp_credentials method
-        credentials = self.ingest._get_temp_credentials('GES_DISC')
-
-        # Assert that the method returns the expected credentials
-        self.assertEqual(credentials['accessKeyId'], 'mock_access_key')
-        self.assertEqual(credentials['secretAccessKey'], 'mock_secret_key')
-        self.assertEqual(credentials['sessionToken'], 'mock_session_token')
-
-    @patch('requests.get',
-           side_effect=requests.exceptions.RequestException('Mock error'))
-    def test_get_temp_credentials_failure(self, mock_requests_get):
-        # Mock an exception when making a request to the S3 credentials
-        # endpoint
-        result = self.ingest._get_temp_credentials('GES_DISC')
-
-        self.assertEqual(result, (0, None))
-
-    @patch('s3fs.S3FileSystem')
     @patch('xarray.open_mfdataset')
-    def test_ingest_success(self, mock_open_mfdataset, mock_s3fs):
-        # Mock the successful retrieval of S3 credentials and opening of files
-        mock_temp_creds = {
-            'accessKeyId': 'mock_access_key',
-            'secretAccessKey': 'mock_secret_key',
-            'sessionToken': 'mock_session_token'
-        }
-        self.ingest._get_temp_credentials = \
-            MagicMock(return_value=mock_temp_creds)
+    def test_ingest_success(self, mock_open_mfdataset):
+        # Mock the provider's shared S3 filesystem
+        self.ingest._credentials.get_file_system = MagicMock()
 
         # Mock the successful opening of S3 files
-        mock_open_mfdataset.return_value = MagicMock()
+        mock_open_mfdataset.return_value = MagicMock(nbytes=0)
 
         # Call the ingest method
         result = self.ingest.ingest('GES_DISC', ('s3://file1.nc',
@@ -66,43 +43,674 @@ class TestIngest(unittest.TestCase):
         # Assert that the method returns a valid result
         self.assertIsNotNone(result)
 
-    @patch('s3fs.S3FileSystem')
-    def test_ingest_failure(self, mock_s3fs):
-        # Mock an exception when opening S3 files
+    @patch('eisdashboard.model.data.ingest.Ingest._open_granules')
+    def test_ingest_uses_dataset_cache(self, mock_open_granules):
+        mock_open_granules.return_value = xr.Dataset(
+            {'precip': ('time', np.zeros(4))})
+
+        s3_list = ('s3://file1.nc', 's3://file2.nc')
+
+        first = self.ingest.ingest('GES_DISC', s3_list, collection_id='A')
+        second = self.ingest.ingest('GES_DISC', s3_list, collection_id='A')
+
+        self.assertIs(first, second)
+        mock_open_granules.assert_called_once()
+        self.assertEqual(self.ingest.dataset_cache_stats()['hits'], 1)
+
+        self.assertEqual(self.ingest.invalidate_collection('A'), 1)
+        self.ingest.ingest('GES_DISC', s3_list, collection_id='A')
+        self.assertEqual(mock_open_granules.call_count, 2)
+
+    @patch('eisdashboard.model.data.credentials.HttpClient.get',
+           side_effect=requests.exceptions.RequestException('Mock error'))
+    def test_ingest_failure(self, mock_requests_get):
+        # No credentials, so there is no filesystem to open the files with
 
         with self.assertRaises(ValueError):
             self.ingest.ingest('GES_DISC', ('s3://file1.nc',
                                             's3://file2.nc'))
 
-    @patch('eisdashboard.model.cmr_query.CmrProcess')
+    def test_ingest_subsets_granules(self):
+        lats = np.arange(89.875, -60, -0.25)
+        lons = np.arange(0.125, 360, 0.25)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+
+            granules = []
+
+            for hour in range(3):
+                granule = xr.Dataset(
+                    {name: (('time', 'lat', 'lon'),
+                            np.zeros((1, len(lats), len(lons)),
+                                     dtype='float32'))
+                     for name in ('Rainf_tavg', 'Tair_f_inst', 'Qair_f_inst')},
+                    coords={'time': [pd.Timestamp('2019-05-18') +
+                                     pd.Timedelta(hours=3 * hour)],
+                            'lat': lats,
+                            'lon': lons})
+                granule_path = os.path.join(temp_dir, f'granule{hour}.nc4')
+                granule.to_netcdf(granule_path, engine='h5netcdf')
+                granules.append(granule_path)
+
+            self.ingest._credentials.get_file_system = MagicMock(
+                return_value=fsspec.filesystem('file'))
+
+            result = self.ingest.ingest('GES_DISC', tuple(granules),
+                                        (-76.6, 38.8, -76.5, 38.9),
+                                        ('Rainf_tavg', 'Tair_f_inst'))
+
+            self.assertEqual(set(result.data_vars),
+                             {'Rainf_tavg', 'Tair_f_inst'})
+
+            self.assertEqual(result.sizes['time'], 3)
+            self.assertLessEqual(result.sizes['lat'], 3)
+            self.assertLessEqual(result.sizes['lon'], 3)
+            # Normalized to ascending lat and -180..180 lon
+            self.assertIn(283.375 - 360, result.lon.values)
+            self.assertIn(38.875, result.lat.values)
+            self.assertTrue((np.diff(result.lat.values) > 0).all())
+            self.assertEqual(result.attrs['normalized'], 1)
+            result.close()
+
+    def test_fast_combine_matches_by_coords(self):
+        lats = np.arange(30.5, 40, 1.0)
+        lons = np.arange(-80.5, -70, 1.0)
+        start = pd.Timestamp('2019-05-18')
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+
+            granules = {}
+
+            # File names sort in a different order than the times
+            for name, hour in (('c', 0), ('a', 3), ('b', 6), ('d', 9)):
+                times = [start + pd.Timedelta(hours=hour)]
+                granule = xr.Dataset(
+                    {'Rainf_tavg': (('time', 'lat', 'lon'),
+                                    np.random.rand(1, len(lats), len(lons))),
+                     'land_mask': (('lat', 'lon'),
+                                   np.ones((len(lats), len(lons))))},
+                    coords={'time': times, 'lat': lats, 'lon': lons})
+                granule_path = os.path.join(temp_dir, f'{name}.nc4')
+                granule.to_netcdf(granule_path, engine='h5netcdf')
+                granules[granule_path] = GranuleRecord(
+                    f'{name}.nc4', granule_path, 'GES_DISC',
+                    start=times[0].timestamp())
+
+            s3_list = tuple(sorted(granules))
+            bounds = (-76.6, 33.8, -74.5, 35.9)
+
+            self.ingest._credentials.get_file_system = MagicMock(
+                return_value=fsspec.filesystem('file'))
+
+            with patch('xarray.open_mfdataset',
+                       wraps=xr.open_mfdataset) as open_mfdataset:
+
+                expected = self.ingest.ingest('GES_DISC', s3_list, bounds,
+                                              granules=granules)
+                self.assertEqual(open_mfdataset.call_args.kwargs['combine'],
+                                 'by_coords')
+
+                self.config.ingest.fast_combine = True
+                self.ingest.invalidate_collection(None)
+
+                result = self.ingest.ingest('GES_DISC', s3_list, bounds,
+                                            granules=granules)
+                self.assertEqual(open_mfdataset.call_args.kwargs['combine'],
+                                 'nested')
+
+            # Time-invariant variables are repeated along time in both
+            self.assertEqual(result.land_mask.dims, ('time', 'lat', 'lon'))
+            xr.testing.assert_identical(result.load(), expected.load())
+
+            # No CMR start time for one granule, combined by coordinates
+            granules[s3_list[0]].start = float('nan')
+            self.assertIsNone(self.ingest._time_order(s3_list, granules))
+
+            expected.close()
+            result.close()
+
+    def test_ingest_lazy_granules(self):
+        self.config.ingest.lazy_granules = True
+        start = pd.Timestamp('2019-05-18')
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+
+            granules = {}
+
+            for day in range(5):
+                times = [start + pd.Timedelta(days=day)]
+                granule = xr.Dataset(
+                    {'Rainf_tavg': (('time', 'Latitude', 'Longitude'),
+                                    np.random.rand(1, 2, 2))},
+                    coords={'time': times, 'Latitude': [1.5, 0.5],
+                            'Longitude': [0.5, 1.5]})
+                granule_path = os.path.join(temp_dir, f'day{day}.nc4')
+                granule.to_netcdf(granule_path, engine='h5netcdf')
+                granules[granule_path] = GranuleRecord(
+                    f'day{day}.nc4', granule_path, 'GES_DISC',
+                    start=times[0].timestamp())
+
+            file_system = fsspec.filesystem('file')
+            self.ingest._credentials.get_file_system = MagicMock(
+                return_value=MagicMock(open=MagicMock(
+                    side_effect=file_system.open)))
+            opens = self.ingest._credentials.get_file_system().open
+
+            result = self.ingest.ingest('GES_DISC', tuple(sorted(granules)),
+                                        granules=granules)
+
+            # Only the template granule is opened up front
+            self.assertEqual(opens.call_count, 1)
+            self.assertEqual(result.sizes['time'], 5)
+            self.assertEqual(list(result.lat.values), [0.5, 1.5])
+
+            result.Rainf_tavg.isel(time=-1).load()
+            self.assertEqual(opens.call_count, 2)
+
+    @unittest.skipUnless(ZarrMetadataCache.available(),
+                         'zarr 3 not installed')
+    def test_get_custom_s3_data_zarr(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+
+            self.config.zarr_metadata_cache.enabled = True
+            self.config.zarr_metadata_cache.path = \
+                os.path.join(temp_dir, 'metadata')
+            ingest = Ingest(self.config)
+
+            store = xr.Dataset(
+                {'FWI': (('time', 'Latitude', 'Longitude'),
+                         np.random.rand(4, 3, 2))},
+                coords={'time': pd.date_range('2019-05-18', periods=4),
+                        'Latitude': [2.0, 1.0, 0.0],
+                        'Longitude': [0.0, 1.0]})
+            store_path = os.path.join(temp_dir, 'imerg-fwi.zarr')
+            store.chunk({'time': 2}).to_zarr(store_path, consolidated=True)
+
+            result = ingest.get_custom_s3_data('IMERG_FWI',
+                                               f'file://{store_path}')
+
+            data = result['data']
+            self.assertEqual(result['key'], 'IMERG_FWI')
+            self.assertEqual(data.FWI.dims, ('time', 'lat', 'lon'))
+            self.assertEqual(data.chunksizes['time'], (2, 2))
+            self.assertEqual(list(data.lat.values), [0.0, 1.0, 2.0])
+
+            # Without zarr 3 the store is opened with open_mfdataset
+            with patch('eisdashboard.model.data.zarr_store.FsspecStore',
+                       None), \
+                    patch('xarray.open_mfdataset',
+                          wraps=xr.open_mfdataset) as open_mfdataset:
+
+                self.assertIsNone(
+                    Ingest(self.config)._zarr_metadata_cache)
+
+                result = ingest.get_custom_s3_data('IMERG_FWI',
+                                                   f'file://{store_path}')
+
+                open_mfdataset.assert_called_once()
+                self.assertEqual(result['data'].FWI.dims,
+                                 ('time', 'lat', 'lon'))
+
+    @patch('eisdashboard.model.data.ingest.CmrProcess')
+    def test_get_data_from_memory_backend(self, mock_cmr_process):
+        self.config.storage.collections = {
+            'SYNTHETIC': StorageBackendSettings(protocol='memory',
+                                                root='test-ingest')}
+        ingest = Ingest(self.config)
+
+        memory = fsspec.filesystem('memory')
+        records = []
+
+        for day in range(3):
+            time = pd.Timestamp('2019-05-18') + pd.Timedelta(days=day)
+            url = f'https://archive.gov/bucket/day{day}.nc4'
+            granule = xr.Dataset(
+                {'precip': (('time', 'lat', 'lon'), np.ones((1, 2, 2)))},
+                coords={'time': [time], 'lat': [0.5, 1.5],
+                        'lon': [0.5, 1.5]})
+            memory.pipe(ingest.storage_backend('SYNTHETIC').granule_path(url),
+                        granule.to_netcdf(engine='h5netcdf'))
+            records.append(GranuleRecord(f'day{day}.nc4', url, 'GES_DISC'))
+
+        mock_cmr_process.return_value.iterGranules.return_value = \
+            iter(records)
+
+        result = ingest.get_data_from_bounds({
+            'collection_id': 'SYNTHETIC',
+            'datetime': '2019-05-18T00:00:00Z,2019-05-21T00:00:00Z',
+            'coords': [0.0, 0.0, 2.0, 2.0],
+            'spatialParameter': 'bounding_box'})
+
+        self.assertEqual(result['data'].sizes['time'], 3)
+        self.assertEqual(
+            ingest._query_state['SYNTHETIC']['file_urls'],
+            {f'memory:///test-ingest/bucket/day{day}.nc4'
+             for day in range(3)})
+
+        # Other collections still read from S3
+        self.assertEqual(ingest.storage_backend('OTHER').PROTOCOL, 's3')
+
+        self.assertEqual(
+            ingest._refine_urls(['https://archive.gov/bucket/day0.nc4'],
+                                'SYNTHETIC'),
+            ('memory:///test-ingest/bucket/day0.nc4',))
+
+        ingest._credentials.get_file_system = MagicMock(return_value=None)
+        with self.assertRaisesRegex(ValueError, 'The s3 storage backend'):
+            ingest._get_file_system('OTHER', 'GES_DISC')
+
+        memory.rm('/test-ingest', recursive=True)
+
+    @unittest.skipUnless(DaskCluster.available(), 'distributed not installed')
+    def test_ingest_on_dask_cluster(self):
+        self.config.dask.enabled = True
+        self.config.dask.n_workers = 2
+        self.config.dask.threads_per_worker = 1
+        self.config.dask.memory_limit = '1GB'
+        self.config.dask.dashboard_address = ''
+
+        ingest = Ingest(self.config)
+
+        try:
+            self.assertTrue(ingest._dask_cluster.client.cluster.processes)
+
+            with tempfile.TemporaryDirectory() as temp_dir:
+
+                s3_list = []
+
+                for day in range(3):
+                    time = pd.Timestamp('2019-05-18') + pd.Timedelta(days=day)
+                    granule = xr.Dataset(
+                        {'precip': (('time', 'lat', 'lon'),
+                                    np.full((1, 2, 2), float(day)))},
+                        coords={'time': [time], 'lat': [0.5, 1.5],
+                                'lon': [0.5, 1.5]})
+                    granule_path = os.path.join(temp_dir, f'day{day}.nc4')
+                    granule.to_netcdf(granule_path, engine='h5netcdf')
+                    s3_list.append(granule_path)
+
+                ingest._credentials.get_file_system = MagicMock(
+                    return_value=fsspec.filesystem('file'))
+
+                result = ingest.ingest('GES_DISC', tuple(s3_list))
+                averaged = result['precip'].resample(time='2D').mean()
+
+                self.assertEqual(averaged.values[:, 0, 0].tolist(),
+                                 [0.5, 2.0])
+
+        finally:
+            ingest.close()
+
+        self.assertIsNone(ingest._dask_cluster)
+
+    @patch('eisdashboard.model.data.ingest.DaskCluster')
+    def test_initialize_dask_cluster(self, mock_dask_cluster):
+        self.assertIsNone(self.ingest._initialize_dask_cluster())
+
+        self.config.dask.enabled = True
+
+        mock_dask_cluster.available.return_value = False
+        self.assertIsNone(self.ingest._initialize_dask_cluster())
+        mock_dask_cluster.assert_not_called()
+
+        mock_dask_cluster.available.return_value = True
+        self.assertIs(self.ingest._initialize_dask_cluster(),
+                      mock_dask_cluster.acquire.return_value)
+        self.assertTrue(
+            mock_dask_cluster.acquire.call_args.kwargs['processes'])
+
+        # Lazy granule handles cannot be sent to worker processes
+        self.config.ingest.lazy_granules = True
+        self.ingest._initialize_dask_cluster()
+        self.assertFalse(
+            mock_dask_cluster.acquire.call_args.kwargs['processes'])
+
+    def test_allowed_variables(self):
+        self.config.data.datasets = ['GLDAS:Rainf_tavg', 'MERRA:T2M',
+                                     'no_separator']
+        self.config.data.default = ['GLDAS:Tair_f_inst', 'GLDAS:Rainf_tavg']
+
+        self.assertEqual(self.ingest.allowed_variables('GLDAS'),
+                         ('Rainf_tavg', 'Tair_f_inst'))
+        self.assertEqual(self.ingest.allowed_variables('MERRA'), ('T2M',))
+        self.assertIsNone(self.ingest.allowed_variables('OTHER'))
+
+        # A default variable alone does not restrict its collection
+        self.config.data.default = ['IMERG:precipitation']
+        self.assertIsNone(self.ingest.allowed_variables('IMERG'))
+
+    def test_ingest_drops_unlisted_variables_on_open(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+
+            s3_list = []
+
+            for day in range(2):
+                time = pd.Timestamp('2019-05-18') + pd.Timedelta(days=day)
+                granule = xr.Dataset(
+                    {'Rainf_tavg': (('time', 'lat', 'lon'),
+                                    np.ones((1, 2, 2))),
+                     'Tair_f_inst': (('time', 'lat', 'lon'),
+                                     np.ones((1, 2, 2)))},
+                    coords={'time': [time], 'lat': [0.5, 1.5],
+                            'lon': [0.5, 1.5]})
+                granule_path = os.path.join(temp_dir, f'day{day}.nc4')
+                granule.to_netcdf(granule_path, engine='h5netcdf')
+                s3_list.append(granule_path)
+
+            self.ingest._credentials.get_file_system = MagicMock(
+                return_value=fsspec.filesystem('file'))
+
+            with patch('xarray.open_mfdataset',
+                       wraps=xr.open_mfdataset) as open_mfdataset:
+                result = self.ingest.ingest('GES_DISC', tuple(s3_list),
+                                            variables=('Rainf_tavg',))
+
+            self.assertEqual(
+                open_mfdataset.call_args.kwargs['drop_variables'],
+                ['Tair_f_inst'])
+            self.assertEqual(list(result.data_vars), ['Rainf_tavg'])
+            self.assertEqual(result.sizes['time'], 2)
+
+    def test_open_s3_files_parallel(self):
+        def slow_open(path):
+            time.sleep(0.2)
+            if path.endswith('bad.nc'):
+                raise FileNotFoundError(path)
+            return f'opened {path}'
+
+        file_system = MagicMock()
+        file_system.open.side_effect = slow_open
+
+        s3_list = tuple(f's3://bucket/file{i}.nc' for i in range(7)) + \
+            ('s3://bucket/bad.nc',)
+
+        start = time.perf_counter()
+        opened, failures = self.ingest._open_s3_files(file_system, s3_list)
+        elapsed = time.perf_counter() - start
+
+        # Eight 0.2s opens on eight workers overlap
+        self.assertLess(elapsed, 0.2 * len(s3_list) / 2)
+
+        self.assertEqual(opened, [f'opened s3://bucket/file{i}.nc'
+                                  for i in range(7)])
+        self.assertEqual(list(failures), ['s3://bucket/bad.nc'])
+        self.assertIsInstance(failures['s3://bucket/bad.nc'],
+                              FileNotFoundError)
+
+    @patch('eisdashboard.model.data.ingest.CmrProcess')
     @patch('eisdashboard.model.data.ingest.Ingest.ingest')
     def test_get_data_from_bounds(self, mock_ingest, mock_cmr_process):
         # Mocking necessary objects
-        mock_cmr_process.return_value.run.return_value = ([],
-                                                          'mock_provider_id')
+        mock_cmr_process.return_value.iterGranules.return_value = iter([
+            GranuleRecord('file2.nc', 'https://archive.gov/bucket/file2.nc',
+                          'mock_provider_id'),
+            GranuleRecord('file1.nc', 'https://archive.gov/bucket/file1.nc',
+                          'mock_provider_id'),
+        ])
         mock_ingest.return_value = MagicMock()
 
-        # Creating a mock configuration
-        mock_config = MagicMock()
-
         # Creating an instance of Ingest
-        ingest_instance = Ingest(mock_config)
+        ingest_instance = Ingest(self.config)
 
         # Creating a mock query package
         mock_query_package = {
             'collection_id': 'mock_collection_id',
             'datetime': 'mock_datetime',
-            'coords': [1.0, 2.0],
+            'coords': [1.0, 2.0, 3.0, 4.0],
             'spatialParameter': 'mock_spatial_parameter'
         }
 
         # Calling the method to be tested
         result = ingest_instance.get_data_from_bounds(mock_query_package)
 
+        mock_ingest.assert_called_once_with(
+            'mock_provider_id',
+            ('s3://bucket/file1.nc', 's3://bucket/file2.nc'),
+            (1.0, 2.0, 3.0, 4.0), None,
+            collection_id='mock_collection_id', granules=ANY)
+
         self.assertEqual(result['key'], 'mock_collection_id')
         self.assertIsInstance(result['data'], MagicMock)
         self.assertIsInstance(result['variables'], list)
 
+    @patch('eisdashboard.model.data.ingest.Ingest._combine_s3_files')
+    @patch('eisdashboard.model.data.ingest.CmrProcess')
+    def test_get_data_from_bounds_pipelined(self, mock_cmr_process,
+                                            mock_combine):
+        self.config.ingest.pipeline = True
+        self.config.ingest.pipeline_queue_size = 2
+        ingest_instance = Ingest(self.config)
+
+        events = []
+
+        def iter_granules():
+            for i in range(4):
+                time.sleep(0.2)
+                events.append(('page', i))
+                yield GranuleRecord(f'file{i}.nc',
+                                    f'https://archive.gov/bucket/file{i}.nc',
+                                    'mock_provider_id')
+
+        def slow_open(path):
+            events.append(('open', path))
+            time.sleep(0.2)
+            return f'opened {path}'
+
+        mock_cmr_process.return_value.iterGranules.side_effect = \
+            iter_granules
+        file_system = MagicMock()
+        file_system.open.side_effect = slow_open
+        ingest_instance._credentials.get_file_system = MagicMock(
+            return_value=file_system)
+        mock_combine.return_value = xr.Dataset(
+            {'precip': ('time', np.zeros(4))})
+
+        start = time.perf_counter()
+        result = ingest_instance.get_data_from_bounds({
+            'collection_id': 'mock_collection_id',
+            'datetime': 'mock_datetime',
+            'coords': [1.0, 2.0, 3.0, 4.0],
+            'spatialParameter': 'mock_spatial_parameter'})
+        elapsed = time.perf_counter() - start
+
+        # Opening overlaps the paging: max(0.8, 0.8) + one open, not 1.6
+        self.assertLess(elapsed, 1.4)
+        self.assertLess(events.index(('open', 's3://bucket/file0.nc')),
+                        events.index(('page', 3)))
+
+        s3_list = tuple(f's3://bucket/file{i}.nc' for i in range(4))
+        provider_id, paths, opened, failures, _ = \
+            mock_combine.call_args.args
+        self.assertEqual(provider_id, 'mock_provider_id')
+        self.assertEqual(paths, s3_list)
+        self.assertEqual(opened, [f'opened {path}' for path in s3_list])
+        self.assertEqual(failures, {})
+
+        self.assertIs(result['data'], mock_combine.return_value)
+        self.assertEqual(
+            ingest_instance._query_state['mock_collection_id']['file_urls'],
+            set(s3_list))
+
+        # The combined dataset is cached like an ingest() result
+        cached = ingest_instance.ingest('mock_provider_id', s3_list,
+                                        (1.0, 2.0, 3.0, 4.0), None)
+        self.assertIs(cached, mock_combine.return_value)
+
+    @patch('eisdashboard.model.data.ingest.Ingest._combine_s3_files')
+    @patch('eisdashboard.model.data.ingest.CmrProcess')
+    def test_pipelined_cache_hit_and_no_granules(self, mock_cmr_process,
+                                                 mock_combine):
+        self.config.ingest.pipeline = True
+        ingest_instance = Ingest(self.config)
+
+        mock_cmr_process.return_value.iterGranules.side_effect = \
+            lambda: iter([GranuleRecord(
+                f'file{i}.nc', f'https://archive.gov/bucket/file{i}.nc',
+                'mock_provider_id') for i in range(3)])
+        opened = []
+
+        def open_file(path):
+            opened.append(MagicMock())
+            return opened[-1]
+
+        file_system = MagicMock()
+        file_system.open.side_effect = open_file
+        ingest_instance._credentials.get_file_system = MagicMock(
+            return_value=file_system)
+        mock_combine.return_value = xr.Dataset(
+            {'precip': ('time', np.zeros(3))})
+
+        query_package = {'collection_id': 'mock_collection_id',
+                         'datetime': 'mock_datetime',
+                         'coords': [1.0, 2.0, 3.0, 4.0],
+                         'spatialParameter': 'mock_spatial_parameter'}
+
+        ingest_instance.get_data_from_bounds(query_package)
+        result = ingest_instance.get_data_from_bounds(query_package)
+
+        # The second query hits the dataset cache and closes its opens
+        self.assertIs(result['data'], mock_combine.return_value)
+        mock_combine.assert_called_once()
+        self.assertFalse(any(f.close.called for f in opened[:3]))
+        self.assertTrue(all(f.close.called for f in opened[3:]))
+
+        # No granules: no misleading credentials error
+        mock_cmr_process.return_value.iterGranules.side_effect = \
+            lambda: iter([])
+
+        self.assertIsNone(ingest_instance._query_and_ingest(query_package,
+                                                            None))
+
+        with self.assertRaisesRegex(DashboardRuntimeException,
+                                    'No mock_collection_id data'):
+            ingest_instance.get_data_from_bounds(query_package)
+
+    @patch('eisdashboard.model.data.ingest.CmrProcess')
+    @patch('eisdashboard.model.data.ingest.Ingest.ingest')
+    def test_failed_cmr_page_is_not_ingested(self, mock_ingest,
+                                             mock_cmr_process):
+        def iter_granules():
+            yield GranuleRecord('file0.nc',
+                                'https://archive.gov/bucket/file0.nc',
+                                'mock_provider_id')
+            raise CmrQueryError('CMR page 2 failed')
+
+        mock_cmr_process.return_value.iterGranules.side_effect = \
+            iter_granules
+
+        query_package = {'collection_id': 'mock_collection_id',
+                         'datetime': 'mock_datetime',
+                         'coords': [1.0, 2.0, 3.0, 4.0],
+                         'spatialParameter': 'mock_spatial_parameter'}
+
+        with self.assertRaises(CmrQueryError):
+            self.ingest.get_data_from_bounds(query_package)
+
+        mock_ingest.assert_not_called()
+
+        # Pipelined: the granule already opened is closed again
+        self.config.ingest.pipeline = True
+        opened = MagicMock()
+        self.ingest._credentials.get_file_system = MagicMock()
+        self.ingest._credentials.get_file_system.return_value.open \
+            .return_value = opened
+
+        with self.assertRaises(CmrQueryError):
+            self.ingest.get_data_from_bounds(query_package)
+
+        opened.close.assert_called_once_with()
+        self.assertNotIn('mock_collection_id', self.ingest._query_state)
+
+    @patch('eisdashboard.model.data.ingest.CmrProcess')
+    @patch('eisdashboard.model.data.ingest.Ingest.ingest')
+    def test_refresh_nasa_earthdata(self, mock_ingest, mock_cmr_process):
+        query_package = {
+            'collection_id': 'mock_collection_id',
+            'datetime': 'mock_datetime',
+            'coords': [1.0, 2.0, 3.0, 4.0],
+            'spatialParameter': 'mock_spatial_parameter'
+        }
+
+        def make_dataset(times):
+            return xr.Dataset(
+                {'temperature': (['time', 'lat', 'lon'],
+                                 np.ones((len(times), 2, 2)))},
+                coords={'time': pd.to_datetime(times),
+                        'lat': [0.0, 1.0], 'lon': [0.0, 1.0]})
+
+        def make_granule(day, revision_date='2024-01-01T00:00:00.000Z'):
+            return GranuleRecord(f'{day}.nc', f's3://bucket/{day}.nc',
+                                 'provider', revision_date=revision_date)
+
+        # Initial query
+        mock_cmr_process.return_value.iterGranules.return_value = iter([
+            make_granule('day1')])
+        mock_cmr_process.return_value.latestRevisionDate = \
+            '2024-01-01T00:00:00.000Z'
+        mock_ingest.return_value = make_dataset(['2024-01-01'])
+
+        ingest_instance = Ingest(self.config)
+        result = ingest_instance.get_data_from_bounds(query_package)
+
+        # A refresh whose new granules fail to load leaves the state as it
+        # was, so the next refresh asks for them again
+        mock_cmr_process.return_value.iterGranules.return_value = iter([
+            make_granule('day2')])
+        mock_cmr_process.return_value.latestRevisionDate = \
+            '2024-01-02T00:00:00.000Z'
+        mock_ingest.return_value = None
+
+        with self.assertRaises(DashboardRuntimeException):
+            ingest_instance.refresh_nasa_earthdata(query_package,
+                                                   result['data'])
+
+        query_state = ingest_instance._query_state['mock_collection_id']
+        self.assertEqual(query_state['revision_date'],
+                         '2024-01-01T00:00:00.000Z')
+        self.assertEqual(query_state['file_urls'], {'s3://bucket/day1.nc'})
+
+        # Refresh returns the already seen granule and a new one
+        mock_cmr_process.return_value.iterGranules.return_value = iter([
+            make_granule('day1'), make_granule('day2')])
+        mock_ingest.return_value = make_dataset(['2024-01-02'])
+
+        refreshed = ingest_instance.refresh_nasa_earthdata(query_package,
+                                                           result['data'])
+
+        self.assertEqual(
+            mock_cmr_process.call_args.kwargs['updatedSince'],
+            '2024-01-01T00:00:00.000Z')
+        mock_ingest.assert_called_with('provider', ('s3://bucket/day2.nc',),
+                                       tuple(query_package['coords']), None,
+                                       collection_id='mock_collection_id',
+                                       granules=ANY)
+        self.assertEqual(refreshed['data'].sizes['time'], 2)
+
+        # Nothing new, dataset comes back untouched
+        mock_cmr_process.return_value.iterGranules.return_value = iter([])
+        unchanged = ingest_instance.refresh_nasa_earthdata(
+            query_package, refreshed['data'])
+        self.assertIs(unchanged['data'], refreshed['data'])
+
+        # A seen granule re-processed under the same URL is read again
+        mock_cmr_process.return_value.iterGranules.return_value = iter([
+            make_granule('day1', '2024-02-01T00:00:00.000Z'),
+            make_granule('day2')])
+        reprocessed = make_dataset(['2024-01-01'])
+        reprocessed['temperature'] += 1
+        mock_ingest.return_value = reprocessed
+
+        revised = ingest_instance.refresh_nasa_earthdata(query_package,
+                                                         refreshed['data'])
+
+        mock_ingest.assert_called_with('provider', ('s3://bucket/day1.nc',),
+                                       tuple(query_package['coords']), None,
+                                       collection_id='mock_collection_id',
+                                       granules=ANY)
+        self.assertEqual(revised['data'].sizes['time'], 2)
+        self.assertEqual(
+            float(revised['data'].temperature.isel(time=0).max()), 2.0)
+
     def test_rename_dims(self):
         # dummy instance
         ingest = Ingest(self.config)
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+import dask
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from eisdashboard.model.data.lazy_granules import LazyGranuleDataset
+from eisdashboard.model.granule import GranuleRecord
+
+
+class TestLazyGranuleDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.granules = {}
+
+        start = pd.Timestamp('2019-05-18')
+
+        for day in range(6):
+            # Two timesteps per granule, 3 hours after its start
+            day_start = start + pd.Timedelta(days=day)
+            times = [day_start + pd.Timedelta(hours=3),
+                     day_start + pd.Timedelta(hours=15)]
+            granule = xr.Dataset(
+                {'precip': (('time', 'lat', 'lon'),
+                            np.random.rand(2, 3, 4)),
+                 'land_mask': (('lat', 'lon'), np.ones((3, 4)))},
+                coords={'time': times, 'lat': [0.5, 1.5, 2.5],
+                        'lon': [10.5, 11.5, 12.5, 13.5]})
+            path = os.path.join(self.temp_dir.name, f'day{day}.nc4')
+            granule.to_netcdf(path, engine='h5netcdf')
+            self.granules[path] = GranuleRecord(
+                f'day{day}.nc4', path, 'provider',
+                start=day_start.timestamp())
+
+        self.opened = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def open_file(self, path):
+        self.opened.append(path)
+        return open(path, 'rb')
+
+    def test_opens_only_the_window(self):
+        lazy = LazyGranuleDataset(self.open_file, self.granules, max_open=2)
+
+        dataset = lazy.to_dataset()
+
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(dataset.sizes['time'], 12)
+
+        window = dataset.precip.sel(time=slice('2019-05-20', '2019-05-21'))
+        window.load()
+
+        # The template, then the two days in the window
+        paths = lazy.paths
+        self.assertEqual(self.opened[0], paths[0])
+        self.assertEqual(sorted(self.opened[1:]), [paths[2], paths[3]])
+        self.assertLessEqual(lazy.stats()['open'], 2)
+        self.assertEqual(lazy.stats()['evictions'], 1)
+
+    def test_matches_open_mfdataset(self):
+        lazy = LazyGranuleDataset(self.open_file, self.granules, max_open=2)
+
+        dataset = lazy.to_dataset()
+        expected = xr.open_mfdataset(lazy.paths, combine='by_coords',
+                                     data_vars='all')
+
+        xr.testing.assert_identical(dataset.precip.load(),
+                                    expected.precip.load())
+        xr.testing.assert_equal(
+            dataset.land_mask, expected.land_mask.isel(time=0, drop=True))
+        self.assertLessEqual(lazy.stats()['open'], 2)
+
+        expected.close()
+
+    def test_datasets_over_same_granules_do_not_share_tasks(self):
+        first = LazyGranuleDataset(self.open_file, self.granules).to_dataset()
+        second = LazyGranuleDataset(
+            self.open_file, self.granules,
+            preprocess=lambda granule: granule * 2).to_dataset()
+
+        first_sum, second_sum = dask.compute(first.precip.sum(),
+                                             second.precip.sum())
+
+        self.assertAlmostEqual(float(second_sum), 2 * float(first_sum))
+
+    def test_preprocess_and_no_time_dimension(self):
+        lazy = LazyGranuleDataset(
+            self.open_file, self.granules,
+            preprocess=lambda granule: granule.isel(time=0, drop=True))
+
+        with self.assertRaises(ValueError):
+            lazy.to_dataset()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+import numpy as np
+import xarray as xr
+from shapely.geometry import box
+
+from eisdashboard.model import utils
+from eisdashboard.model.data.normalize import is_normalized
+from eisdashboard.model.data.normalize import normalize_coordinates
+from eisdashboard.model.data.normalize import wrap_longitude
+from eisdashboard.model.data.normalize import wrap_polygon
+
+
+def make_grid(lats, lons):
+    values = np.arange(2 * len(lats) * len(lons), dtype='float64')
+    return xr.Dataset(
+        {'precip': (('time', 'lat', 'lon'),
+                    values.reshape(2, len(lats), len(lons)))},
+        coords={'time': [0, 1], 'lat': lats, 'lon': lons})
+
+
+class TestNormalizeCoordinates(unittest.TestCase):
+
+    LATS = np.arange(-89.5, 90, 1.0)
+    LONS = np.arange(-179.5, 180, 1.0)
+
+    def test_already_normalized(self):
+        grid = make_grid(self.LATS, self.LONS)
+
+        normalized = normalize_coordinates(grid)
+
+        self.assertEqual(normalized.attrs['normalized'], 1)
+        self.assertNotIn('normalized', grid.attrs)
+        xr.testing.assert_equal(normalized, grid)
+
+    def test_descending_latitude_and_0_360_longitude(self):
+        grid = make_grid(self.LATS[::-1], self.LONS % 360).chunk({'lat': 30})
+
+        normalized = normalize_coordinates(grid)
+
+        np.testing.assert_array_equal(normalized.lat.values, self.LATS)
+        np.testing.assert_array_equal(normalized.lon.values, self.LONS)
+        self.assertTrue(is_normalized(normalized))
+        self.assertFalse(is_normalized(grid))
+        # Still lazy
+        self.assertIsNotNone(normalized.precip.chunks)
+
+        # Every value stays with its coordinates
+        expected = grid.precip.sel(lat=38.5, lon=-76.5 % 360)
+        actual = normalized.precip.sel(lat=38.5, lon=-76.5)
+        np.testing.assert_array_equal(actual.values, expected.values)
+
+    def test_slice_to_geometry_bounds(self):
+        grid = make_grid(self.LATS, self.LONS).chunk({'lat': 30})
+        polygon = box(-77, 38, -75, 40)
+
+        window = utils.slice_to_bounds(grid.precip,
+                                       utils.geometry_bounds(polygon))
+
+        # The cells inside the polygon plus one on each side, still lazy
+        np.testing.assert_array_equal(window.lat.values,
+                                      [37.5, 38.5, 39.5, 40.5])
+        np.testing.assert_array_equal(window.lon.values,
+                                      [-77.5, -76.5, -75.5, -74.5])
+        self.assertIsNotNone(window.chunks)
+
+    def test_slice_to_bounds_outside_grid(self):
+        grid = make_grid(self.LATS, self.LONS).precip
+
+        window = utils.slice_to_bounds(grid, (190, 0, 200, 1))
+
+        self.assertEqual(window.sizes, grid.sizes)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestWrapLongitude(unittest.TestCase):
+
+    def test_wrap_longitude(self):
+        self.assertEqual(wrap_longitude(10.0), 10.0)
+        self.assertEqual(wrap_longitude(190.0), -170.0)
+        self.assertEqual(wrap_longitude(-200.0), 160.0)
+        self.assertEqual(wrap_longitude(350.0), -10.0)
+
+    def test_wrap_polygon(self):
+        inside = {'type': 'Polygon',
+                  'coordinates': [[[10, 0], [20, 0], [20, 5], [10, 0]]]}
+
+        self.assertIs(wrap_polygon(inside), inside)
+
+        # Drawn on the world copy east of the antimeridian, crossing it
+        crossing = {'type': 'Polygon',
+                    'coordinates': [[[370, 0], [550, 0], [550, 5],
+                                     [370, 0]]]}
+
+        wrapped = wrap_polygon(crossing)
+
+        self.assertEqual(wrapped['type'], 'Polygon')
+        self.assertEqual(wrapped['coordinates'],
+                         [[[10, 0], [190, 0], [190, 5], [10, 0]]])
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import fsspec
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from eisdashboard.model.data.reference_index import ReferenceIndex
+
+
+@unittest.skipUnless(ReferenceIndex.available(), 'kerchunk not installed')
+class TestReferenceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.temp_dir.name, 'references')
+
+        self.file_system = fsspec.filesystem('file')
+        self.granules = []
+
+        for day in range(3):
+            dataset = xr.Dataset(
+                {'precip': (('time', 'lat', 'lon'),
+                            np.random.rand(1, 4, 5))},
+                coords={'time': [pd.Timestamp('2000-01-01') +
+                                 pd.Timedelta(days=day)],
+                        'lat': np.arange(4.0),
+                        'lon': np.arange(5.0)})
+
+            granule_path = os.path.join(self.temp_dir.name,
+                                        f'granule{day}.nc')
+            dataset.to_netcdf(granule_path, engine='h5netcdf')
+            self.granules.append(granule_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key_is_order_independent(self):
+        self.assertEqual(ReferenceIndex.make_key(['a', 'b']),
+                         ReferenceIndex.make_key(['b', 'a']))
+        self.assertNotEqual(ReferenceIndex.make_key(['a', 'b']),
+                            ReferenceIndex.make_key(['a']))
+
+    def test_matches_open_mfdataset(self):
+        index = ReferenceIndex(path=self.index_path)
+
+        dataset = index.open_dataset(self.file_system, self.granules)
+
+        expected = xr.open_mfdataset(self.granules, engine='h5netcdf')
+
+        self.assertEqual(dataset.sizes['time'], 3)
+        xr.testing.assert_allclose(dataset.load(), expected.load())
+
+    def test_reopen_reads_saved_index(self):
+        ReferenceIndex(path=self.index_path).open_dataset(self.file_system,
+                                                          self.granules)
+
+        index = ReferenceIndex(path=self.index_path)
+
+        with patch.object(index, 'build') as mock_build:
+            dataset = index.open_dataset(self.file_system, self.granules)
+
+        mock_build.assert_not_called()
+        self.assertEqual(dataset.sizes['time'], 3)
+
+    def test_unreadable_granule_is_not_saved(self):
+        index = ReferenceIndex(path=self.index_path)
+        s3_list = self.granules + [
+            os.path.join(self.temp_dir.name, 'missing.nc')]
+
+        with self.assertRaises(ValueError):
+            index.open_dataset(self.file_system, s3_list)
+
+        # No partial index, so the next session indexes the granules again
+        self.assertIsNone(index.load(ReferenceIndex.make_key(s3_list)))
+
+        with self.assertRaises(ValueError):
+            index.build(self.file_system, ['/does/not/exist.nc'])
+
+
+if __name__ == '__main__':
+    unittest.main()
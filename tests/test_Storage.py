@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import MagicMock
+
+import fsspec
+
+from eisdashboard.model.data.storage import LocalBackend
+from eisdashboard.model.data.storage import MemoryBackend
+from eisdashboard.model.data.storage import S3Backend
+from eisdashboard.model.data.storage import make_backend
+from eisdashboard.model.data.storage import to_s3_path
+
+
+URL = 'https://data.gesdisc.earthdata.nasa.gov/data/GLDAS/granule.nc4'
+
+
+class TestStorage(unittest.TestCase):
+
+    def test_to_s3_path(self):
+        self.assertEqual(to_s3_path(URL), 's3://data/GLDAS/granule.nc4')
+        self.assertEqual(to_s3_path('s3://bucket/granule.nc'),
+                         's3://bucket/granule.nc')
+        self.assertIsNone(to_s3_path('https://archive.gov/granule.xml'))
+
+    def test_s3_backend(self):
+        credentials = MagicMock()
+        backend = make_backend('s3', '', credentials)
+
+        self.assertIsInstance(backend, S3Backend)
+        self.assertEqual(backend.granule_path(URL),
+                         's3://data/GLDAS/granule.nc4')
+        self.assertIs(backend.get_file_system('GES_DISC'),
+                      credentials.get_file_system.return_value)
+        credentials.get_file_system.assert_called_once_with('GES_DISC')
+
+    def test_local_backend(self):
+        backend = make_backend('file', 'file:///mirrors/gesdisc', None)
+
+        self.assertIsInstance(backend, LocalBackend)
+        self.assertEqual(backend.granule_path(URL),
+                         '/mirrors/gesdisc/data/GLDAS/granule.nc4')
+        self.assertIsNone(backend.granule_path('s3://bucket/granule.xml'))
+        self.assertEqual(backend.get_file_system('GES_DISC').protocol[0],
+                         'file')
+
+        with self.assertRaises(ValueError):
+            make_backend('file', '', None)
+
+    def test_memory_backend(self):
+        backend = make_backend('memory', 'synthetic', None)
+
+        self.assertIsInstance(backend, MemoryBackend)
+
+        path = backend.granule_path(URL)
+        self.assertEqual(path, 'memory:///synthetic/data/GLDAS/granule.nc4')
+
+        # Shared with fsspec.filesystem('memory')
+        fsspec.filesystem('memory').pipe(path, b'granule')
+        with backend.get_file_system('GES_DISC').open(path) as granule:
+            self.assertEqual(granule.read(), b'granule')
+        fsspec.filesystem('memory').rm(path)
+
+    def test_unknown_protocol(self):
+        with self.assertRaises(ValueError):
+            make_backend('gcs', '', None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from eisdashboard.model.data.subset import subset_to_bounds
+
+
+def make_grid(lats, lons, lat_name='lat', lon_name='lon'):
+    return xr.Dataset(
+        {'precip': ((lat_name, lon_name),
+                    np.random.rand(len(lats), len(lons)))},
+        coords={lat_name: lats, lon_name: lons})
+
+
+class TestSubsetToBounds(unittest.TestCase):
+
+    # GLDAS-like 0.25 degree cell centres
+    LATS = np.arange(-59.875, 90, 0.25)
+    LONS = np.arange(-179.875, 180, 0.25)
+
+    BOUNDS = [-76.6, 38.8, -76.5, 38.9]
+
+    def assert_covers(self, subset, lon, lat):
+        """The cell nearest to (lon, lat) on the full grid is kept."""
+        self.assertIn(self.LATS[np.abs(self.LATS - lat).argmin()],
+                      subset.lat.values)
+        longitudes = self.LONS % 360 if subset.lon.max() > 180 \
+            else self.LONS
+        nearest_lon = longitudes[np.abs(longitudes - lon).argmin()]
+        self.assertIn(nearest_lon, subset.lon.values)
+
+    def test_ascending_grid(self):
+        subset = subset_to_bounds(make_grid(self.LATS, self.LONS),
+                                  self.BOUNDS)
+
+        self.assertLessEqual(subset.sizes['lat'], 3)
+        self.assertLessEqual(subset.sizes['lon'], 3)
+        self.assert_covers(subset, -76.55, 38.85)
+
+    def test_descending_latitude(self):
+        subset = subset_to_bounds(make_grid(self.LATS[::-1], self.LONS),
+                                  self.BOUNDS)
+
+        self.assertLessEqual(subset.sizes['lat'], 3)
+        self.assert_covers(subset, -76.55, 38.85)
+        # Order of the source grid is kept
+        self.assertTrue((np.diff(subset.lat.values) < 0).all())
+
+    def test_0_360_longitude(self):
+        subset = subset_to_bounds(make_grid(self.LATS, self.LONS % 360),
+                                  self.BOUNDS)
+
+        self.assertLessEqual(subset.sizes['lon'], 3)
+        self.assert_covers(subset, -76.55 % 360, 38.85)
+
+    def test_window_across_the_seam(self):
+        lons = np.sort(self.LONS % 360)
+
+        subset = subset_to_bounds(make_grid(self.LATS, lons),
+                                  [-1, 0, 1, 1])
+
+        self.assertTrue(set(subset.lon.values) >= {0.125, 359.875})
+        self.assertLessEqual(subset.sizes['lon'], 10)
+
+        subset = subset_to_bounds(make_grid(self.LATS, self.LONS),
+                                  [179, 0, 181, 1])
+        self.assertTrue(set(subset.lon.values) >= {179.875, -179.875})
+
+    def test_margin_and_capitalized_dims(self):
+        grid = make_grid(self.LATS, self.LONS, 'Latitude', 'Longitude')
+
+        subset = subset_to_bounds(grid, self.BOUNDS, margin=1.0)
+
+        self.assertGreaterEqual(subset.sizes['Latitude'], 8)
+        self.assertGreaterEqual(subset.sizes['Longitude'], 8)
+
+    def test_selection_is_lazy(self):
+        grid = make_grid(self.LATS, self.LONS).chunk({'lat': 100})
+
+        subset = subset_to_bounds(grid, self.BOUNDS)
+
+        self.assertIsNotNone(subset.precip.chunks)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import omegaconf
+import pandas as pd
+import xarray as xr
+
+from eisdashboard.model.config import Config
+from eisdashboard.model.data.granule_filter import parse_time_range
+from eisdashboard.model.data.ingest import Ingest
+from eisdashboard.model.data.subset import subset_to_bounds
+from eisdashboard.model.data.subset import subset_to_time_range
+from eisdashboard.model.data.subset_store import SubsetStore
+from eisdashboard.model.granule import GranuleRecord
+
+
+def make_dataset():
+    times = pd.date_range('2019-05-18', periods=24, freq='3h')
+    lats = np.arange(30.125, 45, 0.25)
+    lons = np.arange(-85.875, -70, 0.25)
+
+    return xr.Dataset(
+        {'precip': (('time', 'lat', 'lon'),
+                    np.random.rand(len(times), len(lats), len(lons)))},
+        coords={'time': times, 'lat': lats, 'lon': lons}).chunk({'time': 1})
+
+
+class TestSubsetStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store_path = os.path.join(self.temp_dir.name, 'subsets')
+
+        self.query_package = {
+            'spatialParameter': 'bounding_box',
+            'coords': [-76.6, 38.8, -76.5, 38.9],
+            'datetime': '2019-05-18T00:00:00Z,2019-05-19T00:00:00Z',
+            'collection_id': 'GLDAS_NOAH025_3H'}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_subset_smaller_than_a_cell_keeps_neighbours(self):
+        subset = subset_to_time_range(
+            subset_to_bounds(make_dataset(), self.query_package['coords']),
+            parse_time_range('2019-05-18T00:00:00Z,2019-05-18T12:00:00Z'))
+
+        self.assertEqual(subset.sizes['time'], 5)
+        self.assertGreater(subset.sizes['lat'], 0)
+        self.assertGreater(subset.sizes['lon'], 0)
+
+        # Nearest cell to any point in the bounds is kept
+        nearest = make_dataset().sel(lon=-76.55, lat=38.85, method='nearest')
+        self.assertIn(float(nearest.lat), subset.lat.values)
+        self.assertIn(float(nearest.lon), subset.lon.values)
+
+    def test_write_is_time_contiguous(self):
+        store = SubsetStore(path=self.store_path, spatial_chunk=2)
+        key = store.make_key(self.query_package)
+
+        written = store.write(key, make_dataset(), [-80, 35, -75, 40],
+                              parse_time_range(
+                                  self.query_package['datetime']),
+                              {'revision_date': '2019-06-01T00:00:00.000Z',
+                               'file_urls': {'s3://bucket/a.nc4'}})
+
+        self.assertEqual(written.precip.chunks[0], (written.sizes['time'],))
+        self.assertEqual(max(written.precip.chunks[1]), 2)
+
+        dataset, state = store.open(key)
+
+        xr.testing.assert_identical(dataset.load(), written.load())
+        self.assertEqual(state['file_urls'], {'s3://bucket/a.nc4'})
+        self.assertIsNone(store.open('missing'))
+
+    @patch('eisdashboard.model.data.ingest.Ingest.ingest')
+    @patch('eisdashboard.model.data.ingest.Ingest._query_cmr')
+    def test_ingest_reuses_store(self, mock_query_cmr, mock_ingest):
+        config = omegaconf.OmegaConf.structured(Config)
+        config.materialize.enabled = True
+        config.materialize.path = self.store_path
+
+        def query_cmr(ingest, search_dict):
+            ingest._query_state[search_dict['collection_id']] = {
+                'revision_date': None, 'file_urls': {'s3://bucket/a.nc4'}}
+            return ('s3://bucket/a.nc4',), 'GES_DISC', {}
+
+        first = Ingest(config)
+        mock_query_cmr.side_effect = lambda search_dict: \
+            query_cmr(first, search_dict)
+        mock_ingest.return_value = make_dataset()
+
+        first_package = first.get_data_from_bounds(self.query_package)
+
+        # A later session opens the store without querying or ingesting
+        second = Ingest(config)
+        second_package = second.get_data_from_bounds(self.query_package)
+
+        self.assertEqual(mock_query_cmr.call_count, 1)
+        self.assertEqual(mock_ingest.call_count, 1)
+        xr.testing.assert_identical(first_package['data'].load(),
+                                    second_package['data'].load())
+        self.assertEqual(
+            second._query_state['GLDAS_NOAH025_3H']['file_urls'],
+            {'s3://bucket/a.nc4'})
+
+    @patch('eisdashboard.model.data.ingest.Ingest.ingest')
+    @patch('eisdashboard.model.data.ingest.Ingest._query_cmr')
+    def test_refresh_writes_back_to_store(self, mock_query_cmr, mock_ingest):
+        config = omegaconf.OmegaConf.structured(Config)
+        config.materialize.enabled = True
+        config.materialize.path = self.store_path
+
+        # Ingest trims granules to the bounds like the store does
+        full = subset_to_bounds(make_dataset(), self.query_package['coords'])
+
+        def query_cmr(ingest, file_urls):
+            def query(search_dict, updated_since=None):
+                granules = {
+                    url: GranuleRecord(url.rsplit('/', 1)[-1], url,
+                                       'GES_DISC',
+                                       revision_date='2019-06-01')
+                    for url in file_urls}
+                ingest._query_state[search_dict['collection_id']] = {
+                    'revision_date': None, 'file_urls': set(file_urls),
+                    'revisions': {url: '2019-06-01' for url in file_urls}}
+                return tuple(file_urls), 'GES_DISC', granules
+            return query
+
+        first = Ingest(config)
+        mock_query_cmr.side_effect = query_cmr(first, ['s3://bucket/a.nc4'])
+        mock_ingest.return_value = full.isel(time=slice(0, 4))
+
+        package = first.get_data_from_bounds(self.query_package)
+
+        mock_query_cmr.side_effect = query_cmr(
+            first, ['s3://bucket/a.nc4', 's3://bucket/b.nc4'])
+        mock_ingest.return_value = full.isel(time=slice(4, 8))
+
+        refreshed = first.refresh_nasa_earthdata(self.query_package,
+                                                 package['data'])
+
+        self.assertEqual(refreshed['data'].sizes['time'], 8)
+
+        # A later session opens the refreshed store and its state
+        second = Ingest(config)
+        reopened = second.get_data_from_bounds(self.query_package)
+
+        xr.testing.assert_identical(reopened['data'].load(),
+                                    refreshed['data'].load())
+        self.assertEqual(
+            second._query_state['GLDAS_NOAH025_3H']['file_urls'],
+            {'s3://bucket/a.nc4', 's3://bucket/b.nc4'})
+        self.assertEqual(
+            second._query_state['GLDAS_NOAH025_3H']['revisions'],
+            {'s3://bucket/a.nc4': '2019-06-01',
+             's3://bucket/b.nc4': '2019-06-01'})
+
+
+if __name__ == '__main__':
+    unittest.main()
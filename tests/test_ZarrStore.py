@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from eisdashboard.model.data.zarr_store import ZarrMetadataCache
+from eisdashboard.model.data.zarr_store import open_zarr_store
+
+
+@unittest.skipUnless(ZarrMetadataCache.available(), 'zarr 3 not installed')
+class TestZarrStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+        self.dataset = xr.Dataset(
+            {'fwi': (('time', 'lat', 'lon'), np.random.rand(10, 4, 6))},
+            coords={'time': np.arange(10), 'lat': np.arange(4.0),
+                    'lon': np.arange(6.0)})
+
+        self.cache = ZarrMetadataCache(
+            os.path.join(self.temp_dir.name, 'metadata'))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_store(self, name, consolidated):
+        path = os.path.join(self.temp_dir.name, name)
+        self.dataset.chunk({'time': 5, 'lat': 2}).to_zarr(
+            path, consolidated=consolidated)
+        return f'file://{path}'
+
+    def test_consolidated_store_native_chunks(self):
+        url = self.write_store('consolidated.zarr', consolidated=True)
+
+        opened = open_zarr_store(url, self.cache)
+
+        self.assertEqual(opened.fwi.chunks, ((5, 5), (2, 2), (6,)))
+        xr.testing.assert_equal(opened.load(), self.dataset)
+
+    def test_unconsolidated_store(self):
+        url = self.write_store('unconsolidated.zarr', consolidated=False)
+
+        opened = open_zarr_store(url)
+
+        xr.testing.assert_equal(opened.load(), self.dataset)
+
+    def test_metadata_served_from_cache(self):
+        url = self.write_store('store.zarr', consolidated=False)
+
+        open_zarr_store(url, self.cache)
+        misses = self.cache.stats()['misses']
+        self.assertGreater(misses, 0)
+
+        # Every metadata document, present or not, is now local
+        opened = open_zarr_store(url, self.cache)
+        self.assertEqual(self.cache.stats()['misses'], misses)
+        xr.testing.assert_equal(opened.load(), self.dataset)
+
+    def test_expired_metadata_is_read_again(self):
+        url = self.write_store('store.zarr', consolidated=True)
+        cache = ZarrMetadataCache(
+            os.path.join(self.temp_dir.name, 'expired'), ttl=-1)
+
+        open_zarr_store(url, cache)
+        open_zarr_store(url, cache)
+
+        self.assertEqual(cache.stats()['hits'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()